@@ -0,0 +1,327 @@
+"""mongoreader.bulk
+
+This module contains utilities to retrieve groups of documents from the
+database with as few round trips as possible, using "$in" queries on their
+IDs instead of importing documents one by one, and to update them with
+single "bulk_write" operations.
+"""
+
+import mongomanager as mom
+from mongomanager import log
+from mongoutils import queryUtils as qu
+from pymongo import UpdateOne
+
+
+def _uniqueIDs(IDs:list) -> list:
+    """Returns the list of IDs converted to ObjectId, without None and
+    without repetitions. The order of the first occurrence is preserved."""
+
+    uniqueIDs = []
+    seen = set()
+
+    for ID in IDs:
+        if ID is None: continue
+        ID = mom.toObjectID(ID)
+        if ID in seen: continue
+        seen.add(ID)
+        uniqueIDs.append(ID)
+
+    return uniqueIDs
+
+
+def queryComponentsByIDs(connection:mom.connection, IDs:list,
+                         projection:dict = None,
+                         *,
+                         returnType:str = 'component',
+                         verbose:bool = False) -> list:
+    """Retrieves all the components whose ID is among "IDs" with a single
+    query.
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server.
+        IDs (list[ID]): The IDs of the components. None values and
+            repetitions are ignored.
+        projection (dict, optional): If passed, only the fields specified by
+            the projection are retrieved. Defaults to None.
+
+    Keyword Args:
+        returnType (str, optional): Passed to mongomanager.component.query().
+            Use "dictionary" to retrieve raw documents. Defaults to
+            "component".
+        verbose (bool, optional): If False, query output is suppressed.
+            Defaults to False.
+
+    Returns:
+        list[mongomanager.component] | list[dict]: The retrieved components.
+            The list is empty if nothing is found.
+    """
+
+    IDs = _uniqueIDs(IDs)
+    if IDs == []:
+        return []
+
+    cmps = mom.component.query(connection, qu.among('_id', IDs),
+                               projection = projection,
+                               returnType = returnType,
+                               verbose = verbose)
+
+    if cmps is None:
+        return []
+
+    log.debug(f'[queryComponentsByIDs] Retrieved {len(cmps)} components out of {len(IDs)} IDs.')
+    return cmps
+
+
+def queryComponentsTestedAfter(connection:mom.connection, IDs:list,
+                               date = None,
+                               projection:dict = None,
+                               *,
+                               returnType:str = 'component',
+                               verbose:bool = False) -> list:
+    """Retrieves, with a single query, the components whose ID is among
+    "IDs" and whose test history contains at least one entry executed
+    after "date", using "$elemMatch" on "testHistory.executionDate".
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server.
+        IDs (list[ID]): The IDs of the components. None values and
+            repetitions are ignored.
+        date (datetime, optional): Only components with test entries
+            executed strictly after this date are retrieved. If None, all
+            the components are retrieved. Defaults to None.
+        projection (dict, optional): If passed, only the fields specified by
+            the projection are retrieved. Defaults to None.
+
+    Keyword Args:
+        returnType (str, optional): Passed to mongomanager.component.query().
+            Defaults to "component".
+        verbose (bool, optional): If False, query output is suppressed.
+            Defaults to False.
+
+    Returns:
+        list[mongomanager.component] | list[dict]: The retrieved components.
+            The list is empty if nothing is found.
+    """
+
+    if date is None:
+        return queryComponentsByIDs(connection, IDs, projection,
+                                    returnType = returnType, verbose = verbose)
+
+    IDs = _uniqueIDs(IDs)
+    if IDs == []:
+        return []
+
+    query = {**qu.among('_id', IDs),
+             'testHistory': {'$elemMatch': {'executionDate': {'$gt': date}}}}
+
+    cmps = mom.component.query(connection, query,
+                               projection = projection,
+                               returnType = returnType,
+                               verbose = verbose)
+
+    if cmps is None:
+        return []
+
+    log.debug(f'[queryComponentsTestedAfter] Retrieved {len(cmps)} components out of {len(IDs)} IDs.')
+    return cmps
+
+
+def testHistoryAfterProjection(date = None) -> dict:
+    """Returns the projection that retrieves only the test history entries
+    executed strictly after "date", filtering them server-side with
+    "$filter", or the whole test history if date is None."""
+
+    if date is None:
+        return {'testHistory': 1}
+
+    return {'testHistory': {'$filter': {
+        'input': '$testHistory',
+        'as': 'entry',
+        'cond': {'$gt': ['$$entry.executionDate', date]},
+    }}}
+
+
+def testHistoryResultsProjection(resultNames:list = None,
+                                 locations:list = None) -> dict:
+    """Returns the projection that retrieves the test history keeping, in
+    each entry, only the results whose name is among "resultNames" and whose
+    location is among "locations", filtering them server-side with "$map"
+    and "$filter". Entries are kept even if none of their results is.
+
+    If both resultNames and locations are None, the whole test history is
+    retrieved (as for testHistoryAfterProjection())."""
+
+    if resultNames is None and locations is None:
+        return {'testHistory': 1}
+
+    conditions = []
+    if resultNames is not None:
+        conditions.append({'$in': ['$$result.resultName', list(resultNames)]})
+    if locations is not None:
+        conditions.append({'$in': ['$$result.location', list(locations)]})
+
+    return {'testHistory': {'$map': {
+        'input': '$testHistory',
+        'as': 'entry',
+        'in': {'$mergeObjects': ['$$entry', {'results': {'$filter': {
+            'input': {'$ifNull': ['$$entry.results', []]},
+            'as': 'result',
+            'cond': {'$and': conditions},
+        }}}]},
+    }}}
+
+
+def queryBlueprintsByIDs(connection:mom.connection, IDs:list,
+                         *,
+                         verbose:bool = False) -> list:
+    """Retrieves all the blueprints whose ID is among "IDs" with a single
+    query.
+
+    Blueprints are returned as instances of their native mongomanager class
+    (e.g. waferBlueprint).
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server.
+        IDs (list[ID]): The IDs of the blueprints. None values and repetitions
+            are ignored.
+
+    Keyword Args:
+        verbose (bool, optional): If False, query output is suppressed.
+            Defaults to False.
+
+    Returns:
+        list[mongomanager.blueprint]: The retrieved blueprints. The list is
+            empty if nothing is found.
+    """
+
+    IDs = _uniqueIDs(IDs)
+    if IDs == []:
+        return []
+
+    bps = mom.query(connection, qu.among('_id', IDs), None,
+                    mom.blueprint.defaultDatabase,
+                    mom.blueprint.defaultCollection,
+                    returnType = 'native', verbose = verbose)
+
+    if bps is None:
+        return []
+
+    bps = [bp for bp in bps if bp is not None]
+
+    log.debug(f'[queryBlueprintsByIDs] Retrieved {len(bps)} blueprints out of {len(IDs)} IDs.')
+    return bps
+
+
+def _collection(connection:mom.connection, database:str, collection:str):
+    """Returns the pymongo collection object for "database"/"collection".
+    
+    The connection must be opened."""
+    return connection.client[database][collection]
+
+
+def setField(connection:mom.connection, field:str, values:dict,
+             database:str, collection:str) -> int:
+    """Sets "field" to a different value for many documents with a single
+    unordered "bulk_write" of "$set" updates, so that only that field is
+    transferred and written.
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server. It must be opened.
+        field (str): The field to be set.
+        values (dict): A dictionary in the form {<ID>: <value>}.
+        database (str): The database of the documents.
+        collection (str): The collection of the documents.
+
+    Returns:
+        int: The number of modified documents.
+    """
+
+    if values == {}:
+        return 0
+
+    operations = [UpdateOne({'_id': mom.toObjectID(ID)}, {'$set': {field: value}})
+                  for ID, value in values.items()]
+
+    result = _collection(connection, database, collection).bulk_write(operations,
+                                                                    ordered = False)
+
+    log.debug(f'[setField] Set "{field}" for {result.modified_count} out of {len(values)} documents.')
+    return result.modified_count
+
+
+def setComponentsField(connection:mom.connection, field:str, values:dict) -> int:
+    """Sets "field" for many components. See setField()."""
+    return setField(connection, field, values,
+                    mom.component.defaultDatabase,
+                    mom.component.defaultCollection)
+
+
+def modificationMarkers(connection:mom.connection, IDs:list,
+                        database:str, collection:str) -> dict:
+    """Returns a cheap "modification marker" for each of the documents whose
+    ID is among "IDs", computed server-side with a single aggregation.
+
+    The marker is a tuple containing the BSON size of the document, the
+    lengths of the history arrays ("testHistory", "statusLog",
+    "processHistory", "datasheetData") and the "status" and "processStage"
+    fields. Two different markers for the same ID mean that the document has
+    changed; only the marker crosses the wire.
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server. It must be opened.
+        IDs (list[ID]): The IDs of the documents.
+        database (str): The database of the documents.
+        collection (str): The collection of the documents.
+
+    Returns:
+        dict: A dictionary in the form {<ID>: <marker tuple>}. Documents that
+            do not exist are not present in the dictionary.
+    """
+
+    IDs = _uniqueIDs(IDs)
+    if IDs == []:
+        return {}
+
+    def _arraySize(field):
+        return {'$size': {'$ifNull': [f'${field}', []]}}
+
+    pipeline = [
+        {'$match': {'_id': {'$in': IDs}}},
+        {'$project': {
+            '_id': 1,
+            'marker': [
+                {'$bsonSize': '$$ROOT'},
+                _arraySize('testHistory'),
+                _arraySize('statusLog'),
+                _arraySize('processHistory'),
+                _arraySize('datasheetData'),
+                '$status',
+                '$processStage',
+            ]
+        }},
+    ]
+
+    docs = _collection(connection, database, collection).aggregate(pipeline)
+    
+    return {doc['_id']: tuple(doc['marker']) for doc in docs}
+
+
+def componentMarkers(connection:mom.connection, IDs:list) -> dict:
+    """Returns the modification markers of the components whose ID is among
+    "IDs". See modificationMarkers()."""
+    return modificationMarkers(connection, IDs,
+                               mom.component.defaultDatabase,
+                               mom.component.defaultCollection)
+
+
+def blueprintMarkers(connection:mom.connection, IDs:list) -> dict:
+    """Returns the modification markers of the blueprints whose ID is among
+    "IDs". See modificationMarkers()."""
+    return modificationMarkers(connection, IDs,
+                               mom.blueprint.defaultDatabase,
+                               mom.blueprint.defaultCollection)
@@ -0,0 +1,371 @@
+"""mongoreader.cache
+
+This module contains process-wide caches used to share documents that
+rarely change, such as blueprints and wafer geometries, between collations.
+
+The process-wide caches are enabled by default, so that the second and
+later wafers of a mask set are loaded without blueprint queries, and wafer
+geometries are retrieved once per wafer blueprint. Collations share the same
+blueprint instances: modifying a cached blueprint affects all the collations
+that use it, so cached blueprints must not be modified.
+
+Cached entries expire after a time-to-live (one hour by default, see
+enable()) and are evicted in LRU order when a cache is full, so a blueprint
+modified by another process may be served for up to "ttl" seconds. Use
+invalidate() to drop entries explicitly, for example after a blueprint has
+been modified, and disable() to turn the caches off.
+
+>>> import mongoreader.cache as ch
+>>> ch.enable(ttl = 600)       # Entries expire after 10 minutes
+>>> ch.invalidate(blueprintID) # A single blueprint
+>>> ch.invalidate()            # Everything
+>>> ch.disable()               # Nothing is shared between collations
+"""
+
+import mongomanager as mom
+from mongomanager import log
+import mongoreader.bulk as bulk
+
+from collections import OrderedDict
+from threading import Lock, RLock
+from time import monotonic, perf_counter
+
+
+class _LRUcache:
+    """A thread-safe LRU cache whose entries expire after "ttl" seconds.
+
+    A disabled cache stores nothing, and all its lookups are misses.
+
+    Args:
+        maxEntries (int): The maximum number of entries in the cache.
+        ttl (float, optional): The time-to-live of entries in seconds. If
+            None, entries do not expire. Defaults to None.
+
+    Keyword Args:
+        enabled (bool, optional): Whether the cache is enabled. Defaults to
+            True.
+    """
+
+    _missing = object()
+
+    def __init__(self, maxEntries:int, ttl:float = None, *, enabled:bool = True):
+
+        if not isinstance(maxEntries, int):
+            raise TypeError('"maxEntries" must be a positive integer.')
+        if maxEntries < 1:
+            raise ValueError('"maxEntries" must be a positive integer.')
+
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict() # key -> (expiration time, value)
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, self._missing, count = False) is not self._missing
+
+    def get(self, key, default = None, *, count:bool = True):
+        """Returns the value associated to key, or "default" if the key is
+        not in the cache or if its entry is expired."""
+
+        with self._lock:
+
+            entry = self._entries.get(key) if self.enabled else None
+
+            if entry is not None:
+                expiration, value = entry
+
+                if expiration is None or expiration > monotonic():
+                    self._entries.move_to_end(key)
+                    if count: self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+            if count: self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Stores value in the cache, evicting the least recently used entry
+        if the cache is full."""
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+
+            expiration = None if self.ttl is None else monotonic() + self.ttl
+            self._entries[key] = (expiration, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last = False)
+
+    def invalidate(self, key = None):
+        """Removes the entry for "key" from the cache, or all the entries if
+        key is None. Tuple keys whose first element is "key" are removed too.
+        """
+
+        with self._lock:
+
+            if key is None:
+                self._entries.clear()
+                return
+
+            for k in list(self._entries):
+                if k == key or (isinstance(k, tuple) and len(k) > 0 and k[0] == key):
+                    del self._entries[k]
+
+
+class blueprintCache(_LRUcache):
+    """A thread-safe LRU cache of blueprints, keyed by their ID.
+
+    Blueprints that are not in the cache are retrieved with a single "$in"
+    query. Queries are serialized, so that when many threads need the same
+    blueprints (e.g. wafers of the same mask set loaded concurrently), they
+    are retrieved only once.
+    """
+
+    def __init__(self, maxEntries:int = 1024, ttl:float = 3600, *, enabled:bool = True):
+        super().__init__(maxEntries, ttl, enabled = enabled)
+        self._queryLock = Lock()
+
+    def retrieveBlueprints(self, connection:mom.connection, IDs:list,
+                           *,
+                           verbose:bool = False) -> dict:
+        """Returns the blueprints whose ID is among "IDs", querying the
+        database only for those that are not in the cache.
+
+        Args:
+            connection (mongomanager.connection): The connection instance to
+                the MongoDB server.
+            IDs (list[ID]): The blueprint IDs.
+
+        Keyword Args:
+            verbose (bool, optional): If False, query output is suppressed.
+                Defaults to False.
+
+        Returns:
+            dict: A dictionary in the form {<ID>: <blueprint>}. Blueprints that
+                are not found are not present in the dictionary.
+        """
+
+        IDs = bulk._uniqueIDs(IDs)
+
+        with self._queryLock:
+
+            found = {ID: self.get(ID) for ID in IDs}
+            missing = [ID for ID, bp in found.items() if bp is None]
+
+            if missing != []:
+                with mom.opened(connection):
+                    queried = bulk.queryBlueprintsByIDs(connection, missing,
+                                                        verbose = verbose)
+
+                for bp in queried:
+                    self.put(bp.ID, bp)
+                    found[bp.ID] = bp
+
+        log.debug(f'[blueprintCache] {len(IDs) - len(missing)} blueprints from cache, {len(missing)} queried.')
+        return {ID: bp for ID, bp in found.items() if bp is not None}
+
+    def retrieveBlueprint(self, connection:mom.connection, ID):
+        """Returns the blueprint with the given ID, or None if not found."""
+
+        if ID is None:
+            return None
+
+        return self.retrieveBlueprints(connection, [ID]).get(mom.toObjectID(ID))
+
+    def update(self, blueprints:list):
+        """Stores in the cache freshly retrieved blueprints."""
+
+        for bp in blueprints:
+            if bp is not None:
+                self.put(bp.ID, bp)
+
+
+class locationGroupResolver(_LRUcache):
+    """A thread-safe LRU cache of the locations associated to the location
+    groups of blueprints, keyed by (<blueprint ID>, <location group>).
+
+    Components sharing the same blueprint share the same entries, so that
+    each location group is resolved only once per blueprint. The time spent
+    resolving groups is tracked, to evaluate the saving (see info()).
+    """
+
+    def __init__(self, maxEntries:int = 4096, ttl:float = 3600, *, enabled:bool = True):
+        super().__init__(maxEntries, ttl, enabled = enabled)
+        self.resolveTime = 0.
+
+    def retrieveLocations(self, blueprint, locationGroup:str) -> list:
+        """Returns the locations associated to locationGroup for the
+        blueprint, or None if blueprint is None or if the group is not
+        found."""
+
+        if blueprint is None:
+            return None
+
+        key = (blueprint.ID, locationGroup)
+        locations = self.get(key, self._missing)
+
+        if locations is self._missing:
+
+            start = perf_counter()
+            locations = blueprint.Locations.retrieveGroupElements(locationGroup, verbose = False)
+            elapsed = perf_counter() - start
+
+            with self._lock:
+                self.resolveTime += elapsed
+
+            self.put(key, locations)
+
+        return list(locations) if locations is not None else None
+
+    def info(self) -> dict:
+        """Returns the statistics of the resolver, in the form
+        {'hits': <int>, 'misses': <int>, 'entries': <int>,
+        'maxEntries': <int>, 'resolveTime': <float>, 'savedTime': <float>}.
+
+        "resolveTime" is the time (in seconds) spent resolving location
+        groups, while "savedTime" estimates the time saved by cache hits,
+        based on the average resolution time."""
+
+        with self._lock:
+            averageTime = self.resolveTime / self.misses if self.misses > 0 else 0.
+
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'entries': len(self._entries),
+                    'maxEntries': self.maxEntries,
+                    'resolveTime': self.resolveTime,
+                    'savedTime': self.hits * averageTime}
+
+
+def freeze(obj):
+    """Returns a hashable version of obj, to be used as a cache key. Lists
+    and tuples become tuples, dictionaries become tuples of (key, value)
+    pairs and sets become frozensets, recursively. Unhashable objects are
+    replaced by their repr()."""
+
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(el) for el in obj)
+    
+    if isinstance(obj, dict):
+        return tuple((freeze(k), freeze(v)) for k, v in obj.items())
+    
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(el) for el in obj)
+
+    try:
+        hash(obj)
+    except TypeError:
+        return repr(obj)
+    
+    return obj
+
+
+# ------------------------------------------------------------------------------
+# Process-wide caches (enabled by default, see disable())
+
+# <blueprint ID> -> <blueprint>
+blueprints = blueprintCache()
+
+# (<wafer blueprint ID>, <blueprint type>) -> blueprint elements grouped by ID
+blueprintGroups = _LRUcache(maxEntries = 256, ttl = 3600)
+
+# <wafer blueprint ID> -> dictionary of P1-P2 coordinates for each chip type
+geometries = _LRUcache(maxEntries = 256, ttl = 3600)
+
+# (<blueprint ID>, <location group>) -> list of locations
+locationGroups = locationGroupResolver()
+
+
+def enable(ttl:float = 3600):
+    """Enables the process-wide caches, which are enabled by default, and
+    sets the time-to-live of their entries.
+
+    Collations share the same blueprint instances, which must not be
+    modified. Entries expire after "ttl" seconds.
+
+    Args:
+        ttl (float, optional): The time-to-live of cached entries in seconds.
+            If None, entries do not expire. Defaults to 3600.
+
+    Raises:
+        TypeError: If "ttl" is not a positive number or None.
+        ValueError: If "ttl" is not a positive number or None.
+    """
+
+    if ttl is not None:
+        if not isinstance(ttl, (int, float)):
+            raise TypeError('"ttl" must be a positive number or None.')
+        if ttl <= 0:
+            raise ValueError('"ttl" must be a positive number or None.')
+
+    for cache in [blueprints, blueprintGroups, geometries, locationGroups]:
+        cache.ttl = ttl
+        cache.enabled = True
+
+
+def disable():
+    """Disables the process-wide caches, dropping all their entries.
+
+    Collations then retrieve their blueprints and geometries from the
+    database, except for those loaded together by loadWaferCollations() or
+    given the same blueprintCache, which still share a cache of their own
+    (see mongoreader.wafers.loadWaferCollations()).
+    """
+
+    for cache in [blueprints, blueprintGroups, geometries, locationGroups]:
+        cache.enabled = False
+
+    invalidate()
+
+
+def enabled() -> bool:
+    """Returns True if the process-wide caches are enabled."""
+
+    return blueprints.enabled
+
+
+def retrieveComponentBlueprint(connection:mom.connection, component):
+    """Returns the blueprint of "component" using the process-wide blueprint
+    cache, or None if the component has no blueprint."""
+
+    return blueprints.retrieveBlueprint(connection,
+                    component.getField('blueprintID', verbose = False))
+
+
+def storeBlueprints(bps:list, waferBlueprintID = None):
+    """Stores freshly retrieved blueprints in the process-wide blueprint
+    cache, invalidating the entries derived from them. If "waferBlueprintID"
+    is passed, the entries derived from the wafer blueprint (grouped
+    elements and geometry) are invalidated too."""
+
+    bps = [bp for bp in bps if bp is not None]
+
+    for bp in bps:
+        invalidate(bp.ID)
+    
+    if bps != [] and waferBlueprintID is not None:
+        invalidate(waferBlueprintID)
+
+    blueprints.update(bps)
+
+
+def invalidate(ID = None):
+    """Removes the entries associated to the blueprint ID from all the
+    process-wide caches, or all the entries if ID is None."""
+
+    if ID is not None:
+        ID = mom.toObjectID(ID)
+
+    for cache in [blueprints, blueprintGroups, geometries, locationGroups]:
+        cache.invalidate(ID)
@@ -1,6 +1,8 @@
 from mongoutils import queryUtils as qu
 import mongoreader.wafers as morw
 import mongoreader.modules as morm
+import mongoreader.cache as ch
+import mongoreader.datasheets as ds
 from .MMSconnectors_benchConfig import benchConfig
 from .conversions import Converter_dotOutChipID, Converter_dotOutDUTID
 from datautils import dataClass
@@ -373,27 +375,42 @@ def generateAndSaveComponentDotOutData(component, connection, blueprint,
     if blueprint is not None:
         # Generating data from datasheet definition stored in the blueprint
         generateComponentDotOutData(component, None, blueprint,
-                                processStage = processStage_orStages)
+                                processStage_orStages = processStage_orStages)
     else:
         # The blueprint is automatically retrieved from the component
         generateComponentDotOutData(component, connection, None,
-                                processStage = processStage_orStages)
+                                processStage_orStages = processStage_orStages)
         
     component.mongoReplace(connection)
 
 
-def retrieveComponentDotOutData(component:mom.component)-> DataFrame:
+def retrieveComponentDotOutData(component:mom.component,
+                                *,
+                                connection:mom.connection = None)-> DataFrame:
     """This function returns from the component the data suitable for populating
     the Dot-Out table.
     
     Currently it retrieves data from the last datasheetData defined for the
     compnent.
 
+    Keyword Args:
+        connection (mom.connection, optional): If passed, only the last
+            datasheet of the component is retrieved from the database (see
+            mongoreader.datasheets.queryDatasheetComponents()), so that the
+            component passed does not need to hold its datasheet data (e.g.
+            if it comes from a lazy collation). Defaults to None.
+
     Returns:
         DataFrame | None: The returned data, or None if not found.
     """
 
-    # First, I regenerate the Datasheet data
+    if connection is not None:
+        with mom.opened(connection):
+            cmps = ds.queryDatasheetComponents(connection, [component.ID])
+
+        if cmps == []:
+            return None
+        component = cmps[0]
     
     DF = component.Datasheet.retrieveData(returnDataFrame = True, verbose = False)
     return DF
@@ -555,8 +572,8 @@ def dotOutDataFrame(emptyDotOutDataFrame:DataFrame,
 def _retrieveComponentGroupBlueprints(connection, componentGroup:list,
                                 *,
                                 verbose:bool = True):
-    """Given a group of components, this method queries the database and
-    returns all the blueprints associated to them.
+    """Given a group of components, this method returns all the blueprints
+    associated to them, using the process-wide blueprint cache.
 
     Args:
         connection (mom.connection): The connection object to the MongoDB
@@ -575,19 +592,9 @@ def _retrieveComponentGroupBlueprints(connection, componentGroup:list,
     # Selecting only component instances (None is excluded)
     group = [cmp for cmp in componentGroup if isinstance(cmp, mom.component)]
     bpIDs = [cmp.getField('blueprintID', verbose = False) for cmp in group]
-    bpIDs = [mom.toObjectID(ID) for ID in bpIDs if ID is not None] # Removing None
-    bpIDs = list(set(bpIDs)) # Removing duplicates
 
-    bps = mom.query(connection, qu.among('_id', bpIDs), None,
-                    mom.blueprint.defaultDatabase,
-                    mom.blueprint.defaultCollection,
-                    returnType = 'native', verbose = verbose)
-
-    if bps is None:
-        return None
-
-    else:
-        bps = [bp for bp in bps if bp is not None]
+    bps = list(ch.blueprints.retrieveBlueprints(connection, bpIDs,
+                                                verbose = verbose).values())
     
     if bps == []:
         return None
@@ -816,8 +823,7 @@ def _singleComponentDotOutDataFrame(connection, component, *,
     
     
     if blueprint is None:
-        # with mom.recallDocuments():
-        bp = component.retrieveBlueprint(connection)
+        bp = ch.retrieveComponentBlueprint(connection, component)
     else:
         bp = blueprint
 
@@ -6,6 +6,7 @@ import mongomanager as mom
 from mongomanager import log
 from mongomanager.goggleFunctions import componentGoggleFunctions as cmpGGF
 import mongoreader.connectors.conversions as conv
+import mongoreader.cache as ch
 from datautils import dataClass
 from socket import gethostname
 
@@ -60,7 +61,7 @@ def isGoldenSample(component:mom.component) -> bool:
 # --- Information retrieval functions ---
 
 def _retrieveBlueprint(connection:mom.connection, component:mom.component) -> mom.blueprint:
-    blueprint = component.retrieveBlueprint(connection)
+    blueprint = ch.retrieveComponentBlueprint(connection, component)
     if blueprint is None:
         raise MissingInformation(f'Component "{component.name}" has no blueprint defined.')
     
@@ -4,6 +4,10 @@ on a collective manner
 
 from pandas import DataFrame, concat
 import mongomanager as mom
+import mongoreader.parallel as par
+import mongoreader.bulk as bulk
+import mongoreader.cache as ch
+from mongomanager import log
 
 class _attributeClass:
     def __init__(self, obj):
@@ -37,6 +41,9 @@ def _attributeClassDecoratorMaker(attributeClass):
 
 class _DatasheetsBaseClass(_attributeClass):
     """Attribute class to apply Datasheet methods to wafer collations"""
+
+    # Fields shipped to worker processes (see parallel.shipComponents())
+    _shippedFields = ['_waferLabel', 'datasheetData']
     
     def retrieveData(self,
                     components:list,
@@ -47,7 +54,9 @@ class _DatasheetsBaseClass(_attributeClass):
                     *,
                     returnDataFrame:bool = False,
                     datasheetIndex:int = None,
-                    includeWaferLabels:bool = False
+                    includeWaferLabels:bool = False,
+                    parallel:int = None,
+                    datasheetOnly:bool = False,
                 ):
         """This method can be used to retrieve data from datasheets defined
         for the components of the wafer collation.
@@ -68,49 +77,395 @@ class _DatasheetsBaseClass(_attributeClass):
 
         Keyword arguments (**kwargs):
             returnDataFrame (bool, optional): If True, results are returned
-                as a pandas DataFrame instead of a list of dictionaries.
-                Defaults to False.
+                as a pandas DataFrame instead of a list of dictionaries. The
+                DataFrame is built column by column (see
+                _columnarFrameBuilder). Defaults to False.
             datasheetIndex (int, optional): If passed, the datasheet indexed
                 by datasheetIndex is passed. See mongomanager.component for
                 more info. Defaults to None.
             includeWaferLabels:
+            parallel (int, optional): If passed, components are split across
+                a pool of "parallel" processes. Results are returned in the
+                same order as in the serial case. Defaults to None.
+            datasheetOnly (bool, optional): If True, the components are
+                re-queried retrieving only their name, label and the selected
+                datasheet (see queryDatasheetComponents()), so that their
+                test history is never transferred. Defaults to False.
 
         Returns:
             List[dict] | pandas.DataFrame: The collected results.
         """        
         
+        if returnDataFrame:
+            builder = _columnarFrameBuilder()
+            self._appendData(builder, components, resultNames, requiredTags,
+                             tagsToExclude, locations,
+                             datasheetIndex = datasheetIndex,
+                             includeWaferLabels = includeWaferLabels,
+                             parallel = parallel,
+                             datasheetOnly = datasheetOnly)
+            return builder.frame()
+
+        components, datasheetIndex = self._sourceComponents(components,
+                                                datasheetIndex, datasheetOnly)
+        components = par.shipComponents(components, self._shippedFields, parallel)
+
+        scooped = par.mapChunks(_retrieveComponentsData, components, parallel,
+                                resultNames, requiredTags, tagsToExclude,
+                                locations, datasheetIndex, includeWaferLabels)
+
         allResults = []
+        for label, rows in scooped:
+            if includeWaferLabels:
+                rows = [{**{'label': label}, **s} for s in rows]
+            allResults.append(rows)
+            
+        # Returning
+            
+        return _joinListsOrNone(*allResults)
+
+    def _appendData(self, builder,
+                    components:list,
+                    resultNames:list = None,
+                    requiredTags:list = None,
+                    tagsToExclude:list = None,
+                    locations:list = None,
+                    *,
+                    datasheetIndex:int = None,
+                    includeWaferLabels:bool = False,
+                    constants:dict = None,
+                    parallel:int = None,
+                    datasheetOnly:bool = False):
+        """Appends the datasheet data of components to a _columnarFrameBuilder.
+
+        "constants" (e.g. {'wafer': <wafer name>}) are added as columns,
+        before the "label" column (if includeWaferLabels is True) and
+        before the datasheet columns. Other arguments are as for
+        retrieveData()."""
+
+        components, datasheetIndex = self._sourceComponents(components,
+                                                datasheetIndex, datasheetOnly)
+        components = par.shipComponents(components, self._shippedFields, parallel)
+
+        scooped = par.mapChunks(_retrieveComponentsData, components, parallel,
+                                resultNames, requiredTags, tagsToExclude,
+                                locations, datasheetIndex, includeWaferLabels)
+
+        constants = constants or {}
+
+        for label, rows in scooped:
+            if includeWaferLabels:
+                builder.append(rows, {**constants, 'label': label})
+            else:
+                builder.append(rows, constants)
+
+
+    def _regenerate(self, components:list,
+                    processStages:list = None,
+                    *,
+                    upload:bool = True,
+                    parallel:int = None) -> list:
+        """Generates a new datasheet for each of the components, using the
+        datasheet definition and the locations of their blueprint, and
+        optionally uploads them.
+
+        Blueprints are retrieved from the process-wide cache, and their
+        datasheet definition is extracted once for each blueprint. The
+        datasheets are generated in memory (by a pool of "parallel"
+        processes, if passed) and assigned to the components. If upload is
+        True, they are uploaded with a single unordered "bulk_write" that
+        sets only the "datasheetData" field (see mongoreader.bulk.setField()).
+
+        Args:
+            components (list[mom.component]): The components. Their test
+                history must be available.
+            processStages (list[str], optional): Passed as
+                requiredProcessStages to createAndStoreDatasheet().
+
+        Keyword Args:
+            upload (bool, optional): If True, the datasheets are uploaded.
+                Defaults to True.
+            parallel (int, optional): If passed, datasheets are generated by a
+                pool of "parallel" processes. Defaults to None.
+
+        Returns:
+            list[mom.component]: The components for which a datasheet has been
+                generated.
+        """
+
+        connection = self._obj.connection
+        components = [cmp for cmp in components if cmp is not None]
+
+        bpIDs = {cmp.ID: cmp.getField('blueprintID', verbose = False) for cmp in components}
+        bps = ch.blueprints.retrieveBlueprints(connection, list(bpIDs.values()))
+
+        definitions = {} # <blueprint ID>: (<datasheet definition>, <locations dict>)
+        items = []
+
         for cmp in components:
 
-            scoopedResults = cmp.Datasheet.retrieveData(
-                        resultNames,
-                        requiredTags,
-                        tagsToExclude,
-                        locations = locations,
-                        returnDataFrame = False,
-                        datasheetIndex = datasheetIndex,
-                        verbose = False
-                    )
+            bpID = bpIDs[cmp.ID]
+            bp = bps.get(mom.toObjectID(bpID)) if bpID is not None else None
+
+            if bp is None:
+                log.warning(f'Cannot generate the datasheet of "{cmp.name}": no blueprint found.')
+                continue
+
+            if bp.ID not in definitions:
+                definitions[bp.ID] = (bp.getDatasheetDefinition(),
+                                      bp.Locations.retrieveGroupsDict())
             
-            if scoopedResults is None:
+            DSD, locationsDict = definitions[bp.ID]
+
+            if DSD is None or locationsDict is None:
+                log.warning(f'Cannot generate the datasheet of "{cmp.name}": blueprint "{bp.name}" has no datasheet definition or locations.')
                 continue
 
-            if includeWaferLabels:
-                label = cmp.getField('_waferLabel', verbose = False)
-                scoopedResults = [{**{'label': label}, **s} for s in scoopedResults]
+            items.append((cmp, DSD, locationsDict))
 
-            allResults.append(scoopedResults)
-            
-        # Returning
-            
-        allResults = _joinListsOrNone(*allResults)
+        generated = par.mapChunks(_generateDatasheets, items, parallel, processStages)
 
-        if returnDataFrame:
-            return DataFrame(allResults)
+        regenerated = []
+        values = {} # <component ID>: <datasheetData>
+
+        for (cmp, _, _), datasheetData in zip(items, generated):
+
+            if datasheetData is None:
+                log.warning(f'Failed to generate the datasheet of "{cmp.name}".')
+                continue
+
+            cmp['datasheetData'] = datasheetData
+            regenerated.append(cmp)
+            values[cmp.ID] = datasheetData
+
+        log.spare(f'Generated {len(regenerated)} datasheets.')
+
+        if upload:
+            with mom.opened(connection):
+                modified = bulk.setComponentsField(connection, 'datasheetData', values)
+            log.spare(f'Uploaded {modified} datasheets.')
+
+        return regenerated
+
+    def _sourceComponents(self, components:list, datasheetIndex:int,
+                          datasheetOnly:bool) -> tuple:
+        """Returns the 2-tuple (<components>, <datasheetIndex>) from which
+        datasheet data are retrieved.
+        
+        If datasheetOnly is True, components are re-queried from the
+        database of the collation (self._obj.connection) with only the
+        selected datasheet; since each of them has then a single datasheet,
+        the returned index is None (the last one)."""
+
+        if not datasheetOnly:
+            return components, datasheetIndex
+
+        with mom.opened(self._obj.connection):
+            components = queryDatasheetComponents(self._obj.connection,
+                                [cmp.ID for cmp in components if cmp is not None],
+                                datasheetIndex)
+
+        return components, None
+
+
+class _columnarFrameBuilder:
+    """Builds a DataFrame column by column from batches of rows, without
+    creating merged per-row dictionaries or intermediate lists of rows.
+
+    Constant values (e.g. wafer name and label of a component) are added
+    to all the rows of a batch. When the same key is found in a row and in
+    the constants, the row value prevails. Missing values are None.
+    Columns listed in _columnarFrameBuilder.categoricalColumns are
+    converted to categorical.
+    """
+
+    categoricalColumns = ['batch', 'wafer', 'chipType', 'label',
+                          'resultName', 'location']
+
+    def __init__(self):
+        self._columns = {} # <key>: <list of values>
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def _column(self, key) -> list:
+        if key not in self._columns:
+            self._columns[key] = [None]*self._length
+        return self._columns[key]
+
+    def append(self, rows:list, constants:dict = None):
+        """Appends the rows (a list of dictionaries), adding the constants
+        to each of them."""
+
+        if not rows:
+            return
+
+        amount = len(rows)
+        constants = constants or {}
+
+        # Keys in order of first appearance
+        keys = {}
+        for row in rows:
+            keys.update(dict.fromkeys(row))
+
+        for key, value in constants.items():
+            if key not in keys:
+                self._column(key).extend([value]*amount)
+
+        for key in keys:
+            if key in constants:
+                default = constants[key]
+                self._column(key).extend([row.get(key, default) for row in rows])
+            else:
+                self._column(key).extend([row.get(key) for row in rows])
+
+        self._length += amount
+
+        # Padding columns not present in this batch
+        for column in self._columns.values():
+            if len(column) < self._length:
+                column.extend([None]*(self._length - len(column)))
+
+    def frame(self) -> DataFrame:
+        """Returns the DataFrame of the appended rows."""
+
+        frame = DataFrame(self._columns)
+
+        for col in self.categoricalColumns:
+            if col in frame:
+                frame[col] = frame[col].astype('category')
+
+        return frame
+
+
+def datasheetProjection(datasheetIndex:int = None) -> dict:
+    """Returns the projection that retrieves only the name, the wafer label
+    and the datasheet indexed by datasheetIndex of a component.
+
+    The "datasheetData" array is "$slice"d server-side, so that the other
+    datasheets and the test history are never transferred.
+
+    As for Python lists, components that have no datasheet at datasheetIndex
+    get an empty "datasheetData" array. "$slice" alone would instead return
+    the first datasheet for negative indexes past the start of the array
+    (e.g. -5 with 3 datasheets), so these are checked against the length of
+    the array.
+
+    Args:
+        datasheetIndex (int, optional): The index of the datasheet. Negative
+            indexes count from the end. If None, the last datasheet is
+            selected. Defaults to None.
+    """
+
+    if datasheetIndex is None:
+        datasheetIndex = -1
+
+    if not isinstance(datasheetIndex, int) or isinstance(datasheetIndex, bool):
+        raise TypeError('"datasheetIndex" must be an integer or None.')
+
+    if datasheetIndex >= -1:
+        # Positive indexes past the end already give an empty array
+        datasheetData = {'$slice': [datasheetIndex, 1]}
+
+    else:
+        datasheets = {'$ifNull': ['$datasheetData', []]}
+        datasheetData = {'$cond': [
+            {'$gte': [{'$size': datasheets}, -datasheetIndex]},
+            {'$slice': [datasheets, datasheetIndex, 1]},
+            [],
+        ]}
+
+    return {
+        'name': 1,
+        '_waferLabel': 1,
+        'datasheetData': datasheetData,
+    }
+
+
+def queryDatasheetComponents(connection:mom.connection, IDs:list,
+                             datasheetIndex:int = None) -> list:
+    """Retrieves with a single query the components whose ID is among "IDs",
+    with only their name, wafer label and the datasheet indexed by
+    datasheetIndex (see datasheetProjection()).
+
+    The returned components have a single datasheet, to be retrieved with
+    datasheetIndex = None. The connection must be opened.
+
+    Returns:
+        list[mongomanager.component]: The components, in the order of IDs.
+            Components that are not found are not present.
+    """
+
+    IDs = bulk._uniqueIDs(IDs)
+    cmps = bulk.queryComponentsByIDs(connection, IDs,
+                                     projection = datasheetProjection(datasheetIndex))
+    cmpsByID = {cmp.ID: cmp for cmp in cmps}
+
+    return [cmpsByID[ID] for ID in IDs if ID in cmpsByID]
+
+
+def _generateDatasheets(items:list, processStages:list) -> list:
+    """Generates the datasheet of each (<component>, <datasheet definition>,
+    <locations dict>) item, returning the list of the resulting
+    "datasheetData" fields (None where the generation failed). Defined at
+    module level so that it can be executed by a process pool (see
+    parallel.mapChunks())."""
+
+    generated = []
+    for cmp, DSD, locationsDict in items:
+
+        DS = cmp.Datasheet.createAndStoreDatasheet(None,
+                requiredProcessStages = processStages,
+                requiredStati = None,
+                datasheetDefinition = DSD,
+                locationsDict = locationsDict)
+
+        if DS is None:
+            generated.append(None)
+        else:
+            generated.append(cmp.getField('datasheetData', verbose = False))
+
+    return generated
+
+
+def _retrieveComponentsData(components:list,
+                            resultNames:list,
+                            requiredTags:list,
+                            tagsToExclude:list,
+                            locations:list,
+                            datasheetIndex:int,
+                            includeWaferLabels:bool) -> list:
+    """Returns a list of 2-tuples (<label>, <list of datasheet results>), one
+    for each component that has datasheet data. The label is None if
+    includeWaferLabels is False. Defined at module level so that it can be
+    executed by a process pool (see parallel.mapChunks()). Components can
+    be shipped with only their label and datasheets (see
+    parallel.shipComponents())."""
+
+    allResults = []
+    for cmp in components:
+
+        scoopedResults = par.receiveComponent(cmp).Datasheet.retrieveData(
+                    resultNames,
+                    requiredTags,
+                    tagsToExclude,
+                    locations = locations,
+                    returnDataFrame = False,
+                    datasheetIndex = datasheetIndex,
+                    verbose = False
+                )
+        
+        if scoopedResults is None:
+            continue
 
-        return allResults
+        label = None
+        if includeWaferLabels:
+            label = cmp.getField('_waferLabel', verbose = False)
 
+        allResults.append((label, scoopedResults))
 
+    return allResults
 
 
 def _joinListsOrNone(*args):
@@ -4,6 +4,8 @@ from mongoutils import queryUtils as qu
 import mongoreader.core as c
 import mongoreader.errors as e
 import mongoreader.datasheets as ds
+import mongoreader.bulk as bulk
+import mongoreader.cache as ch
 from pandas import DataFrame
 
 def queryModuleNames(conn, *strings, batch:str = None, printNames:bool = True) -> list:
@@ -181,6 +183,57 @@ class moduleCollation(c.collation):
 
         return f'Module collation "{name}"'
 
+    @classmethod
+    def _fromComponents(cls, connection:mom.connection, module:mom.component,
+                        COS:mom.component = None,
+                        chip:mom.component = None,
+                        *,
+                        moduleBlueprint:mom.blueprint = None,
+                        COSblueprint:mom.blueprint = None,
+                        chipBlueprint:mom.blueprint = None):
+        """Returns a moduleCollation built from documents that have already
+        been retrieved, without querying the database.
+
+        It is used by moduleBatch to wire up the collations of many modules
+        from the results of a few bulk queries.
+
+        Args:
+            connection (mongomanager.connection): The connection instance to 
+                the MongoDB server.
+            module (mongomanager.component): The module.
+            COS (mongomanager.component, optional): The COS of the module.
+                Defaults to None.
+            chip (mongomanager.component, optional): The chip of the COS.
+                Defaults to None.
+
+        Keyword Args:
+            moduleBlueprint (mongomanager.blueprint, optional): Defaults to
+                None.
+            COSblueprint (mongomanager.blueprint, optional): Defaults to None.
+            chipBlueprint (mongomanager.blueprint, optional): Defaults to None.
+
+        Returns:
+            moduleCollation: The collation.
+        """
+
+        if not isinstance(connection, mom.connection):
+            raise TypeError('"connection" must be a mongomanager connection object.')
+
+        collation = cls.__new__(cls)
+        collation.connection = connection
+
+        # Components
+        collation.module = module
+        collation.COS = COS
+        collation.chip = chip
+
+        # Blueprints
+        collation.moduleBlueprint = moduleBlueprint
+        collation.COSblueprint = COSblueprint
+        collation.chipBlueprint = chipBlueprint
+
+        return collation
+
 
 
     # --- collect methods ---
@@ -432,7 +485,7 @@ class moduleCollation(c.collation):
         """
 
         try:
-            bp = module.retrieveBlueprint(connection, verbose = False)
+            bp = ch.retrieveComponentBlueprint(connection, module)
         except Exception:
             if verbose: log.warning(f'Could not retrieve the blueprint associated to module "{module.name}".')
             return None
@@ -473,7 +526,7 @@ class moduleCollation(c.collation):
             return None
 
         try:
-            bp = COS.retrieveBlueprint(connection)
+            bp = ch.retrieveComponentBlueprint(connection, COS)
         except Exception:
             if verbose: log.warning(f'Could not retrieve the blueprint associated to COS "{COS.name}".')
             return None
@@ -520,7 +573,7 @@ class moduleCollation(c.collation):
             return None
 
         try:
-            bp = chip.retrieveBlueprint(connection)
+            bp = ch.retrieveComponentBlueprint(connection, chip)
         except Exception:
             if verbose: log.warning(f'Could not retrieve the blueprint associated to chip "{chip.name}".')
             return None
@@ -654,6 +707,7 @@ class _Datasheets(ds._DatasheetsBaseClass):
                     *,
                     returnDataFrame:bool = False,
                     datasheetIndex:int = None,
+                    datasheetOnly:bool = False,
                 ):
         """This method can be used to retrieve data from datasheets defined
         for the components of the module batch.
@@ -678,35 +732,88 @@ class _Datasheets(ds._DatasheetsBaseClass):
             datasheetIndex (int, optional): If passed, the datasheet indexed
                 by datasheetIndex is passed. See mongomanager.component for
                 more info. Defaults to None.
+            datasheetOnly (bool, optional): If True, only the names and the
+                selected datasheet of the modules are retrieved from the
+                database, with a "$slice" projection. Defaults to False.
 
         Returns:
             List[dict] | pandas.DataFrame: The collected results.
         """        
 
+        if returnDataFrame:
+            builder = ds._columnarFrameBuilder()
+            self._appendData(builder,
+                    self._obj.modules,
+                    resultNames,
+                    requiredTags,
+                    tagsToExclude,
+                    locations,
+                    datasheetIndex = datasheetIndex,
+                    constants = {'batch': self._obj.batch},
+                    datasheetOnly = datasheetOnly)
+            return builder.frame()
+
         scoopedResults = super().retrieveData(
                 self._obj.modules,
                 resultNames,
                 requiredTags,
                 tagsToExclude,
                 locations,
-                returnDataFrame = returnDataFrame,
-                datasheetIndex = datasheetIndex)
+                returnDataFrame = False,
+                datasheetIndex = datasheetIndex,
+                datasheetOnly = datasheetOnly)
 
         if scoopedResults is None:
             return None
 
-        if returnDataFrame:
-            scoopedResults.insert(0, "batch", len(scoopedResults)*[self._obj.batch])
-
-        else:
-            additionalInfo = {
-                    'batch': self._obj.batch,
-                }
-            scoopedResults = [{**additionalInfo, **res} for res in scoopedResults]
+        additionalInfo = {
+                'batch': self._obj.batch,
+            }
+        scoopedResults = [{**additionalInfo, **res} for res in scoopedResults]
             
         return scoopedResults
 
 
+    def regenerate(self,
+                   processStage_orStages = None,
+                   *,
+                   upload:bool = True,
+                   parallel:int = None) -> list:
+        """Generates new datasheets for the modules of the batch, using the
+        datasheet definitions of their blueprints, and uploads them with a
+        single unordered "bulk_write" that sets only their "datasheetData"
+        field.
+
+        Args:
+            processStage_orStages (str | list[str], optional): If passed, only
+                test entries whose process stage is among these are used to
+                generate the datasheets.
+
+        Keyword Args:
+            upload (bool, optional): If False, datasheets are only generated
+                and assigned to the modules. Defaults to True.
+            parallel (int, optional): If passed, datasheets are generated by a
+                pool of "parallel" processes. Defaults to None.
+
+        Returns:
+            list[mom.component]: The modules whose datasheet has been
+                regenerated.
+        """
+
+        if processStage_orStages is None:
+            processStages = None
+        elif isinstance(processStage_orStages, str):
+            processStages = [processStage_orStages]
+        elif isinstance(processStage_orStages, list) \
+            and all(isinstance(stage, str) for stage in processStage_orStages):
+            processStages = processStage_orStages
+        else:
+            raise TypeError('"processStage_orStages" must be a string, a list of strings, or None.')
+
+        return self._regenerate(self._obj.modules or [], processStages,
+                                upload = upload, parallel = parallel)
+
+
 @ds._attributeClassDecoratorMaker(_Datasheets)
 class moduleBatch:
 
@@ -714,6 +821,7 @@ class moduleBatch:
                  *,
                  verbose:bool = True):
 
+        self.connection = connection
         self.batch = batch
         self._modules = None
         self._moduleCollations = None
@@ -721,8 +829,12 @@ class moduleBatch:
         self._modules, self._moduleCollations = \
             self._collectComponents(connection, batch, regexStrings)
         
-        self._COSs = [mc.COS for mc in self._moduleCollations]
-        self._chips = [mc.chip for mc in self._moduleCollations]
+        if self._moduleCollations is None:
+            self._COSs = None
+            self._chips = None
+        else:
+            self._COSs = [mc.COS for mc in self._moduleCollations]
+            self._chips = [mc.chip for mc in self._moduleCollations]
 
         if verbose:
             mom.log.important(f'Collected {self._countList(self._modules)} modules')
@@ -924,25 +1036,97 @@ class moduleBatch:
 
 
     def _collectComponents(self, connection, batch, regexStrings):
-        
-        mods = self._queryModules(connection, batch, regexStrings)
+        """Collects the modules of the batch, their COSs and their chips, and
+        returns them together with the corresponding moduleCollation objects.
 
-        if mods is None:
-            return None
+        Documents are retrieved with three queries, independently of the
+        number of modules: one for the modules, one for all the COSs ("$in"
+        on the modules inner component IDs) and one for all the chips ("$in"
+        on the COSs inner component IDs).
+
+        As in moduleCollation, the COS is the first inner component of the
+        module that is retrieved, and the chip the first retrieved inner
+        component of the COS: inner components missing from the database
+        are skipped.
+
+        Returns:
+            tuple[list, list[moduleCollation]] | tuple[None, None]: The modules
+                and the module collations.
+        """
         
         with mom.opened(connection):
-            with mom.logMode(log, 'WARNING'):
-                modCollations = [moduleCollation(connection, mod,
-                                    collectBlueprints = False,
-                                    verbose = False) for mod in mods]
+
+            # Query 1: modules
+            mods = self._queryModules(connection, batch, regexStrings)
+
+            if mods is None:
+                return None, None
+            
+            # Query 2: COSs
+            COSIDs = self._innerComponentIDs(mods)
+            COSsByID = self._queryComponentsByID(connection,
+                                            [ID for IDs in COSIDs for ID in IDs])
+            COSs = [self._firstRetrieved(IDs, COSsByID) for IDs in COSIDs]
+
+            # Query 3: chips
+            chipIDs = self._innerComponentIDs(COSs)
+            chipsByID = self._queryComponentsByID(connection,
+                                            [ID for IDs in chipIDs for ID in IDs])
+            chips = [self._firstRetrieved(IDs, chipsByID) for IDs in chipIDs]
+
+        log.spare(f'Collected {len(COSs) - COSs.count(None)} COSs and {len(chips) - chips.count(None)} chips.')
+
+        modCollations = [moduleCollation._fromComponents(connection, mod, COS, chip)
+                         for mod, COS, chip in zip(mods, COSs, chips)]
+        
         return mods, modCollations
 
+    @staticmethod
+    def _innerComponentIDs(components:list) -> list:
+        """Returns, for each of the components, the list of the IDs of its
+        inner components. The list is empty for components that are None or
+        that have no inner components."""
+
+        IDs = []
+        for cmp in components:
+
+            if cmp is None:
+                IDs.append([])
+                continue
+
+            innerIDs = cmp.InnerComponents.retrieveIDs()
+            IDs.append([mom.toObjectID(ID) for ID in innerIDs] if innerIDs else [])
+
+        return IDs
+
+    @staticmethod
+    def _firstRetrieved(IDs:list, cmpsByID:dict):
+        """Returns the first component of cmpsByID ({<ID>: <cmp>}) whose ID
+        is in IDs, following their order, or None if none was retrieved."""
+
+        for ID in IDs:
+            if ID in cmpsByID:
+                return cmpsByID[ID]
+        return None
+
+    @staticmethod
+    def _queryComponentsByID(connection, IDs:list) -> dict:
+        """Retrieves the components whose ID is among "IDs" with a single
+        query, and returns them as a dictionary in the form {<ID>: <cmp>}."""
+
+        cmps = bulk.queryComponentsByIDs(connection, IDs)
+        return {mom.toObjectID(cmp.ID): cmp for cmp in cmps}
+
     @staticmethod
     def _collectBlueprintsForGroup(connection, group:list,
                                    *,
                                    verbose:bool = True):
-        """Given a group of components, this method queries the database and
-        returns all the blueprints associated to them.
+        """Given a group of components, this method returns all the
+        blueprints associated to them.
+
+        Blueprints are retrieved through the process-wide cache
+        mongoreader.cache.blueprints, so only those that are not cached are
+        queried from the database.
 
         Args:
             connection (mom.connection): The connection object to the MongoDB
@@ -961,19 +1145,8 @@ class moduleBatch:
         # Selecting only component instances (None is excluded)
         group = [cmp for cmp in group if isinstance(cmp, mom.component)]
         bpIDs = [cmp.getField('blueprintID', verbose = False) for cmp in group]
-        bpIDs = [mom.toObjectID(ID) for ID in bpIDs if ID is not None] # Removing None
-        bpIDs = list(set(bpIDs)) # Removing duplicates
 
-        bps = mom.query(connection, qu.among('_id', bpIDs), None,
-                        mom.blueprint.defaultDatabase,
-                        mom.blueprint.defaultCollection,
-                        returnType = 'native', verbose = verbose)
-
-        if bps is None:
-            return None
-
-        else:
-            bps = [bp for bp in bps if bp is not None]
+        bps = list(ch.blueprints.retrieveBlueprints(connection, bpIDs).values())
         
         if bps == []:
             return None
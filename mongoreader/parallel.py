@@ -0,0 +1,208 @@
+"""mongoreader.parallel
+
+This module contains utilities to split CPU-bound work on the components of
+a collation (e.g. walking their test history) across a pool of processes.
+
+Work is split in contiguous chunks, and the outputs are returned in the
+same order of the inputs, so that merged results are deterministic and
+identical to those obtained in a single process.
+
+Functions executed by the pool must be defined at module level, so that
+they can be pickled. Components should not be shipped whole to the pool:
+use shipComponents() to send only the fields the workers need.
+
+The pool is created the first time it is needed and reused by later calls.
+Use shutdown() to terminate its processes.
+"""
+
+import mongomanager as mom
+from mongomanager import log
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+_executor = None
+_executorWorkers = 0
+_executorLock = Lock()
+
+
+def checkParallel(parallel):
+    """Raises TypeError/ValueError if "parallel" is not None or a positive
+    integer."""
+
+    if parallel is None:
+        return
+
+    if not isinstance(parallel, int) or isinstance(parallel, bool):
+        raise TypeError('"parallel" must be None or a positive integer.')
+    if parallel < 1:
+        raise ValueError('"parallel" must be None or a positive integer.')
+
+
+def usesPool(items:list, parallel:int) -> bool:
+    """Returns True if mapChunks() processes items in a pool of processes."""
+    return parallel is not None and parallel > 1 and len(items) > 1
+
+
+def _pool(workers:int) -> ProcessPoolExecutor:
+    """Returns the process pool, creating it (or replacing it with a
+    larger one) if it has less than "workers" processes."""
+
+    global _executor, _executorWorkers
+
+    with _executorLock:
+
+        if _executor is None or _executorWorkers < workers:
+
+            # Tasks already submitted to the old pool are completed
+            if _executor is not None:
+                _executor.shutdown(wait = False)
+
+            _executor = ProcessPoolExecutor(max_workers = workers)
+            _executorWorkers = workers
+
+        return _executor
+
+
+def shutdown():
+    """Terminates the processes of the pool, if any. A new pool is created
+    by the next call to mapChunks() that needs it."""
+
+    global _executor, _executorWorkers
+
+    with _executorLock:
+
+        if _executor is not None:
+            _executor.shutdown()
+
+        _executor = None
+        _executorWorkers = 0
+
+
+def _discardPool(executor:ProcessPoolExecutor):
+    """Discards a broken pool, so that the next call creates a new one."""
+
+    global _executor, _executorWorkers
+
+    with _executorLock:
+        if _executor is executor:
+            _executor = None
+            _executorWorkers = 0
+
+
+class _shippedComponent:
+    """The ID, the name and some fields of a component, shipped to worker
+    processes instead of the whole document (see shipComponents())."""
+
+    def __init__(self, component, fields:list):
+        self.ID = component.ID
+        self.name = component.name
+        self.fields = {field: component.getField(field, verbose = False)
+                       for field in fields}
+
+    def getField(self, field:str, *args, **kwargs):
+        return self.fields.get(field)
+
+    def rebuild(self) -> mom.component:
+        """Returns a component containing only the shipped fields."""
+
+        component = mom.component()
+        for field, value in self.fields.items():
+            if value is not None:
+                component.setField(field, value)
+
+        return component
+
+
+def shipComponents(components:list, fields:list, parallel:int) -> list:
+    """Returns the components to be passed to mapChunks().
+
+    If they are processed in the current process, the components are
+    returned as they are. Otherwise, only their ID, their name and the
+    fields listed in "fields" are shipped to the worker processes, that
+    rebuild them with receiveComponent().
+
+    Args:
+        components (list[mongomanager.component]): The components.
+        fields (list[str]): The fields needed by the workers.
+        parallel (int | None): The number of processes.
+
+    Returns:
+        list: The components, or their shipped version.
+    """
+
+    if not usesPool(components, parallel):
+        return components
+
+    return [_shippedComponent(cmp, fields) for cmp in components]
+
+
+def receiveComponent(item):
+    """Returns the component shipped by shipComponents(), rebuilding it if
+    only its fields have been shipped."""
+
+    if isinstance(item, _shippedComponent):
+        return item.rebuild()
+
+    return item
+
+
+def splitChunks(items:list, amount:int) -> list:
+    """Splits items in (at most) "amount" contiguous chunks of similar
+    length. Empty chunks are not returned."""
+
+    size, remainder = divmod(len(items), amount)
+
+    chunks = []
+    start = 0
+    for index in range(amount):
+        end = start + size + (1 if index < remainder else 0)
+        if end > start:
+            chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
+def mapChunks(function, items:list, parallel:int, *args) -> list:
+    """Applies function(chunk, *args) to contiguous chunks of items using a
+    pool of "parallel" processes, and returns the concatenation of the
+    lists returned for each chunk, in order.
+
+    If parallel is None or 1, or if there is only one item, the function
+    is executed in the current process. Otherwise, the chunks are executed
+    by the shared process pool (see _pool()).
+
+    Args:
+        function (callable): A module-level function that takes a list of
+            items (and *args) and returns a list.
+        items (list): The items to be processed.
+        parallel (int | None): The number of processes.
+
+    Returns:
+        list: The joined outputs.
+    """
+
+    checkParallel(parallel)
+
+    if not usesPool(items, parallel):
+        return function(items, *args)
+
+    chunks = splitChunks(items, parallel)
+    log.debug(f'[mapChunks] Processing {len(items)} items in {len(chunks)} processes.')
+
+    executor = _pool(parallel)
+
+    try:
+        futures = [executor.submit(function, chunk, *args) for chunk in chunks]
+        outputs = [future.result() for future in futures]
+    except BrokenProcessPool:
+        _discardPool(executor)
+        raise
+
+    joined = []
+    for output in outputs:
+        joined += output
+
+    return joined
@@ -22,6 +22,8 @@ from mongomanager import (
 from pathlib import Path
 from numpy import random, linspace
 
+import mongoreader.cache as ch
+
 
 
 def _joinListsOrNone(*args):
@@ -134,10 +136,22 @@ class _waferPlotter:
             )
 
             # dicts, None if not found
-            self.chipP1P2s = waferBP.retrieveChipP1P2s(connection, verbose = False)
-            self.testChipP1P2s = waferBP.retrieveTestChipP1P2s(connection, verbose = False)
-            self.testCellP1P2s = waferBP.retrieveTestCellP1P2s(connection, verbose = False)
-            self.barsP1P2s = waferBP.retrieveBarP1P2s(connection, verbose = False)
+            # The geometry is shared between plotters of the same wafer blueprint
+            geometry = ch.geometries.get(waferBP.ID)
+
+            if geometry is None:
+                geometry = {
+                    'chips': waferBP.retrieveChipP1P2s(connection, verbose = False),
+                    'testChips': waferBP.retrieveTestChipP1P2s(connection, verbose = False),
+                    'testCells': waferBP.retrieveTestCellP1P2s(connection, verbose = False),
+                    'bars': waferBP.retrieveBarP1P2s(connection, verbose = False),
+                }
+                ch.geometries.put(waferBP.ID, geometry)
+
+            self.chipP1P2s = geometry['chips']
+            self.testChipP1P2s = geometry['testChips']
+            self.testCellP1P2s = geometry['testCells']
+            self.barsP1P2s = geometry['bars']
 
             self.allP1P2s = _joinDictsOrNone(
                 self.chipP1P2s,
@@ -1304,7 +1318,8 @@ def waferPlotter(connection, blueprint_orID_orName):
     elif isinstance(blueprint_orID_orName, str):
         waferBP = waferBlueprint.queryOneByName(connection, blueprint_orID_orName)
     elif isID(blueprint_orID_orName):
-        waferBP = importWaferBlueprint(waferBP, connection)
+        with opened(connection):
+            waferBP = ch.blueprints.retrieveBlueprint(connection, blueprint_orID_orName)
     else:
         raise TypeError('"blueprint_orID_orName" must be the wafer blueprint, or its name, or its ID.')
 
@@ -0,0 +1,868 @@
+"""mongoreader.results
+
+This module contains the resultStore class, a columnar in-memory table of
+the test results found in the test history of a group of components.
+
+The store is built once, flattening all the results into pandas columns
+(with categorical encoding for repeated strings), and then filtered with
+vectorized masks, so that retrieving many results from the same components
+does not require walking their test history again.
+
+Alternatively, a store containing only the results that satisfy a set of
+filters can be built server-side with an aggregation pipeline (see
+queryResultStore()), so that only the matching results cross the wire.
+"""
+
+import mongomanager as mom
+from mongomanager import log
+import mongoreader.bulk as bulk
+import mongoreader.parallel as par
+
+from datetime import timezone
+from numpy import nan, array, arange, inf, where, broadcast_to, sort, sqrt
+from pandas import DataFrame, Series, Timestamp, MultiIndex, to_datetime, factorize, concat
+
+
+class resultStore:
+    """Columnar store of the test results of a group of components.
+
+    Each row of the store is a test result, described by the columns
+    listed in resultStore.columns. The additional "numericValue" column
+    contains the values that are int or float as floats (NaN otherwise),
+    to be used by vectorized reductions.
+
+    Args:
+        componentsDict (dict): A dictionary in the form {<label>: <component>}.
+            The "testHistory" field of components must be available.
+        parallel (int, optional): If passed, the test histories are
+            flattened by a pool of "parallel" processes. Defaults to None.
+    """
+
+    columns = ['label', 'componentID', 'resultName', 'location', 'tags',
+               'value', 'error', 'unit', 'executionDate', 'processStage',
+               'status', 'testReportID', 'datasheetReady']
+
+    _categoricalColumns = ['label', 'resultName', 'location', 'unit',
+                           'processStage', 'status', 'testReportID']
+
+    def __init__(self, componentsDict:dict, parallel:int = None):
+
+        if not isinstance(componentsDict, dict):
+            raise TypeError('"componentsDict" must be a dictionary.')
+
+        # Only the compact raw data is shipped to worker processes
+        histories = [(label, cmp.ID, cmp.getField('testHistory', verbose = False))
+                     for label, cmp in componentsDict.items()]
+
+        rows = self._emptyRows()
+        for chunkRows in par.mapChunks(_historyRows, histories, parallel):
+            for col in self.columns:
+                rows[col] += chunkRows[col]
+
+        self._setFrame(rows)
+
+        log.debug(f'[resultStore] Stored {len(self.frame)} results of {len(componentsDict)} components.')
+
+    @classmethod
+    def _emptyRows(cls) -> dict:
+        return {col: [] for col in cls.columns}
+
+    @classmethod
+    def fromRows(cls, rows:dict):
+        """Builds a store from a dictionary in the form {<column>: <list>},
+        with the columns listed in resultStore.columns."""
+
+        store = cls.__new__(cls)
+        store._setFrame(rows)
+        return store
+
+    def _setFrame(self, rows:dict):
+
+        frame = DataFrame(rows, columns = self.columns)
+
+        for col in self._categoricalColumns:
+            frame[col] = frame[col].astype('category')
+
+        frame['executionDate'] = to_datetime(frame['executionDate'],
+                                             utc = True, errors = 'coerce')
+
+        # Non-int/float values are ignored by averages
+        frame['numericValue'] = array([float(v) if isinstance(v, (int, float)) else nan
+                                       for v in frame['value']], dtype = float)
+
+        self.frame = frame
+        self._tagMasks = {} # tag -> boolean Series
+
+    def append(self, rows:dict, dropMask:Series = None):
+        """Appends the results in "rows" (a dictionary in the form
+        {<column>: <list>}, see fromRows()) at the end of the store.
+
+        Args:
+            rows (dict): The results to be appended.
+            dropMask (Series, optional): If passed, the results of the store
+                selected by this mask are removed first (e.g. those replaced
+                by the appended ones). Defaults to None.
+        """
+
+        new = resultStore.fromRows(rows).frame
+        old = self.frame if dropMask is None else self.frame[~dropMask]
+
+        # Categories are merged by converting the columns back and forth
+        asObject = {col: object for col in self._categoricalColumns}
+        frame = concat([old.astype(asObject), new.astype(asObject)], ignore_index = True)
+
+        for col in self._categoricalColumns:
+            frame[col] = frame[col].astype('category')
+
+        self.frame = frame
+        self._tagMasks = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _tagMask(self, tag:str) -> Series:
+        """Returns the (memoized) mask of the results that have "tag"."""
+
+        if tag not in self._tagMasks:
+            self._tagMasks[tag] = self.frame['tags'].map(lambda tags: tag in tags).astype(bool)
+
+        return self._tagMasks[tag]
+
+    @staticmethod
+    def _timestamp(date) -> Timestamp:
+        """Converts a datetime to a UTC timestamp. Naive datetimes are
+        assumed to be in UTC."""
+
+        date = Timestamp(date)
+        if date.tzinfo is None:
+            return date.tz_localize(timezone.utc)
+        return date.tz_convert(timezone.utc)
+
+    def mask(self,
+            labels:list = None,
+            resultNames:list = None,
+            locationsDict:dict = None,
+            searchDatasheetData:bool = False,
+            requiredStati:list = None,
+            requiredProcessStages:list = None,
+            requiredTags:list = None,
+            tagsToExclude:list = None,
+            earliestExecutionDate = None,
+            latestExecutionDate = None,
+            requiredTestReportID = None) -> Series:
+        """Returns the boolean mask of the results that satisfy all the
+        passed filters. Filters set to None are not applied.
+
+        Args:
+            labels (list[str], optional): The labels of the components.
+            resultNames (list[str], optional): The result names.
+            locationsDict (dict, optional): A dictionary in the form
+                {<label>: <list of locations> | None}. For labels associated
+                to a list, only results at those locations are kept. Labels
+                associated to None, or not present, are not filtered.
+            searchDatasheetData (bool, optional): If True, only results for
+                which "datasheetReady" is True are kept. Defaults to False.
+            requiredStati (list[str], optional): The allowed stati of the
+                components at the time of the test (the "status" field of
+                the test history entry, as for scoopComponentResults()).
+            requiredProcessStages (list[str], optional): The allowed process
+                stages.
+            requiredTags (list[str], optional): Results must have all these
+                tags.
+            tagsToExclude (list[str], optional): Results must have none of
+                these tags.
+            earliestExecutionDate (datetime, optional): Results executed
+                before this date are discarded.
+            latestExecutionDate (datetime, optional): Results executed after
+                this date are discarded.
+            requiredTestReportID (ID, optional): The test report ID.
+
+        Returns:
+            pandas.Series: The boolean mask.
+        """
+
+        frame = self.frame
+        mask = Series(True, index = frame.index)
+
+        if labels is not None:
+            mask &= frame['label'].isin(labels)
+
+        if resultNames is not None:
+            mask &= frame['resultName'].isin(resultNames)
+
+        if locationsDict is not None:
+
+            filtered = [label for label, locs in locationsDict.items() if locs is not None]
+
+            if filtered != []:
+                pairs = [(label, loc) for label in filtered for loc in locationsDict[label]]
+
+                if pairs == []:
+                    pairMask = False
+                else:
+                    pairMask = MultiIndex.from_arrays([frame['label'].astype(object),
+                                                       frame['location'].astype(object)]).isin(pairs)
+
+                mask &= ~frame['label'].isin(filtered) | pairMask
+
+        if searchDatasheetData:
+            mask &= frame['datasheetReady']
+
+        if requiredStati is not None:
+            mask &= frame['status'].isin(requiredStati)
+
+        if requiredProcessStages is not None:
+            mask &= frame['processStage'].isin(requiredProcessStages)
+
+        for tag in requiredTags or []:
+            mask &= self._tagMask(tag)
+
+        for tag in tagsToExclude or []:
+            mask &= ~self._tagMask(tag)
+
+        if earliestExecutionDate is not None:
+            mask &= frame['executionDate'] >= self._timestamp(earliestExecutionDate)
+
+        if latestExecutionDate is not None:
+            mask &= frame['executionDate'] <= self._timestamp(latestExecutionDate)
+
+        if requiredTestReportID is not None:
+            mask &= frame['testReportID'] == str(requiredTestReportID)
+
+        return mask
+
+    def select(self, *args, **kwargs) -> DataFrame:
+        """Returns the rows of the store that satisfy the filters. Arguments
+        are passed to mask()."""
+        return self.frame[self.mask(*args, **kwargs)]
+
+    def dataDictionaryRecords(self, *args, **kwargs) -> list:
+        """Returns the results that satisfy the filters as a list of minimal
+        dictionaries in the form
+
+        {'label': <label>, 'value': <value>, 'location': <location>}.
+
+        Arguments are passed to mask()."""
+
+        selected = self.select(*args, **kwargs)
+
+        return [{'label': label, 'value': value, 'location': location}
+                for label, value, location in zip(selected['label'].astype(object),
+                                                  selected['value'],
+                                                  selected['location'].astype(object))]
+
+    def _lastResults(self, mask:Series) -> DataFrame:
+        """Returns the results selected by mask, keeping only the last one
+        for each (label, resultName, location). Key columns are converted
+        from categorical to object."""
+
+        keys = ['label', 'resultName', 'location']
+
+        selected = self.frame.loc[mask, keys + ['value', 'numericValue', 'unit']]
+        selected = selected.astype({key: object for key in keys + ['unit']})
+        
+        return selected.drop_duplicates(keys, keep = 'last')
+
+    def matrix(self, mask:Series,
+               labels:list = None,
+               resultNames:list = None,
+               *,
+               averaged:bool = False) -> DataFrame:
+        """Returns the results selected by mask as a wide table, whose rows
+        are component labels and whose columns are (resultName, location)
+        pairs.
+
+        When more results are found for the same label, result name and
+        location, the last one is used (as for data dictionaries).
+
+        Args:
+            mask (Series): The boolean mask of the results (see mask()).
+            labels (list[str], optional): If passed, it determines the rows of
+                the table (labels with no results have missing values).
+            resultNames (list[str], optional): If passed, it determines the
+                order of the result names in the columns.
+
+        Keyword Args:
+            averaged (bool, optional): If True, values are averaged over the
+                locations of each result name, and the columns are the result
+                names. Non-int/float values are ignored, as in
+                mongoreader.wafers.averageSubchipScaleDataDict(). Defaults to
+                False.
+
+        Returns:
+            DataFrame: The wide table.
+        """
+
+        keys = ['label', 'resultName', 'location']
+
+        selected = self._lastResults(mask)
+
+        if averaged:
+            table = selected.groupby(['label', 'resultName'])['numericValue'].mean().unstack('resultName')
+        else:
+            table = selected.set_index(keys)['value'].unstack(['resultName', 'location'])
+
+        if labels is not None:
+            table = table.reindex(labels)
+
+        if resultNames is not None:
+            if averaged:
+                table = table.reindex(columns = resultNames)
+            else:
+                order = {name: index for index, name in enumerate(resultNames)}
+                columns = sorted(table.columns, key = lambda col: order.get(col[0], len(order)))
+                table = table.reindex(columns = MultiIndex.from_tuples(columns, names = ['resultName', 'location'])
+                                      if columns != [] else table.columns)
+
+        table.index.name = 'label'
+        return table
+
+    statistics = ['mean', 'median', 'std', 'min', 'max', 'count', 'unit']
+
+    def chipScaleStatistics(self, mask:Series,
+                            labels:list = None,
+                            resultNames:list = None) -> DataFrame:
+        """Returns chip-scale statistics of the results selected by mask, as
+        a DataFrame whose rows are component labels and whose columns are
+        (resultName, statistic) pairs, with the statistics listed in
+        resultStore.statistics.
+
+        Statistics are computed over the locations of each component (the
+        last result for each location is used), ignoring non-int/float
+        values. "std" is the population standard deviation. "count" is the
+        number of values used.
+
+        Units follow the rules of averageSubchipScaleDataDict() in
+        mongoreader.wafers: None units are ignored, while non-string units
+        and different units for the same label and result name raise
+        ValueError.
+
+        Args:
+            mask (Series): The boolean mask of the results (see mask()).
+            labels (list[str], optional): If passed, it determines the rows of
+                the table. Defaults to None.
+            resultNames (list[str], optional): If passed, it determines the
+                order of the result names in the columns. Defaults to None.
+
+        Raises:
+            ValueError: If units are not consistent.
+
+        Returns:
+            DataFrame: The statistics.
+        """
+
+        selected = self._lastResults(mask)
+
+        if resultNames is None:
+            resultNames = list(dict.fromkeys(selected['resultName']))
+
+        columns = MultiIndex.from_product([resultNames, self.statistics],
+                                          names = ['resultName', 'statistic'])
+        
+        if len(selected) == 0:
+            return DataFrame(index = labels, columns = columns).rename_axis('label')
+
+        grouped = selected.groupby(['label', 'resultName'])
+
+        values = grouped['numericValue']
+        stats = DataFrame({
+            'mean': values.mean(),
+            'median': values.median(),
+            'std': values.std(ddof = 0),
+            'min': values.min(),
+            'max': values.max(),
+            'count': values.count(),
+        })
+
+        units = grouped['unit']
+        if any(not isinstance(unit, str) for unit in selected['unit'].dropna().unique()):
+            raise ValueError(f'Cannot average if dataclass units are not equal or None.')
+
+        inconsistent = units.nunique() > 1
+        if inconsistent.any():
+            label, name = inconsistent[inconsistent].index[0]
+            raise ValueError(f'Cannot average if dataclass units are not equal or None ("{name}" of "{label}").')
+        
+        stats['unit'] = units.first()
+
+        table = stats.unstack('resultName')
+        table.columns = table.columns.swaplevel(0, 1)
+        table.columns.names = ['resultName', 'statistic']
+        table = table.reindex(columns = columns)
+
+        if labels is not None:
+            table = table.reindex(labels)
+
+        table.index.name = 'label'
+        return table
+
+    def catalog(self, chipTypesDict:dict = None) -> DataFrame:
+        """Returns the catalog of the results in the store, a DataFrame
+        indexed by result name with the columns listed in catalogColumns:
+        
+        - "count": The number of results.
+        - "components": The number of components with the result.
+        - "chipTypes": The chip types of these components (only if
+            chipTypesDict is passed).
+        - "locations", "tags", "units", "processStages": The sorted lists of
+            the values found for the result.
+        - "firstExecutionDate", "lastExecutionDate": The execution date
+            range of the result.
+
+        Args:
+            chipTypesDict (dict, optional): A dictionary in the form
+                {<label>: <chipType>}. Defaults to None.
+
+        Returns:
+            DataFrame: The catalog.
+        """
+
+        frame = self.frame
+
+        records = []
+        for name, group in frame.groupby(frame['resultName'].astype(object), sort = False):
+
+            labels = group['label'].astype(object).unique()
+            
+            records.append({
+                'resultName': name,
+                'count': len(group),
+                'components': group['componentID'].nunique(),
+                'chipTypes': _sortedValues(chipTypesDict.get(label) for label in labels)
+                             if chipTypesDict is not None else None,
+                'locations': _sortedValues(group['location']),
+                'tags': _sortedValues(tag for tags in group['tags'] for tag in tags),
+                'units': _sortedValues(group['unit']),
+                'processStages': _sortedValues(group['processStage']),
+                'firstExecutionDate': group['executionDate'].min(),
+                'lastExecutionDate': group['executionDate'].max(),
+            })
+
+        return _catalogFrame(records)
+
+
+catalogColumns = ['count', 'components', 'chipTypes', 'locations', 'tags',
+                  'units', 'processStages', 'firstExecutionDate',
+                  'lastExecutionDate']
+
+def reduceSubchipArray(labels:list, values, mask, units = None) -> DataFrame:
+    """Computes chip-scale statistics of sub-chip-scale data stored as a
+    dense (label x location) array, using vectorized reductions.
+
+    Args:
+        labels (list): The labels of the L rows.
+        values (numpy.ndarray): The (L, M) float array of values, whose rows
+            are labels and whose columns are locations.
+        mask (numpy.ndarray): The (L, M) boolean array, True where values
+            are to be used.
+        units (numpy.ndarray, optional): The units as an object array of
+            strings or None, with shape (M,) (one unit per column) or (L, M).
+            None units are ignored. Defaults to None.
+
+    Raises:
+        ValueError: If the (non-None) units of a row are not equal, or if
+            they are not strings.
+
+    Returns:
+        DataFrame: A DataFrame indexed by label with the columns listed in
+            resultStore.statistics. "std" is the population standard
+            deviation; statistics are NaN for rows with no values.
+    """
+
+    values = array(values, dtype = float)
+    mask = array(mask, dtype = bool)
+
+    count = mask.sum(axis = 1)
+    empty = count == 0
+    divisor = where(empty, 1, count)
+
+    zeroed = where(mask, values, 0.)
+    mean = zeroed.sum(axis = 1) / divisor
+    std = sqrt((where(mask, values - mean[:, None], 0.)**2).sum(axis = 1) / divisor)
+
+    minimum = where(mask, values, inf).min(axis = 1, initial = inf)
+    maximum = where(mask, values, -inf).max(axis = 1, initial = -inf)
+
+    # Median: valid values are sorted before NaNs
+    ordered = sort(where(mask, values, nan), axis = 1)
+    rows = arange(len(labels))
+    lower = ordered[rows, (divisor - 1) // 2] if ordered.shape[1] > 0 else mean
+    upper = ordered[rows, divisor // 2] if ordered.shape[1] > 0 else mean
+    middle = (lower + upper) / 2
+
+    for stat in [mean, std, minimum, maximum, middle]:
+        stat[empty] = nan
+
+    stats = DataFrame({
+        'mean': mean,
+        'median': middle,
+        'std': std,
+        'min': minimum,
+        'max': maximum,
+        'count': count,
+    }, index = labels)
+
+    # Units are checked once for all the rows
+    if units is None:
+        stats['unit'] = None
+    else:
+        units = array(units, dtype = object)
+        codes, uniques = factorize(units.ravel()) # None -> -1
+
+        if any(not isinstance(unit, str) for unit in uniques):
+            raise ValueError(f'Cannot average if dataclass units are not equal or None.')
+
+        codes = broadcast_to(codes.reshape(units.shape), values.shape)
+        highest = codes.max(axis = 1, initial = -1)
+        lowest = where(codes >= 0, codes, len(uniques)).min(axis = 1, initial = len(uniques))
+
+        inconsistent = (highest >= 0) & (lowest != highest)
+        if inconsistent.any():
+            label = labels[inconsistent.argmax()]
+            raise ValueError(f'Cannot average if dataclass units are not equal or None ("{label}").')
+
+        uniques = list(uniques)
+        stats['unit'] = [uniques[code] if code >= 0 else None for code in highest]
+
+    return stats[resultStore.statistics]
+
+
+def _historyRows(histories:list) -> list:
+    """Flattens the test histories of a list of components into the columns
+    of a resultStore.
+
+    Args:
+        histories (list): A list of (<label>, <component ID>, <testHistory>)
+            tuples.
+
+    Returns:
+        list: A list containing a single dictionary in the form
+            {<column>: <list>}, as required by parallel.mapChunks().
+    """
+
+    rows = resultStore._emptyRows()
+
+    for label, ID, history in histories:
+
+        if history is None: continue
+
+        for entry in history:
+
+            results = entry.get('results')
+            if results is None: continue
+
+            testReportID = entry.get('testReportID')
+            if testReportID is not None: testReportID = str(testReportID)
+
+            for res in results:
+
+                data = res.get('resultData') or {}
+
+                rows['label'].append(label)
+                rows['componentID'].append(ID)
+                rows['resultName'].append(res.get('resultName'))
+                rows['location'].append(res.get('location'))
+                rows['tags'].append(frozenset(res.get('resultTags') or []))
+                rows['value'].append(data.get('value'))
+                rows['error'].append(data.get('error'))
+                rows['unit'].append(data.get('unit'))
+                rows['executionDate'].append(entry.get('executionDate'))
+                rows['processStage'].append(entry.get('processStage'))
+                rows['status'].append(entry.get('status'))
+                rows['testReportID'].append(testReportID)
+                rows['datasheetReady'].append(res.get('datasheetReady') is True)
+
+    return [rows]
+
+
+def _sortedValues(values) -> list:
+    """Returns the sorted list of the distinct values, without None/NaN."""
+
+    values = {v for v in values if v is not None and v == v} # NaN != NaN
+    
+    try:
+        return sorted(values)
+    except TypeError: # Mixed types
+        return sorted(values, key = str)
+
+def _catalogFrame(records:list) -> DataFrame:
+    catalog = DataFrame(records, columns = ['resultName'] + catalogColumns)
+    return catalog.set_index('resultName')
+
+
+# ------------------------------------------------------------------------------
+# Server-side filtering
+
+def compileResultPipeline(componentIDs:list,
+            resultNames:list = None,
+            locationsDict:dict = None,
+            searchDatasheetData:bool = False,
+            requiredStati:list = None,
+            requiredProcessStages:list = None,
+            requiredTags:list = None,
+            tagsToExclude:list = None,
+            earliestExecutionDate = None,
+            latestExecutionDate = None,
+            requiredTestReportID = None) -> list:
+    """Compiles the filters of resultStore.mask() into an aggregation
+    pipeline on the components collection, in the form
+
+    $match -> $project -> $unwind testHistory -> $match
+        -> $unwind results -> $match -> $project
+
+    The output documents contain the fields "_id" (the component ID),
+    "resultName", "location", "tags", "value", "error", "unit",
+    "executionDate", "processStage", "status", "testReportID" and
+    "datasheetReady".
+
+    Args:
+        componentIDs (list[ID]): The IDs of the components.
+        locationsDict (dict, optional): A dictionary in the form
+            {<component ID>: <list of locations> | None}. Note that, unlike
+            resultStore.mask(), it is keyed by component ID.
+
+    See resultStore.mask() for the other arguments.
+
+    Returns:
+        list[dict]: The aggregation pipeline.
+    """
+
+    componentIDs = bulk._uniqueIDs(componentIDs)
+
+    # Filters on the whole document (use indexes, if any)
+    docMatch = {'_id': {'$in': componentIDs}}
+    if resultNames is not None:
+        docMatch['testHistory.results.resultName'] = {'$in': resultNames}
+
+    # Filters on test entries
+    entryMatch = {}
+    if requiredStati is not None:
+        entryMatch['testHistory.status'] = {'$in': requiredStati}
+    if requiredProcessStages is not None:
+        entryMatch['testHistory.processStage'] = {'$in': requiredProcessStages}
+    
+    dateMatch = {}
+    if earliestExecutionDate is not None:
+        dateMatch['$gte'] = earliestExecutionDate
+    if latestExecutionDate is not None:
+        dateMatch['$lte'] = latestExecutionDate
+    if dateMatch != {}:
+        entryMatch['testHistory.executionDate'] = dateMatch
+    
+    if requiredTestReportID is not None:
+        entryMatch['testHistory.testReportID'] = mom.toObjectID(requiredTestReportID)
+
+    # Filters on results
+    resultMatch = {}
+    if resultNames is not None:
+        resultMatch['testHistory.results.resultName'] = {'$in': resultNames}
+    if searchDatasheetData:
+        resultMatch['testHistory.results.datasheetReady'] = True
+
+    tagsMatch = {}
+    if requiredTags:
+        tagsMatch['$all'] = requiredTags
+    if tagsToExclude:
+        tagsMatch['$nin'] = tagsToExclude
+    if tagsMatch != {}:
+        resultMatch['testHistory.results.resultTags'] = tagsMatch
+
+    if locationsDict is not None:
+        filtered = {mom.toObjectID(ID): locs for ID, locs in locationsDict.items()
+                    if locs is not None}
+
+        if filtered != {}:
+            resultMatch['$or'] = \
+                [{'_id': {'$nin': list(filtered)}}] + \
+                [{'_id': ID, 'testHistory.results.location': {'$in': locs}}
+                 for ID, locs in filtered.items()]
+
+    pipeline = [
+        {'$match': docMatch},
+        {'$project': {'testHistory': 1}},
+        {'$unwind': '$testHistory'},
+    ]
+
+    if entryMatch != {}:
+        pipeline.append({'$match': entryMatch})
+
+    pipeline.append({'$unwind': '$testHistory.results'})
+
+    if resultMatch != {}:
+        pipeline.append({'$match': resultMatch})
+
+    pipeline.append({'$project': {
+        '_id': 1,
+        'resultName': '$testHistory.results.resultName',
+        'location': '$testHistory.results.location',
+        'tags': '$testHistory.results.resultTags',
+        'value': '$testHistory.results.resultData.value',
+        'error': '$testHistory.results.resultData.error',
+        'unit': '$testHistory.results.resultData.unit',
+        'executionDate': '$testHistory.executionDate',
+        'processStage': '$testHistory.processStage',
+        'status': '$testHistory.status',
+        'testReportID': '$testHistory.testReportID',
+        'datasheetReady': '$testHistory.results.datasheetReady',
+    }})
+
+    return pipeline
+
+
+def aggregateResultStore(collection, componentsDict:dict,
+                         locationsDict:dict = None,
+                         **filters) -> resultStore:
+    """Builds a resultStore containing only the results of the components
+    in "componentsDict" that satisfy the filters, running the pipeline
+    returned by compileResultPipeline() on "collection".
+
+    Rows are ordered as in a store built client-side from componentsDict.
+
+    Args:
+        collection (pymongo.collection.Collection): The components
+            collection.
+        componentsDict (dict): A dictionary in the form {<label>: <component>}.
+            Only the "_id" of the components is used.
+        locationsDict (dict, optional): A dictionary in the form
+            {<label>: <list of locations> | None}. See resultStore.mask().
+        **filters: The other filters of resultStore.mask().
+
+    Returns:
+        resultStore: The store.
+    """
+
+    IDtoLabel = {mom.toObjectID(cmp.ID): label for label, cmp in componentsDict.items()}
+
+    if locationsDict is not None:
+        locationsDict = {componentsDict[label].ID: locs
+                         for label, locs in locationsDict.items()
+                         if label in componentsDict}
+
+    pipeline = compileResultPipeline(list(IDtoLabel), locationsDict = locationsDict, **filters)
+
+    # Grouping by component to preserve the client-side order
+    docsByID = {ID: [] for ID in IDtoLabel}
+    for doc in collection.aggregate(pipeline):
+        docsByID[doc['_id']].append(doc)
+
+    rows = resultStore._emptyRows()
+
+    for ID, docs in docsByID.items():
+        for doc in docs:
+
+            testReportID = doc.get('testReportID')
+            if testReportID is not None: testReportID = str(testReportID)
+
+            rows['label'].append(IDtoLabel[ID])
+            rows['componentID'].append(ID)
+            rows['resultName'].append(doc.get('resultName'))
+            rows['location'].append(doc.get('location'))
+            rows['tags'].append(frozenset(doc.get('tags') or []))
+            rows['value'].append(doc.get('value'))
+            rows['error'].append(doc.get('error'))
+            rows['unit'].append(doc.get('unit'))
+            rows['executionDate'].append(doc.get('executionDate'))
+            rows['processStage'].append(doc.get('processStage'))
+            rows['status'].append(doc.get('status'))
+            rows['testReportID'].append(testReportID)
+            rows['datasheetReady'].append(doc.get('datasheetReady') is True)
+
+    store = resultStore.fromRows(rows)
+    log.debug(f'[aggregateResultStore] Retrieved {len(store)} results of {len(componentsDict)} components.')
+
+    return store
+
+
+def queryResultStore(connection:mom.connection, componentsDict:dict,
+                     locationsDict:dict = None,
+                     **filters) -> resultStore:
+    """Works like aggregateResultStore(), running the aggregation on the
+    default components collection.
+    
+    The connection must be opened."""
+
+    collection = bulk._collection(connection,
+                                  mom.component.defaultDatabase,
+                                  mom.component.defaultCollection)
+
+    return aggregateResultStore(collection, componentsDict, locationsDict, **filters)
+
+
+def compileCatalogPipeline(componentIDs:list) -> list:
+    """Returns the aggregation pipeline that groups the results of the
+    components by result name, computing the fields of the result catalog
+    (see resultStore.catalog()) server-side."""
+
+    return [
+        {'$match': {'_id': {'$in': bulk._uniqueIDs(componentIDs)}}},
+        {'$project': {'testHistory': 1}},
+        {'$unwind': '$testHistory'},
+        {'$unwind': '$testHistory.results'},
+        {'$group': {
+            '_id': '$testHistory.results.resultName',
+            'count': {'$sum': 1},
+            'componentIDs': {'$addToSet': '$_id'},
+            'locations': {'$addToSet': '$testHistory.results.location'},
+            'tags': {'$addToSet': '$testHistory.results.resultTags'},
+            'units': {'$addToSet': '$testHistory.results.resultData.unit'},
+            'processStages': {'$addToSet': '$testHistory.processStage'},
+            'firstExecutionDate': {'$min': '$testHistory.executionDate'},
+            'lastExecutionDate': {'$max': '$testHistory.executionDate'},
+        }},
+    ]
+
+
+def aggregateResultCatalog(collection, componentsDict:dict,
+                           chipTypesDict:dict = None) -> DataFrame:
+    """Works like resultStore.catalog(), but the catalog is computed with
+    a "$group" aggregation on collection (see compileCatalogPipeline()), so
+    that the test history of the components is not downloaded.
+
+    Args:
+        collection (pymongo.collection.Collection): The components
+            collection.
+        componentsDict (dict): A dictionary in the form {<label>: <component>}.
+            Only the "_id" of the components is used.
+        chipTypesDict (dict, optional): A dictionary in the form
+            {<label>: <chipType>}. Defaults to None.
+
+    Returns:
+        DataFrame: The catalog.
+    """
+
+    IDtoLabel = {mom.toObjectID(cmp.ID): label for label, cmp in componentsDict.items()}
+
+    records = []
+    for doc in collection.aggregate(compileCatalogPipeline(list(IDtoLabel))):
+
+        labels = [IDtoLabel[ID] for ID in doc['componentIDs']]
+
+        records.append({
+            'resultName': doc['_id'],
+            'count': doc['count'],
+            'components': len(labels),
+            'chipTypes': _sortedValues(chipTypesDict.get(label) for label in labels)
+                         if chipTypesDict is not None else None,
+            'locations': _sortedValues(doc['locations']),
+            'tags': _sortedValues(tag for tags in doc['tags'] if tags for tag in tags),
+            'units': _sortedValues(doc['units']),
+            'processStages': _sortedValues(doc['processStages']),
+            'firstExecutionDate': to_datetime(doc['firstExecutionDate'], utc = True, errors = 'coerce'),
+            'lastExecutionDate': to_datetime(doc['lastExecutionDate'], utc = True, errors = 'coerce'),
+        })
+
+    return _catalogFrame(records)
+
+
+def queryResultCatalog(connection:mom.connection, componentsDict:dict,
+                       chipTypesDict:dict = None) -> DataFrame:
+    """Works like aggregateResultCatalog(), running the aggregation on the
+    default components collection.
+    
+    The connection must be opened."""
+
+    collection = bulk._collection(connection,
+                                  mom.component.defaultDatabase,
+                                  mom.component.defaultCollection)
+
+    return aggregateResultCatalog(collection, componentsDict, chipTypesDict)
@@ -7,6 +7,10 @@ import mongoreader.core as c
 import mongoreader.errors as e
 import mongoreader.plotting.waferPlotting as wplt
 import mongoreader.datasheets as ds
+import mongoreader.bulk as bulk
+import mongoreader.cache as ch
+import mongoreader.results as rs
+import mongoreader.parallel as par
 
 from datautils import dataClass
 
@@ -16,8 +20,18 @@ from mongoutils.connections import opened
 
 from mongomanager.errors import DocumentNotFound
 
-from numpy import average
-from pandas import DataFrame, concat
+from numpy import arange, average, array, bincount, full, nan, repeat, where, zeros
+from pandas import DataFrame, Series, factorize
+
+from pathlib import Path
+from datetime import datetime
+from time import time
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from itertools import chain
+from operator import methodcaller
+from inspect import signature
 
 
 class _Datasheets(ds._DatasheetsBaseClass):
@@ -37,6 +51,8 @@ class _Datasheets(ds._DatasheetsBaseClass):
                     *,
                     returnDataFrame:bool = False,
                     datasheetIndex:int = None,
+                    parallel:int = None,
+                    datasheetOnly:bool = False,
                 ):
         """This method can be used to retrieve data from datasheets defined
         for the components of the wafer collation.
@@ -74,6 +90,14 @@ class _Datasheets(ds._DatasheetsBaseClass):
             datasheetIndex (int, optional): If passed, the datasheet indexed
                 by datasheetIndex is passed. See mongomanager.component for
                 more info. Defaults to None.
+            parallel (int, optional): If passed, the components of each chip
+                type are split across a pool of "parallel" processes. Results
+                are merged in label order. Defaults to None.
+            datasheetOnly (bool, optional): If True, only the names, labels
+                and the selected datasheet of the components are retrieved
+                from the database, with a "$slice" projection, instead of
+                using (and possibly loading) the full documents. Defaults to
+                False.
 
         Returns:
             List[dict] | pandas.DataFrame: The collected results.
@@ -81,6 +105,32 @@ class _Datasheets(ds._DatasheetsBaseClass):
         
         if chipTypes is None:
             chipTypes = ['chips']
+
+        if not datasheetOnly:
+            self._obj._loadFields(['datasheetData'])
+
+        if returnDataFrame:
+
+            builder = ds._columnarFrameBuilder()
+
+            for chipType in chipTypes:
+                labels = self._obj._selectLabels([chipType], chipGroupsDict)
+                components = [self._obj._allComponentsDict[lab] for lab in labels]
+
+                self._appendData(builder,
+                        components,
+                        resultNames,
+                        requiredTags,
+                        tagsToExclude,
+                        locations,
+                        datasheetIndex = datasheetIndex,
+                        includeWaferLabels = True,
+                        constants = {'wafer': self._obj.wafer.name,
+                                     'chipType': chipType},
+                        parallel = parallel,
+                        datasheetOnly = datasheetOnly)
+
+            return builder.frame() if chipTypes != [] else None
         
         scoopedResults = []
 
@@ -94,24 +144,20 @@ class _Datasheets(ds._DatasheetsBaseClass):
                     requiredTags,
                     tagsToExclude,
                     locations,
-                    returnDataFrame = returnDataFrame,
+                    returnDataFrame = False,
                     datasheetIndex = datasheetIndex,
-                    includeWaferLabels=True)
+                    includeWaferLabels=True,
+                    parallel = parallel,
+                    datasheetOnly = datasheetOnly)
 
             if chipTypeResults is None:
                 continue
 
-            if returnDataFrame:
-                chipTypeResults.insert(0, "chipType", len(chipTypeResults)*[chipType])
-                chipTypeResults.insert(0, "wafer", len(chipTypeResults)*[self._obj.wafer.name])
-
-            else:
-                additionalInfo = {
-                        'wafer': self._obj.wafer.name,
-                        'chipType': chipType,
-                    }
-                chipTypeResults = [{**additionalInfo, **res} for res in chipTypeResults]
-                
+            additionalInfo = {
+                    'wafer': self._obj.wafer.name,
+                    'chipType': chipType,
+                }
+            chipTypeResults = [{**additionalInfo, **res} for res in chipTypeResults]
             
             scoopedResults.append(chipTypeResults)
             
@@ -120,11 +166,69 @@ class _Datasheets(ds._DatasheetsBaseClass):
         if scoopedResults == []:
             return None
 
-        if returnDataFrame:
-            return concat(scoopedResults, ignore_index = True)
+        return _joinListsOrNone(*scoopedResults)
+
+    def regenerate(self,
+                   processStage_orStages = None,
+                   chipTypes:list = None,
+                   chipGroupsDict:dict = None,
+                   *,
+                   upload:bool = True,
+                   parallel:int = None) -> list:
+        """Generates new datasheets for the components of the collation, using
+        the datasheet definitions of their blueprints, and uploads them.
+
+        Datasheets are generated in memory (by a pool of processes if
+        "parallel" is passed) and uploaded with a single unordered
+        "bulk_write" that sets only the "datasheetData" field of the
+        components, instead of replacing each document.
+
+        Args:
+            processStage_orStages (str | list[str], optional): If passed, only
+                test entries whose process stage is among these are used to
+                generate the datasheets.
+            chipTypes (List[str], optional): Pass a list containing any of the
+                following to select which wafer components are considered:
+                "chips", "testChips", "bars", "testCells".
+                Defaults to ["chips"].
+            chipGroupsDict (dict, optional): If passed, it can be used to filter
+                which group for each chipType is considered (see
+                retrieveData()).
+
+        Keyword Args:
+            upload (bool, optional): If False, datasheets are only generated
+                and assigned to the components of the collation. Defaults to
+                True.
+            parallel (int, optional): If passed, datasheets are generated by a
+                pool of "parallel" processes. Defaults to None.
+
+        Returns:
+            list[str]: The labels of the components whose datasheet has been
+                regenerated.
+        """
 
+        if processStage_orStages is None:
+            processStages = None
+        elif isinstance(processStage_orStages, str):
+            processStages = [processStage_orStages]
+        elif isListOfStrings(processStage_orStages):
+            processStages = processStage_orStages
         else:
-            return _joinListsOrNone(*scoopedResults)
+            raise TypeError('"processStage_orStages" must be a string, a list of strings, or None.')
+
+        if chipTypes is None:
+            chipTypes = ['chips']
+
+        labels = self._obj._selectLabels(chipTypes, chipGroupsDict) or []
+
+        self._obj._loadHeavyFields()
+
+        components = [self._obj._allComponentsDict[label] for label in labels]
+        regenerated = self._regenerate(components, processStages,
+                                       upload = upload, parallel = parallel)
+        
+        regeneratedIDs = {cmp.ID for cmp in regenerated}
+        return [label for label, cmp in zip(labels, components) if cmp.ID in regeneratedIDs]
 
     def _retrieveDatadictData(self,
                     resultName:str, # A single one
@@ -165,33 +269,122 @@ class _Datasheets(ds._DatasheetsBaseClass):
         returnAveraged: If True, to each component label is assigned a single
             result.
 
+        See also retrieveDataDicts(), to build many dictionaries at once.
+        """
+
+        pair = (resultName, locationGroup)
+
+        return self.retrieveDataDicts([pair],
+                    chipTypes,
+                    chipGroupsDict,
+                    requiredTags,
+                    tagsToExclude,
+                    datasheetIndex = datasheetIndex,
+                    returnValuesOnly = returnValuesOnly,
+                    returnAveraged = returnAveraged)[pair]
+
+    def retrieveDataDicts(self,
+                    pairs:list,
+                    chipTypes = None,
+                    chipGroupsDict:dict = None,
+                    requiredTags:list = None,
+                    tagsToExclude:list = None,
+                    *,
+                    datasheetIndex:int = None,
+                    returnValuesOnly:bool = False,
+                    returnAveraged:bool = False,
+                ) -> dict:
+        """Builds the data dictionaries of many (resultName, locationGroup)
+        pairs at once, retrieving the datasheet of each chip only once.
+
+        For each pair, the data dictionary is in the form
+        
+        {
+            <component label 1>: {
+                <location 1>: <scooped result dict>,
+                <location 2>: <scooped result dict>,
+                ...
+            },
+            ...
+        }
+
+        as returned by _retrieveDatadictData(). For each chip, the datasheet
+        data of all the requested result names and locations are retrieved
+        with a single call, and then dispatched to the data dictionaries.
+        This is useful to plot many datasheet results of the same wafer.
+
+        Args:
+            pairs (list[tuple[str, str]]): The (resultName, locationGroup)
+                pairs.
+            chipTypes (List[str], optional): Pass a list containing any of the
+                following to select which wafer components are considered:
+                "chips", "testChips", "bars", "testCells".
+                Defaults to all of them.
+            chipGroupsDict (dict, optional): If passed, it can be used to filter
+                which group for each chipType is considered (see
+                retrieveData()).
+            requiredTags (list[str], optional): If passed, results which lack
+                the tags listed here are ignored. Defaults to None.
+            tagsToExclude (list[str], optional): If passed, results that have
+                tags listed here are ignored. Defaults to None.
+
+        Keyword Args:
+            datasheetIndex (int, optional): If passed, the datasheet indexed
+                by datasheetIndex is passed. See mongomanager.component for
+                more info. Defaults to None.
+            returnValuesOnly (bool, optional): If True, the result dicts are
+                replaced with their values. Defaults to False.
+            returnAveraged (bool, optional): If True, to each component label
+                is assigned a single result (see averageSubchipScaleDataDict()).
+                Defaults to False.
+
+        Returns:
+            dict: A dictionary in the form {(<resultName>, <locationGroup>):
+                <data dictionary>}.
         """
 
-        cmpLabels = self._obj._selectLabels(chipTypes, chipGroupsDict)
+        if not isinstance(pairs, list):
+            raise TypeError('"pairs" must be a list of (resultName, locationGroup) tuples.')
+        for pair in pairs:
+            if not isinstance(pair, tuple) or len(pair) != 2 \
+                or not all(isinstance(el, str) for el in pair):
+                raise TypeError('"pairs" must be a list of (resultName, locationGroup) tuples.')
+
+        cmpLabels = self._obj._selectLabels(chipTypes, chipGroupsDict) or []
+
+        self._obj._loadFields(['datasheetData'])
 
-        dataDict = {label: None for label in cmpLabels}
+        dataDicts = {pair: {label: None for label in cmpLabels} for pair in pairs}
 
         for label in cmpLabels:
             
             chip = self._obj._allComponentsDict[label]
-            bp = self._obj._allComponentBPdict[label]
 
-            # Retrieving locations
-            locations = bp.Locations.retrieveGroupElements(locationGroup)
-            
-            if locationGroup is None:
-                log.warning(f'Could not retrieve locations for chip "{chip.name}".')
-                continue
+            # Retrieving locations. {<resultName>: [<pair>, ...]}
+            pairsByName = {}
+            allLocations = {}
+
+            for pair in pairs:
+                resultName, locationGroup = pair
+                locations = self._obj._labels.locations(label, locationGroup)
+
+                if locations is None:
+                    log.warning(f'Could not retrieve locations for chip "{chip.name}".')
+                    continue
 
-            dataDict[label] = {loc: None for loc in locations}
+                dataDicts[pair][label] = {loc: None for loc in locations}
+                pairsByName.setdefault(resultName, []).append(pair)
+                allLocations.update(dict.fromkeys(locations))
+
+            if pairsByName == {}: continue
 
             # Scooped results for the given chip
             # List of dictionaries
             scoopedDicts = chip.Datasheet.retrieveData(
-                [resultName],
+                list(pairsByName),
                 requiredTags,
                 tagsToExclude,
-                locations,
+                list(allLocations),
                 returnDataFrame = False,
                 datasheetIndex = datasheetIndex,
                 verbose = False)
@@ -211,15 +404,18 @@ class _Datasheets(ds._DatasheetsBaseClass):
                         value = data.get('value')
 
                     log.debug(f'Value: {value}')
-
-                    dataDict[label][loc] = value
                 else:
-                    dataDict[label][loc] = scooped
+                    value = scooped
+
+                for pair in pairsByName.get(scooped.get('resultName'), []):
+                    if loc in dataDicts[pair][label]:
+                        dataDicts[pair][label][loc] = value
 
         if returnAveraged:
-            dataDict = averageSubchipScaleDataDict(dataDict)
+            dataDicts = {pair: averageSubchipScaleDataDict(dataDict)
+                         for pair, dataDict in dataDicts.items()}
         
-        return dataDict
+        return dataDicts
 
     def retrieveAveragedData(self,
             resultName:str,
@@ -382,7 +578,7 @@ class _Datasheets(ds._DatasheetsBaseClass):
                 tags listed here are ignored. Defaults to None.
         """
 
-        plt = wplt.waferPlotter(self._obj.connection, self._obj.waferBlueprint)
+        plt = self._obj.wplt
 
         if chipTypes is None: chipTypes = ['chips']
 
@@ -486,7 +682,7 @@ class _Datasheets(ds._DatasheetsBaseClass):
                 tags listed here are ignored. Defaults to None.
         """
 
-        plt = wplt.waferPlotter(self._obj.connection, self._obj.waferBlueprint)
+        plt = self._obj.wplt
     
         if chipTypes is None: chipTypes = ['chips']
 
@@ -525,6 +721,217 @@ class _Datasheets(ds._DatasheetsBaseClass):
         return dataDict
 
 
+def _scoopComponentResults(items:list, waferName:str,
+                           scoopReturnType:str, filters:dict) -> list:
+    """Scoops the results of a list of (<label>, <component>, <locations>)
+    tuples, adding wafer-scale information ("wafer", "componentName",
+    "componentID" and "label") to each result.
+
+    Defined at module level so that it can be executed by a process pool
+    (see mongoreader.parallel.mapChunks()). Components can be shipped
+    with only their test history (see mongoreader.parallel.shipComponents()).
+    
+    Returns:
+        list[dict]: The scooped results, in the order of items.
+    """
+
+    allScooped = []
+
+    for serial, cmp, locations in items:
+
+        scooped = cmpGoggles.scoopComponentResults(
+                        par.receiveComponent(cmp),
+                        filters['resultNames'],
+                        locations, # All location names
+                        filters['searchDatasheetData'],
+                        filters['requiredStati'],
+                        filters['requiredProcessStages'],
+                        filters['requiredTags'],
+                        filters['tagsToExclude'],
+                        filters['earliestExecutionDate'],
+                        filters['latestExecutionDate'],
+                        filters['requiredTestReportID'],
+                        returnType = scoopReturnType)
+        
+        if scooped is None: continue
+        
+        # Adding wafer-scale information
+        additional = {'wafer': waferName,
+                      'componentName': cmp.name,
+                      'componentID': cmp.ID,
+                      'label': serial}
+        
+        allScooped += [{**additional, **s} for s in scooped]
+
+    return allScooped
+
+
+def _memoizedQuery(method):
+    """Decorator for waferCollation methods whose output is stored in the
+    query cache of the collation, keyed by the method name and by its
+    arguments ("verbose" and "parallel" excluded).
+
+    Results are returned as shallow copies (see _shallowCopy()).
+
+    Calls with serverSide = True are not memoized, since they query the
+    database each time to reflect its current content."""
+
+    methodSignature = signature(method)
+    missing = object()
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+
+        if self._queryCache is None:
+            return method(self, *args, **kwargs)
+
+        bound = methodSignature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        if bound.arguments.get('serverSide', False):
+            return method(self, *args, **kwargs)
+
+        arguments = {name: value for name, value in bound.arguments.items()
+                     if name not in ['self', 'verbose', 'parallel']}
+
+        key = (method.__name__, ch.freeze(arguments))
+        
+        result = self._queryCache.get(key, missing)
+        if result is missing:
+            result = method(self, *args, **kwargs)
+            self._queryCache.put(key, result)
+        else:
+            log.debug(f'[{method.__name__}] Result retrieved from the query cache.')
+
+        return _shallowCopy(result)
+
+    return wrapper
+
+
+def _shallowCopy(result):
+    """Returns a shallow copy of an entry of the query cache: DataFrames are
+    copied with copy(deep = False), and lists of dictionaries are copied
+    together with each dictionary. Nested values (e.g. lists of tags or
+    testResult objects) are shared with the cached entry, and must not be
+    modified in place."""
+
+    if isinstance(result, DataFrame):
+        return result.copy(deep = False)
+    
+    if isinstance(result, list):
+        return [dict(el) if isinstance(el, dict) else el for el in result]
+    
+    return result
+
+
+def _dataDictionaryRecords(scooped:list) -> list:
+    """Converts results scooped with returnType = "DataFrameDictionary" (see
+    _scoopComponentResults()) into the minimal dictionaries of data
+    dictionaries, in the form
+    
+    {'label': <label>, 'value': <value>, 'location': <location>}."""
+
+    return [{'label': s.get('label'),
+             'value': s.get('resultValue'),
+             'location': s.get('location')} for s in scooped]
+
+
+class _labelIndex:
+    """Index of the labels of a wafer collation, built once from the wafer
+    blueprint and used to resolve label selections and location groups
+    without traversing the blueprints at each call.
+
+    Selections are memoized. The index must be rebuilt
+    when the collation documents change (see
+    waferCollation._joinCollectedDocuments()).
+    """
+
+    def __init__(self, collation):
+
+        self._collation = collation
+
+        # {<chipType>: <labels>}
+        self.chipTypeLabels = {}
+
+        # {(<chipType>, <group>): <labels>}
+        self.groupLabels = {}
+
+        # {<label>: <chipType>} and {<label>: <list of groups>}
+        self.chipTypes = {}
+        self.groups = {}
+
+        for chipType in collation._allowedChipTypes:
+
+            attributeClass = collation._waferBlueprintAttributeClassFromType(chipType)
+
+            labels = attributeClass.retrieveLabels() or []
+            self.chipTypeLabels[chipType] = labels
+            for label in labels:
+                self.chipTypes[label] = chipType
+                self.groups[label] = []
+
+            for group in attributeClass.retrieveGroupNames() or []:
+                groupLabels = attributeClass.retrieveGroupLabels(group) or []
+                self.groupLabels[(chipType, group)] = groupLabels
+                for label in groupLabels:
+                    self.groups.setdefault(label, []).append(group)
+
+        self._selections = {}
+
+    def component(self, label:str):
+        """Returns the component associated to label, or None."""
+        cmpsDict = self._collation._allComponentsDict
+        return cmpsDict.get(label) if cmpsDict is not None else None
+
+    def blueprint(self, label:str):
+        """Returns the blueprint associated to label, or None."""
+        bpDict = self._collation._allComponentBPdict
+        return bpDict.get(label) if bpDict is not None else None
+
+    def select(self, chipTypes:list, chipGroupsDict:dict) -> list:
+        """Returns the labels corresponding to the combination of chipTypes
+        and chipGroupsDict (see waferCollation._selectLabels()), or None.
+        
+        Arguments are not validated."""
+
+        if chipTypes is None:
+            chipTypes = self._collation._allowedChipTypes
+        
+        if chipGroupsDict is None:
+            chipGroupsDict = {chipType: None for chipType in chipTypes}
+
+        key = tuple((chipType, None if groups is None else tuple(groups))
+                    for chipType, groups in chipGroupsDict.items())
+
+        if key not in self._selections:
+
+            labels = []
+            for chipType, groups in key:
+
+                if groups is None:
+                    labels += self.chipTypeLabels.get(chipType, [])
+                else:
+                    for group in groups:
+                        labels += self.groupLabels.get((chipType, group), [])
+
+            self._selections[key] = labels or None
+
+        selected = self._selections[key]
+        return list(selected) if selected is not None else None
+
+    def locations(self, label:str, locationGroup:str) -> list:
+        """Returns the locations associated to locationGroup for the
+        component with the given label, or None if they are not found.
+
+        Location groups are resolved through the process-wide resolver
+        (see mongoreader.cache.locationGroups), or through the resolver of
+        the collation if the process-wide caches are disabled. Both are
+        keyed by blueprint ID, so that labels sharing a blueprint share the
+        same lookup."""
+
+        resolver = ch.locationGroups if ch.enabled() else self._collation._locationGroups
+        return resolver.retrieveLocations(self.blueprint(label), locationGroup)
+
+
 @ds._attributeClassDecoratorMaker(_Datasheets)
 class waferCollation(c.collation):
     """A waferCollation is a class used to collect from the database a wafer,
@@ -559,7 +966,13 @@ class waferCollation(c.collation):
 
     """
 
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID,
+                 *,
+                 bulkLoad:bool = False,
+                 lazy:bool = False,
+                 cache:Path = None,
+                 blueprintCache:ch.blueprintCache = None,
+                 queryCacheSize:int = 64):
         """Initialization method of the waferCollation class.
 
         The main purpose of this method is to retrieve the component and
@@ -576,6 +989,45 @@ class waferCollation(c.collation):
             waferName_orCmp_orID (str | mongomanager.component | ObjectId): The 
                 collation wafer.
 
+        Keyword Args:
+            bulkLoad (bool, optional): If True, the wafer children and its
+                test cells are retrieved with a single "$in" query, and the
+                wafer blueprint and the component blueprints with another
+                one, instead of being imported family by family. Components
+                are assigned to chip types by blueprint ID, as in the default
+                case. See _bulkCollectDocuments() for more info. Defaults to
+                False.
+            lazy (bool, optional): If True, components are retrieved with
+                their lightweight fields only (name, label, blueprint ID,
+                status, process stage and last status log entry). Heavy fields
+                such as "testHistory" and "datasheetData" are retrieved with a
+                single query the first time a method needs them. Methods that
+                scoop test results retrieve only the results of the selected
+                components with the requested names and locations (see
+                _loadTestHistories()). Implies bulkLoad = True. Defaults to
+                False.
+            cache (Path, optional): If passed, it is the folder where a
+                snapshot of the collation documents is stored, keyed by the
+                wafer ID. When a snapshot exists, only the documents that
+                changed since it was saved are retrieved from the database.
+                Changes are detected through the size of the documents, the
+                length of their history arrays and their status and process
+                stage: an edit that leaves all of them unchanged (e.g. a
+                corrected result value) is not detected until the snapshot
+                expires, after waferCollation.snapshotMaxAge seconds.
+                Snapshots are pickle files: only use folders whose content
+                you trust. See _cachedCollectDocuments() for more info.
+                Implies bulkLoad = True. Defaults to None.
+            blueprintCache (mongoreader.cache.blueprintCache, optional): The
+                cache through which blueprints are retrieved when the
+                collation is bulk-loaded, loaded from a snapshot or
+                refreshed. If None,
+                the process-wide cache mongoreader.cache.blueprints is used.
+                Defaults to None.
+            queryCacheSize (int, optional): The maximum number of scooped
+                results kept in the query cache of the collation (see
+                queryCacheInfo()). Pass 0 to disable the cache. Defaults to 64.
+
         Raises:
             ImplementationError: When 
             TypeError: If arguments are not specified correctly.
@@ -586,6 +1038,34 @@ class waferCollation(c.collation):
 
         self.connection = connection
 
+        if not isinstance(queryCacheSize, int):
+            raise TypeError('"queryCacheSize" must be a non-negative integer.')
+        if queryCacheSize < 0:
+            raise ValueError('"queryCacheSize" must be a non-negative integer.')
+
+        # LRU cache of scooped results, cleared when documents change
+        self._queryCache = ch._LRUcache(queryCacheSize) if queryCacheSize > 0 else None
+
+        # Location groups resolved by blueprint, used when the process-wide
+        # caches are disabled (see _labelIndex.locations())
+        self._locationGroups = ch.locationGroupResolver()
+
+        # Fields fully retrieved for the components (None if full documents)
+        self._loadedFields = self._projectedFields(self._lightweightProjection) if lazy else None
+
+        # Components whose test history is partially retrieved, in the form
+        # {<ID>: (<result names>, <locations>)} (see _loadTestHistories())
+        self._historyScopes = {}
+
+        # Cache through which bulk loads, snapshots and refresh() retrieve
+        # blueprints
+        self._blueprintCache = ch.blueprints if blueprintCache is None else blueprintCache
+
+        # Modification markers of the collected documents, used by refresh()
+        self._markers = {}
+        self._cacheFolder = cache
+        self._snapshotSavedAt = None
+
         with opened(connection):
 
             # Collecting wafer
@@ -595,64 +1075,74 @@ class waferCollation(c.collation):
             else:
                 self.wafer = self._collectWafer(waferName_orCmp_orID)
 
-            # Collecting wafer blueprint
-            self.waferBlueprint = self._collectWaferBlueprint(self.wafer)
-            
-        
-            # Collecting chip blueprints
-            self.chipBlueprints, self.chipBPdict = \
-                 self._collectChipBlueprints(self.waferBlueprint)
-
-            # Collecting test chip blueprints
-            self.testChipBlueprints, self.testChipBPdict = \
-                 self._collectTestChipBlueprints(self.waferBlueprint)
+            if cache is not None:
 
-            # Collecting bar blueprints
-            self.barBlueprints, self.barBPdict = \
-                 self._collectBarBlueprints(self.waferBlueprint)
+                # Collecting blueprints and components from the local snapshot
+                self._cachedCollectDocuments(self.wafer, cache,
+                        projection = self._lightweightProjection if lazy else None,
+                        blueprintCache = blueprintCache)
 
-            # Collecting test cell blueprints
-            self.testCellBlueprints, self.testCellBPdict = \
-                 self._collectTestCellBlueprints(self.waferBlueprint)
+            elif bulkLoad or lazy:
 
-            self._allComponentBPdict = _joinDictsOrNone(
-                self.chipBPdict,
-                self.testChipBPdict,
-                self.barBPdict,
-                self.testCellBPdict
-            )
+                # Collecting blueprints and components in a few queries
+                self._bulkCollectDocuments(self.wafer,
+                        projection = self._lightweightProjection if lazy else None,
+                        blueprintCache = blueprintCache)
 
-            # Dictionary containing all the chipType -> allowed groups relations
-            self._allowedGroupsDict = {
-                'chips': self.waferBlueprint.ChipBlueprints.retrieveGroupNames(),
-                'testChips': self.waferBlueprint.TestChipBlueprints.retrieveGroupNames(),
-                'testCells': self.waferBlueprint.TestCellBlueprints.retrieveGroupNames(),
-                'bars': self.waferBlueprint.BarBlueprints.retrieveGroupNames(),
-            }
+            else:
 
+                # Collecting wafer blueprint
+                self.waferBlueprint = self._collectWaferBlueprint(self.wafer)
+                
+            
+                # Collecting chip blueprints
+                self.chipBlueprints, self.chipBPdict = \
+                    self._collectChipBlueprints(self.waferBlueprint)
+
+                # Collecting test chip blueprints
+                self.testChipBlueprints, self.testChipBPdict = \
+                    self._collectTestChipBlueprints(self.waferBlueprint)
+
+                # Collecting bar blueprints
+                self.barBlueprints, self.barBPdict = \
+                    self._collectBarBlueprints(self.waferBlueprint)
+
+                # Collecting test cell blueprints
+                self.testCellBlueprints, self.testCellBPdict = \
+                    self._collectTestCellBlueprints(self.waferBlueprint)
+
+                # Collecting chips, testChips and bars
+                self.chips, self.chipsDict, \
+                self.testChips, self.testChipsDict, \
+                self.bars, self.barsDict = \
+                    self._collectChipsalike(self.wafer,
+                                self.chipBlueprints, self.chipBPdict,
+                                self.testChipBlueprints, self.testChipBPdict,
+                                self.barBlueprints, self.barBPdict,
+                                )
+
+                # Collecting testCells
+                self.testCells, self.testCellsDict = \
+                    self._collectTestCells(self.wafer, self. testCellBlueprints, self.testCellBPdict)
+
+            self._joinCollectedDocuments()
+        
+        # wafer plotter, built the first time it is needed (see wplt)
+        self._waferPlotter = None
 
-            # Collecting chips, testChips and bars
-            self.chips, self.chipsDict, \
-            self.testChips, self.testChipsDict, \
-            self.bars, self.barsDict = \
-                self._collectChipsalike(self.wafer,
-                            self.chipBlueprints, self.chipBPdict,
-                            self.testChipBlueprints, self.testChipBPdict,
-                            self.barBlueprints, self.barBPdict,
-                            )
+    @property
+    def wplt(self):
+        """The wafer plotter of the collation.
 
-            self.allChips = _joinListsOrNone(self.chips, self.testChips)
-            self.allChipsDict = _joinDictsOrNone(self.chipsDict, self.testChipsDict)
+        It is built the first time it is accessed, so that collations that
+        never plot anything do not retrieve the wafer geometry. The geometry
+        itself is shared between collations of the same wafer blueprint
+        through mongoreader.cache.geometries."""
 
-            # Collecting testCells
-            self.testCells, self.testCellsDict = \
-                self._collectTestCells(self.wafer, self. testCellBlueprints, self.testCellBPdict)
-            
-            self._allComponentsDict = _joinDictsOrNone(self.allChipsDict, self.barsDict, self.testCellsDict)
-        
-            # wafer plotter
+        if self._waferPlotter is None:
+            self._waferPlotter = wplt.waferPlotter(self.connection, self.waferBlueprint)
 
-            self.wplt = wplt.waferPlotter(self.connection, self.waferBlueprint)
+        return self._waferPlotter
 
 
     # --- collect methods ---
@@ -705,7 +1195,7 @@ class waferCollation(c.collation):
             waferBlueprint: The retrieved wafer blueprint document.
         """
 
-        wbp = wafer.retrieveBlueprint(self.connection, verbose = False)
+        wbp = ch.retrieveComponentBlueprint(self.connection, wafer)
     
         if wbp is None:
             raise DocumentNotFound('Could not retrieve the wafer blueprint.')
@@ -737,7 +1227,16 @@ class waferCollation(c.collation):
             raise ValueError(f'"BPtype" ("{BPtype}") is not among "chipBlueprints", "testChipBlueprints", "barBlueprints" and "testCellBlueprints".')
 
         # {ID: {'document': <blueprint>, 'labels': <list of labels>}, ...}
-        BPsDict = attributeClass.retrieveElements(self.connection, grouped = True, verbose = False)
+        # Grouped elements are shared between collations of the same mask set
+        cacheKey = (waferBlueprint.ID, BPtype)
+        BPsDict = ch.blueprintGroups.get(cacheKey)
+
+        if BPsDict is None:
+            BPsDict = attributeClass.retrieveElements(self.connection, grouped = True, verbose = False)
+            
+            if BPsDict is not None:
+                ch.blueprintGroups.put(cacheKey, BPsDict)
+                ch.blueprints.update([dic.get('document') for dic in BPsDict.values()])
 
         if BPsDict is None:
             log.warning(f'Could not retrieve any {BPtype}.')
@@ -779,44 +1278,80 @@ class waferCollation(c.collation):
         return self._collectChipBPalikes(waferBlueprint, 'testCellBlueprints')
         
 
-    def _collectChipsalike_commonFunction(self, what, allChips, bps, bpDict):
+    def _indexComponents(self, components:list, families:dict) -> dict:
+        """Assigns the components to their chip types in a single pass,
+        indexing them by blueprint ID and by "_waferLabel".
 
-        expectedAmount = len(bpDict) if bpDict is not None else 0
+        As when filtering the components family by family, a component whose
+        blueprint belongs to more than one family is assigned to all of them.
 
-        if bps is None:
-            log.spare(f'No blueprints for {what} blueprints. No {what}s collected')
-            return None, None
+        Args:
+            components (list[mongomanager.component]): The components to be
+                assigned.
+            families (dict): A dictionary in the form
+                {<chipType>: (<blueprints>, <blueprintsDict>), ...}
+                where <blueprintsDict> is in the form {<label>: <blueprint>}.
+
+        Returns:
+            dict: A dictionary in the form
+                {<chipType>: (<components>, <componentsDict>), ...}
+                where each element of the tuples is None if empty.
+        """
 
-        bpIDs = [bp.ID for bp in bps]
+        # {<blueprint ID>: [<chipType>, ...]}
+        bpIDtoChipTypes = {}
+        for chipType, (bps, _) in families.items():
+            if bps is None:
+                log.spare(f'No blueprints for {self._chipTypeNames[chipType]} blueprints. No {self._chipTypeNames[chipType]}s collected')
+                continue
+            for bp in bps:
+                chipTypes = bpIDtoChipTypes.setdefault(bp.ID, [])
+                if chipType not in chipTypes:
+                    chipTypes.append(chipType)
 
-        log.debug(f'[_collectChipsalike_commonFunction] ({what}): bpIDs: {bpIDs}')
-        log.debug(f'[_collectChipsalike_commonFunction] ({what}): bpDict: {bpDict}')
+        cmps = {chipType: [] for chipType in families}
+        cmpsDicts = {chipType: {} for chipType in families}
 
-        # Collecting chips
-        chips = [chip for chip in allChips if chip.blueprintID in bpIDs]
-        log.info(f'Collected {len(chips)} {what}s.')
-        if len(chips) != expectedAmount:
-            log.warning(f'Collected {len(chips)} {what}s but {expectedAmount} were expected.')
+        for cmp in components:
 
-        # Creating dictionary
-        chipsDict = {}
-        for chip in chips:
-            label = chip.getField('_waferLabel')
-            if label is not None:
-                chipsDict[label] = chip
-            else:
-                log.warning(f'Could not retrieve wafer label for {what} "{chip.name}". Not included in {what}sDict.')
+            chipTypes = bpIDtoChipTypes.get(cmp.blueprintID)
+            if chipTypes is None: continue
 
+            label = cmp.getField('_waferLabel')
 
-        # Checking label exists in the wafer
-        for label in chipsDict:
-            if not label in bpDict:
-                log.error(f'Label "{label}" does not exist in the wafer blueprint dictionary!')
-        
-        if chips == []: chips = None
-        if chipsDict == {}: chipsDict = None
+            for chipType in chipTypes:
+
+                what = self._chipTypeNames[chipType]
+                cmps[chipType].append(cmp)
+
+                if label is None:
+                    log.warning(f'Could not retrieve wafer label for {what} "{cmp.name}". Not included in {what}sDict.')
+                    continue
+
+                # Checking label exists in the wafer
+                bpDict = families[chipType][1]
+                if bpDict is None or label not in bpDict:
+                    log.error(f'Label "{label}" does not exist in the wafer blueprint dictionary!')
 
-        return chips, chipsDict
+                cmpsDicts[chipType][label] = cmp
+
+        collected = {}
+        for chipType, (bps, bpDict) in families.items():
+
+            if bps is None:
+                collected[chipType] = (None, None)
+                continue
+
+            what = self._chipTypeNames[chipType]
+            expectedAmount = len(bpDict) if bpDict is not None else 0
+
+            log.info(f'Collected {len(cmps[chipType])} {what}s.')
+            if len(cmps[chipType]) != expectedAmount:
+                log.warning(f'Collected {len(cmps[chipType])} {what}s but {expectedAmount} were expected.')
+
+            collected[chipType] = (cmps[chipType] or None, cmpsDicts[chipType] or None)
+
+        return collected
 
 
     def _collectChipsalike(self, wafer,
@@ -831,129 +1366,763 @@ class waferCollation(c.collation):
             log.warning('I retrieved no children components from the wafer.')
             return None, None, None, None, None, None
 
+        collected = self._indexComponents(allChipsalike, {
+            'chips': (chipBPs, chipBPsDict),
+            'testChips': (testBPs, testChipBPsDict),
+            'bars': (barBPs, barBPsDict),
+        })
 
-        # Chips
-        chips, chipsDict = \
-            self._collectChipsalike_commonFunction('chip', allChipsalike, chipBPs, chipBPsDict)
-        
-        # Test chips
-        testChips, testChipsDict = \
-            self._collectChipsalike_commonFunction('test chip', allChipsalike, testBPs, testChipBPsDict)
-        
-        # Bars
-        bars, barsDict = \
-            self._collectChipsalike_commonFunction('bar', allChipsalike, barBPs, barBPsDict)
+        chips, chipsDict = collected['chips']
+        testChips, testChipsDict = collected['testChips']
+        bars, barsDict = collected['bars']
 
         return chips, chipsDict, testChips, testChipsDict, bars, barsDict
 
     def _collectTestCells(self, wafer, cellBPs, cellBPsDict):
 
         testCells = wafer.TestCells.retrieveElements(self.connection, verbose = False)
+
+        if testCells is None:
+            log.warning('I retrieved no test cells from the wafer.')
+            return None, None
         
-        # testCells
-        testCells, testCellsDict = \
-            self._collectChipsalike_commonFunction('test cell', testCells, cellBPs, cellBPsDict)
+        return self._indexComponents(testCells,
+                    {'testCells': (cellBPs, cellBPsDict)})['testCells']
+
+
+    def _joinCollectedDocuments(self):
+        """Builds the attributes that join the components and blueprints
+        of the different chip types."""
+
+        self._allComponentBPdict = _joinDictsOrNone(
+            self.chipBPdict,
+            self.testChipBPdict,
+            self.barBPdict,
+            self.testCellBPdict
+        )
+
+        # Dictionary containing all the chipType -> allowed groups relations
+        self._allowedGroupsDict = {
+            'chips': self.waferBlueprint.ChipBlueprints.retrieveGroupNames(),
+            'testChips': self.waferBlueprint.TestChipBlueprints.retrieveGroupNames(),
+            'testCells': self.waferBlueprint.TestCellBlueprints.retrieveGroupNames(),
+            'bars': self.waferBlueprint.BarBlueprints.retrieveGroupNames(),
+        }
+
+        self.allChips = _joinListsOrNone(self.chips, self.testChips)
+        self.allChipsDict = _joinDictsOrNone(self.chipsDict, self.testChipsDict)
         
-        return testCells, testCellsDict
+        self._allComponentsDict = _joinDictsOrNone(self.allChipsDict, self.barsDict, self.testCellsDict)
 
-    # ---------------------------------------------------
-    # Internal utility functions
+        # Label index and result store, rebuilt when needed (see _labels
+        # and _results)
+        self._labelIndexCache = None
+        self._resultStoreCache = None
 
-    _allowedChipTypes = ["chips", "testChips", "testCells", "bars"]
+        self.clearQueryCache()
 
-    def _componentsFromType(self, chipTypes:list):
 
-        if not isinstance(chipTypes, list):
-            raise TypeError('"chipTypes" must be a list of strings.')
-        if not all([isinstance(el, str) for el in chipTypes]):
-            raise TypeError('"chipTypes" must be a list of strings.')
+    # --- bulk collect methods ---
 
-        if not all([el in self._allowedChipTypes for el in chipTypes]):
-            raise ValueError('"chipTypes" must contain strings among '\
-                             +', '.join(f'"{s}"' for s in self._allowedChipTypes))
-        
-        cmpsToReturn = []
+    # chipType -> name used in log messages
+    _chipTypeNames = {
+        'chips': 'chip',
+        'testChips': 'test chip',
+        'bars': 'bar',
+        'testCells': 'test cell',
+    }
 
-        for chipType in chipTypes:
-            
-            if chipType == "chips":
-                cmpsToReturn += self.chips
-            elif chipType == 'testChips':
-                cmpsToReturn += self.testChips
-            elif chipType == "testCells":
-                cmpsToReturn += self.testCells
-            elif chipType == "bars":
-                cmpsToReturn += self.bars
+    # chipType -> blueprint type (see _collectChipBPalikes())
+    _chipTypeBPtypes = {
+        'chips': 'chipBlueprints',
+        'testChips': 'testChipBlueprints',
+        'bars': 'barBlueprints',
+        'testCells': 'testCellBlueprints',
+    }
 
-        return cmpsToReturn
-        
-    def _waferBlueprintAttributeClassFromType(self, chipType:str):
+    def _bulkCollectDocuments(self, wafer, projection:dict = None,
+                              blueprintCache:ch.blueprintCache = None):
+        """Collects the wafer blueprint, the blueprints of all the wafer
+        components, the wafer children and the wafer test cells with two
+        "$in" queries (one for components, one for blueprints), and assigns
+        them to the collation attributes.
 
-        if not isinstance(chipType, str):
-            raise TypeError(f'"chipTypes" must be a string.')
-        
-        if not chipType in self._allowedChipTypes:
-            raise ValueError(f'"chipType" must be among {self._allowedChipTypes}')
+        Components are assigned to chipTypes by blueprint ID, as when the
+        collation is not bulk-loaded (see _partitionComponents()).
 
-        if chipType == "chips":
-            return self.waferBlueprint.ChipBlueprints
-        elif chipType == "testChips":
-            return self.waferBlueprint.TestChipBlueprints
-        elif chipType == "testCells":
-            return self.waferBlueprint.TestCellBlueprints
-        elif chipType == "bars":
-            return self.waferBlueprint.BarBlueprints
-        
+        Args:
+            wafer (mongomanager.wafer): The collation wafer.
+            projection (dict, optional): If passed, it is used as projection
+                for the components query. Defaults to None.
+            blueprintCache (mongoreader.cache.blueprintCache, optional): The
+                cache through which blueprints are retrieved. If None, the
+                process-wide cache mongoreader.cache.blueprints is used.
+                Defaults to None.
 
+        Raises:
+            DocumentNotFound: If the wafer blueprint is not found.
+        """
 
-    # ---------------------------------------------------
+        if blueprintCache is None:
+            blueprintCache = ch.blueprints
 
+        # Query 1: all the components of the wafer
+        components = bulk.queryComponentsByIDs(self.connection,
+                                               self._waferComponentIDs(wafer),
+                                               projection = projection)
+        log.info(f'Collected {len(components)} wafer components.')
+
+        # Query 2: the wafer blueprint and all the component blueprints
+        bpIDs = self._blueprintIDs(wafer, components)
+        bpsByID = blueprintCache.retrieveBlueprints(self.connection, bpIDs)
+
+        self._assignDocuments(wafer, components, bpsByID, blueprintCache)
+
+
+    @staticmethod
+    def _waferComponentIDs(wafer) -> list:
+        """Returns the IDs of the wafer children and test cells."""
+        return bulk._uniqueIDs(_joinListsOrNone(
+            wafer.ChildrenComponents.retrieveIDs(),
+            wafer.TestCells.retrieveIDs(),
+        ))
+
+    @staticmethod
+    def _blueprintIDs(wafer, components:list) -> list:
+        """Returns the IDs of the wafer blueprint and of the components
+        blueprints.
+        
+        Raises:
+            DocumentNotFound: If the wafer has no blueprint ID.
+        """
+
+        waferBPid = wafer.blueprintID
+        if waferBPid is None:
+            raise DocumentNotFound('Could not retrieve the wafer blueprint.')
+
+        return bulk._uniqueIDs([waferBPid] + [cmp.blueprintID for cmp in components])
+
+
+    def _assignDocuments(self, wafer, components:list, bpsByID:dict,
+                         blueprintCache:ch.blueprintCache = None):
+        """Assigns the wafer blueprint, components and blueprints to the
+        collation attributes.
+
+        Args:
+            wafer (mongomanager.wafer): The collation wafer.
+            components (list[mongomanager.component]): The wafer components.
+            bpsByID (dict): A dictionary in the form {<ID>: <blueprint>}
+                containing the wafer blueprint and the component blueprints.
+            blueprintCache (mongoreader.cache.blueprintCache, optional): The
+                cache through which the blueprints of the wafer blueprint
+                families that are not in bpsByID are retrieved (see
+                _partitionComponents()). If None, the cache of the collation
+                is used. Defaults to None.
+
+        Raises:
+            DocumentNotFound: If the wafer blueprint is not found.
+        """
+
+        self.waferBlueprint = bpsByID.get(mom.toObjectID(wafer.blueprintID))
+        if self.waferBlueprint is None:
+            raise DocumentNotFound('Could not retrieve the wafer blueprint.')
+        log.info(f'Collected wafer blueprint "{self.waferBlueprint.name}".')
+
+        if blueprintCache is None:
+            blueprintCache = self._blueprintCache
+
+        collected = self._partitionComponents(components, bpsByID, blueprintCache)
+
+        self.chips, self.chipsDict, \
+            self.chipBlueprints, self.chipBPdict = collected['chips']
+        self.testChips, self.testChipsDict, \
+            self.testChipBlueprints, self.testChipBPdict = collected['testChips']
+        self.bars, self.barsDict, \
+            self.barBlueprints, self.barBPdict = collected['bars']
+        self.testCells, self.testCellsDict, \
+            self.testCellBlueprints, self.testCellBPdict = collected['testCells']
+
+
+    # Maximum age of a snapshot in seconds (see _cachedCollectDocuments())
+    snapshotMaxAge = 24*3600
+
+    def _cachedCollectDocuments(self, wafer, cacheFolder:Path,
+                                projection:dict = None,
+                                blueprintCache:ch.blueprintCache = None):
+        """Works like _bulkCollectDocuments(), but uses a snapshot of the
+        collation documents stored in "cacheFolder".
+
+        The snapshot is validated by comparing the modification markers of
+        the stored documents with those computed on the server (one
+        aggregation for components, one for blueprints, see
+        mongoreader.bulk.modificationMarkers()). Only the documents that
+        changed, or that are not in the snapshot, are retrieved again.
+        Documents that no longer have a marker have been deleted, and are
+        dropped. Blueprints that are not in the snapshot are retrieved
+        through blueprintCache, so that they are shared with other
+        collations; those whose marker changed are always queried.
+
+        Markers do not detect edits that leave the size of a document, the
+        length of its history arrays, its status and its process stage
+        unchanged. For this reason, snapshots older than snapshotMaxAge
+        seconds are discarded and all the documents are retrieved again.
+        
+        The snapshot is then updated on disk.
+
+        Args:
+            wafer (mongomanager.wafer): The collation wafer.
+            cacheFolder (Path): The folder containing the snapshots.
+            projection (dict, optional): If passed, it is used as projection
+                for the components queries. Defaults to None.
+            blueprintCache (mongoreader.cache.blueprintCache, optional): The
+                cache through which new blueprints are retrieved. If None,
+                the process-wide cache mongoreader.cache.blueprints is used.
+                Defaults to None.
+        """
+
+        if blueprintCache is None:
+            blueprintCache = ch.blueprints
+
+        snapshotPath = Path(cacheFolder) / f'{wafer.ID}.pickle'
+        snapshot = _loadCollationSnapshot(snapshotPath)
+
+        if snapshot is not None:
+
+            # A snapshot with partial documents cannot be used for a full collation
+            if snapshot['loadedFields'] is not None and projection is None:
+                snapshot = None
+
+            # Changes not detected by markers are bounded by the snapshot age
+            elif time() - snapshot['savedAt'] > self.snapshotMaxAge:
+                log.info(f'The snapshot of wafer "{wafer.name}" is expired.')
+                snapshot = None
+
+        if snapshot is None:
+            log.info(f'No valid snapshot found for wafer "{wafer.name}".')
+            snapshot = {'components': {}, 'blueprints': {}, 'markers': {},
+                        'loadedFields': None if projection is None else list(projection),
+                        'savedAt': time()}
+        
+        if snapshot['loadedFields'] is None:
+            self._loadedFields = None # Full documents available
+
+        # Components
+        componentIDs = self._waferComponentIDs(wafer)
+        cmpMarkers = bulk.componentMarkers(self.connection, componentIDs)
+
+        changedIDs = self._changedIDs(componentIDs, cmpMarkers,
+                                      snapshot['markers'], snapshot['components'])
+        
+        changedCmps = bulk.queryComponentsByIDs(self.connection, changedIDs,
+                            projection = projection if snapshot['loadedFields'] is not None else None)
+        changedCmps = {cmp.ID: cmp for cmp in changedCmps}
+
+        components = self._mergeDocuments(componentIDs, cmpMarkers, changedIDs,
+                                          changedCmps, snapshot['components'])
+
+        log.info(f'Collected {len(components)} wafer components ({len(changedCmps)} from the database).')
+
+        # Blueprints
+        bpIDs = self._blueprintIDs(wafer, components.values())
+        bpMarkers = bulk.blueprintMarkers(self.connection, bpIDs)
+
+        changedBPids = self._changedIDs(bpIDs, bpMarkers,
+                                        snapshot['markers'], snapshot['blueprints'])
+
+        # Modified blueprints are queried, new ones may already be cached
+        modifiedBPids = [ID for ID in changedBPids if ID in snapshot['blueprints']]
+        newBPids = [ID for ID in changedBPids if ID not in snapshot['blueprints']]
+
+        modifiedBPs = bulk.queryBlueprintsByIDs(self.connection, modifiedBPids)
+        ch.storeBlueprints(modifiedBPs, wafer.blueprintID)
+        blueprintCache.update(modifiedBPs)
+
+        changedBPs = blueprintCache.retrieveBlueprints(self.connection, newBPids)
+        changedBPs.update({bp.ID: bp for bp in modifiedBPs})
+
+        bpsByID = self._mergeDocuments(bpIDs, bpMarkers, changedBPids,
+                                       changedBPs, snapshot['blueprints'])
+
+        self._assignDocuments(wafer, list(components.values()), bpsByID, blueprintCache)
+        self._markers = {**cmpMarkers, **bpMarkers}
+
+        # Documents that are not retrieved again keep the age of the snapshot
+        self._snapshotSavedAt = snapshot['savedAt']
+
+        _saveCollationSnapshot(snapshotPath, {
+            'components': components,
+            'blueprints': bpsByID,
+            'markers': self._markers,
+            'loadedFields': snapshot['loadedFields'],
+            'savedAt': self._snapshotSavedAt,
+        })
+
+
+    @staticmethod
+    def _changedIDs(IDs:list, markers:dict, oldMarkers:dict, oldDocuments:dict) -> list:
+        """Returns the IDs of the documents to be retrieved again: those that
+        exist in the database (i.e. that have a marker) and that are not
+        among oldDocuments or whose marker changed."""
+
+        return [ID for ID in IDs if ID in markers
+                and (ID not in oldDocuments or oldMarkers.get(ID) != markers[ID])]
+
+    @staticmethod
+    def _mergeDocuments(IDs:list, markers:dict, changedIDs:list,
+                        changedDocuments:dict, oldDocuments:dict) -> dict:
+        """Returns a dictionary in the form {<ID>: <document>} for "IDs",
+        taking the documents of changedIDs from changedDocuments (the ones
+        just retrieved) and the other ones from oldDocuments.
+
+        Documents without a marker have been deleted from the database, and
+        are dropped. Changed documents that could not be retrieved are
+        dropped too, instead of being replaced by their old version."""
+
+        changedIDs = set(changedIDs)
+        merged = {}
+
+        for ID in IDs:
+            if ID not in markers:
+                continue
+
+            doc = changedDocuments.get(ID) if ID in changedIDs else oldDocuments.get(ID)
+            if doc is not None:
+                merged[ID] = doc
+
+        return merged
+
+    def _partitionComponents(self, components:list, bpsByID:dict,
+                             blueprintCache:ch.blueprintCache) -> dict:
+        """Assigns the components to their chip types by blueprint ID, as
+        done when the collation is not bulk-loaded (see _indexComponents()).
+
+        The blueprint families of the chip types (their blueprints and the
+        labels associated to them) are resolved from the wafer blueprint
+        document (see _familyBlueprintIDs()), without querying the database.
+        Their blueprints are taken from "bpsByID"; those that no component
+        uses, and that are therefore not in bpsByID, are retrieved through
+        blueprintCache with a single query.
+
+        Args:
+            components (list[mongomanager.component]): The wafer components.
+            bpsByID (dict): A dictionary in the form {<ID>: <blueprint>}
+                containing freshly retrieved blueprints.
+            blueprintCache (mongoreader.cache.blueprintCache): The cache
+                through which missing blueprints are retrieved.
+
+        Returns:
+            dict: A dictionary in the form
+                {
+                    <chipType>: (<components>, <componentsDict>,
+                                 <blueprints>, <blueprintsDict>),
+                    ...
+                }
+                where each element of the tuples is None if empty.
+        """
+
+        familyIDs = {chipType: self._familyBlueprintIDs(chipType)
+                     for chipType in self._allowedChipTypes}
+
+        missing = [ID for labelIDs in familyIDs.values() if labelIDs is not None
+                   for _, ID in labelIDs if ID not in bpsByID]
+
+        if missing != []:
+            bpsByID = {**bpsByID,
+                       **blueprintCache.retrieveBlueprints(self.connection, missing)}
+
+        families = {}
+        for chipType, labelIDs in familyIDs.items():
+
+            if labelIDs is None:
+                # The wafer blueprint does not expose the IDs of the family
+                families[chipType] = self._collectChipBPalikes(self.waferBlueprint,
+                                                self._chipTypeBPtypes[chipType])
+                continue
+
+            bps, bpDict = {}, {}
+            for label, ID in labelIDs:
+
+                bp = bpsByID.get(ID)
+                if bp is None:
+                    log.warning(f'Could not retrieve the {self._chipTypeNames[chipType]} blueprint of label "{label}".')
+                    continue
+
+                bps[ID] = bp
+                bpDict[label] = bp
+
+            log.info(f'Collected {len(bps)} {self._chipTypeBPtypes[chipType]}.')
+            families[chipType] = (list(bps.values()) or None, bpDict or None)
+
+        indexed = self._indexComponents(components, families)
+
+        return {chipType: (*indexed[chipType], *families[chipType])
+                for chipType in self._allowedChipTypes}
+
+    def _familyBlueprintIDs(self, chipType:str) -> list:
+        """Returns the blueprint family of chipType as defined in the wafer
+        blueprint document, as a list of (<label>, <blueprint ID>) tuples.
+
+        The IDs are read from the wafer blueprint attribute class, whose
+        retrieveIDs() returns the blueprint ID of each label, in the same
+        order as retrieveLabels(). No query is performed.
+
+        Returns:
+            list[tuple] | None: The (<label>, <blueprint ID>) tuples, or None
+                if the IDs cannot be matched with the labels.
+        """
+
+        attributeClass = self._waferBlueprintAttributeClassFromType(chipType)
+
+        labels = attributeClass.retrieveLabels()
+        IDs = attributeClass.retrieveIDs()
+
+        if not labels and not IDs:
+            return []
+
+        if not isinstance(labels, list) or not isinstance(IDs, list) \
+                or len(labels) != len(IDs):
+            return None
+
+        return [(label, mom.toObjectID(ID)) for label, ID in zip(labels, IDs)]
+
+
+    # --- lazy loading ---
+
+    # Projection used to retrieve components when the collation is lazy
+    _lightweightProjection = {
+        'name': 1,
+        '_waferLabel': 1,
+        'blueprintID': 1,
+        'status': 1,
+        'processStage': 1,
+        'statusLog': {'$slice': -1},
+    }
+
+    # Fields needed by test results and Datasheets methods
+    _heavyFields = ['testHistory', 'datasheetData']
+
+    @staticmethod
+    def _projectedFields(projection:dict) -> set:
+        """Returns the fields fully retrieved by "projection". Sliced fields
+        (e.g. "statusLog", of which only the last entry is retrieved) are
+        not included, so that _loadFields() retrieves them entirely."""
+        return {field for field, value in projection.items() if value == 1}
+
+    def _loadFields(self, fields:list):
+        """Makes sure that "fields" are available for all the components of
+        the collation.
+
+        If the collation is not lazy, this method does nothing. Otherwise,
+        the fields that have not been retrieved yet are retrieved for all
+        the components with a single query, and assigned to them.
+
+        Args:
+            fields (list[str]): The top-level fields needed.
+        """
+
+        if self._loadedFields is None: # Full documents
+            return
+
+        missing = [f for f in fields if f not in self._loadedFields]
+        if missing == []:
+            return
+
+        cmpsByID = {cmp.ID: cmp for cmp in (self._allComponentsDict or {}).values()}
+
+        with opened(self.connection):
+            docs = bulk.queryComponentsByIDs(self.connection, list(cmpsByID),
+                                             projection = {f: 1 for f in missing},
+                                             returnType = 'dictionary')
+
+        for doc in docs:
+            cmp = cmpsByID.get(doc.get('_id'))
+            if cmp is None: continue
+
+            for field in missing:
+                if field in doc:
+                    cmp[field] = doc[field]
+
+        self._loadedFields.update(missing)
+        if 'testHistory' in missing:
+            self._historyScopes.clear()
+
+        log.spare(f'Retrieved fields {missing} for {len(docs)} components.')
+
+    def _loadHeavyFields(self):
+        """Retrieves "testHistory" and "datasheetData" for all the components
+        if the collation is lazy and they have not been retrieved yet."""
+        self._loadFields(self._heavyFields)
+
+    def _loadTestHistories(self, labels:list, resultNames:list = None,
+                           locations:list = None):
+        """Makes sure that the test history of the components of "labels"
+        contains at least the results whose name is among resultNames and
+        whose location is among locations (None for any).
+
+        If the collation is not lazy, or if the test history has already
+        been fully retrieved, this method does nothing. Otherwise, the
+        histories are retrieved with a single query, projected server-side
+        with mongoreader.bulk.testHistoryResultsProjection(), so that the
+        results that are not needed are not transferred. Results retrieved
+        by earlier calls are retrieved again, so that they are kept.
+
+        Args:
+            labels (list[str]): The labels of the components.
+            resultNames (list[str], optional): The result names needed.
+                Defaults to None.
+            locations (list[str], optional): The locations needed. Defaults
+                to None.
+        """
+
+        if self._loadedFields is None or 'testHistory' in self._loadedFields:
+            return
+
+        requested = (_scopeSet(resultNames), _scopeSet(locations))
+        cmpsDict = self._allComponentsDict or {}
+
+        toLoad = {}
+        for label in labels:
+            cmp = cmpsDict.get(label)
+            if cmp is None: continue
+
+            scope = self._historyScopes.get(cmp.ID)
+            if scope is None or not _scopeCovers(scope, requested):
+                toLoad[cmp.ID] = cmp
+
+        if toLoad == {}:
+            return
+
+        # The scope retrieved includes the one retrieved before
+        scope = requested
+        for ID in toLoad:
+            if ID in self._historyScopes:
+                scope = _scopeUnion(scope, self._historyScopes[ID])
+
+        names, locs = scope
+        projection = bulk.testHistoryResultsProjection(
+                            None if names is None else sorted(names),
+                            None if locs is None else sorted(locs))
 
-    def refresh(self):
-        """Refreshes from the database all the components and blueprints of
-        the collation.
-        
-        It calls mongoRefresh() on all of them."""
-        
         with opened(self.connection):
+            docs = bulk.queryComponentsByIDs(self.connection, list(toLoad),
+                                             projection = projection,
+                                             returnType = 'dictionary')
+
+        for doc in docs:
+            cmp = toLoad.get(doc.get('_id'))
+            if cmp is None: continue
+
+            cmp['testHistory'] = doc.get('testHistory')
+            self._historyScopes[cmp.ID] = scope
+
+        log.spare(f'Retrieved the test history of {len(docs)} components.')
+
+    # ---------------------------------------------------
+    # Internal utility functions
+
+    _allowedChipTypes = ["chips", "testChips", "testCells", "bars"]
+
+    def _componentsFromType(self, chipTypes:list):
+
+        if not isinstance(chipTypes, list):
+            raise TypeError('"chipTypes" must be a list of strings.')
+        if not all([isinstance(el, str) for el in chipTypes]):
+            raise TypeError('"chipTypes" must be a list of strings.')
+
+        if not all([el in self._allowedChipTypes for el in chipTypes]):
+            raise ValueError('"chipTypes" must contain strings among '\
+                             +', '.join(f'"{s}"' for s in self._allowedChipTypes))
+        
+        cmpsToReturn = []
+
+        for chipType in chipTypes:
             
-            self.wafer.mongoRefresh(self.connection)
-            log.spare(f'Refreshed wafer "{self.wafer.name}".')
+            if chipType == "chips":
+                cmpsToReturn += self.chips
+            elif chipType == 'testChips':
+                cmpsToReturn += self.testChips
+            elif chipType == "testCells":
+                cmpsToReturn += self.testCells
+            elif chipType == "bars":
+                cmpsToReturn += self.bars
+
+        return cmpsToReturn
+        
+    def _waferBlueprintAttributeClassFromType(self, chipType:str):
+
+        if not isinstance(chipType, str):
+            raise TypeError(f'"chipTypes" must be a string.')
+        
+        if not chipType in self._allowedChipTypes:
+            raise ValueError(f'"chipType" must be among {self._allowedChipTypes}')
+
+        if chipType == "chips":
+            return self.waferBlueprint.ChipBlueprints
+        elif chipType == "testChips":
+            return self.waferBlueprint.TestChipBlueprints
+        elif chipType == "testCells":
+            return self.waferBlueprint.TestCellBlueprints
+        elif chipType == "bars":
+            return self.waferBlueprint.BarBlueprints
+        
+
+
+    # ---------------------------------------------------
+
 
-            self.waferBlueprint.mongoRefresh(self.connection)
-            log.spare(f'Refreshed waferBlueprint "{self.waferBlueprint.name}".')
+    def refresh(self) -> dict:
+        """Refreshes from the database the wafer, the components and the
+        blueprints of the collation, retrieving only the documents that
+        changed.
 
-            if self.chips is not None:
-                for chip in self.chips: chip.mongoRefresh(self.connection)
-                log.spare(f'Refreshed chips.')
+        The modification markers of all the documents are computed on the
+        server with one aggregation for components and one for blueprints
+        (see mongoreader.bulk.modificationMarkers()). Then, the documents
+        whose marker changed, and the components newly added to the wafer,
+        are retrieved with one "$in" query for each document family, and the
+        label dictionaries are rebuilt. Documents deleted from the database
+        are removed from the collation.
 
-            if self.testChips is not None:
-                for chip in self.testChips: chip.mongoRefresh(self.connection)
-                log.spare(f'Refreshed test chips.')
+        Markers are known only for collations built from a snapshot (see the
+        "cache" argument of waferCollation) or already refreshed. Otherwise,
+        all the documents are retrieved and no change report is returned.
 
-            if self.testChips is not None:
-                for bar in self.bars: bar.mongoRefresh(self.connection)
-                log.spare(f'Refreshed bars.')
+        Returns:
+            dict | None: A change report in the form
+                {
+                    'wafer': <bool>,
+                    'waferBlueprint': <bool>,
+                    'chips': <list of updated or added labels>,
+                    'testChips': <list of updated or added labels>,
+                    'bars': <list of updated or added labels>,
+                    'testCells': <list of updated or added labels>,
+                    'removed': <list of labels no longer in the collation>,
+                    'blueprints': <list of names of updated blueprints>,
+                }
+                or None if the markers of the collation were not known.
+        """
+
+        markersKnown = self._markers != {}
+        
+        with opened(self.connection):
+
+            # Wafer
+            waferMarkers = bulk.componentMarkers(self.connection, [self.wafer.ID])
+            waferChanged = self._markers.get(self.wafer.ID) != waferMarkers.get(self.wafer.ID)
+            if waferChanged:
+                self.wafer.mongoRefresh(self.connection)
+                log.spare(f'Refreshed wafer "{self.wafer.name}".')
+
+            # Components
+            oldComponentsDict = self._allComponentsDict or {}
+            oldComponents = {cmp.ID: cmp for cmp in oldComponentsDict.values()}
+
+            componentIDs = self._waferComponentIDs(self.wafer)
+            cmpMarkers = bulk.componentMarkers(self.connection, componentIDs)
+
+            changedIDs = self._changedIDs(componentIDs, cmpMarkers,
+                                          self._markers, oldComponents)
+
+            changedCmps = bulk.queryComponentsByIDs(self.connection, changedIDs,
+                                                    projection = self._componentsProjection())
+            changedCmps = {cmp.ID: cmp for cmp in changedCmps}
+            log.spare(f'Refreshed {len(changedCmps)} components.')
+
+            for ID in changedCmps:
+                self._historyScopes.pop(ID, None)
+
+            components = self._mergeDocuments(componentIDs, cmpMarkers, changedIDs,
+                                              changedCmps, oldComponents)
+            components = list(components.values())
+
+            # Blueprints
+            oldBPs = {bp.ID: bp for bp in _joinListsOrNone(
+                            [self.waferBlueprint],
+                            self.chipBlueprints,
+                            self.testChipBlueprints,
+                            self.barBlueprints,
+                            self.testCellBlueprints)}
+
+            bpIDs = self._blueprintIDs(self.wafer, components)
+            bpMarkers = bulk.blueprintMarkers(self.connection, bpIDs)
+
+            changedBPids = self._changedIDs(bpIDs, bpMarkers, self._markers, oldBPs)
+
+            changedBPs = bulk.queryBlueprintsByIDs(self.connection, changedBPids)
+            changedBPs = {bp.ID: bp for bp in changedBPs}
+            ch.storeBlueprints(changedBPs.values(), self.wafer.blueprintID)
+            self._locationGroups.invalidate()
+            log.spare(f'Refreshed {len(changedBPs)} blueprints.')
+
+            bpsByID = self._mergeDocuments(bpIDs, bpMarkers, changedBPids,
+                                           changedBPs, oldBPs)
+
+            # Rebuilding dictionaries, assigning components by blueprint ID
+            # as when the collation is built
+            self._assignDocuments(self.wafer, components, bpsByID)
+            self._joinCollectedDocuments()
+
+        self._markers = {**waferMarkers, **cmpMarkers, **bpMarkers}
+
+        if self._cacheFolder is not None:
+            _saveCollationSnapshot(Path(self._cacheFolder) / f'{self.wafer.ID}.pickle', {
+                'components': {cmp.ID: cmp for cmp in components},
+                'blueprints': bpsByID,
+                'markers': self._markers,
+                'loadedFields': None if self._loadedFields is None else list(self._lightweightProjection),
+                'savedAt': self._snapshotSavedAt,
+            })
+
+        if self.waferBlueprint.ID in changedBPs:
+            self._waferPlotter = None
+
+        if not markersKnown:
+            log.info('Markers were not known: all the documents have been retrieved.')
+            return None
+
+        # Change report
+        report = {
+            'wafer': waferChanged,
+            'waferBlueprint': self.waferBlueprint.ID in changedBPs,
+        }
+
+        for chipType in self._allowedChipTypes:
+            cmpsDict = self._componentsDictFromType(chipType)
+            report[chipType] = [label for label, cmp in cmpsDict.items()
+                                if cmp.ID in changedCmps]
 
-            if self.testChips is not None:
-                for cell in self.testCells: cell.mongoRefresh(self.connection)
-                log.spare(f'Refreshed test cells.')
+        report['removed'] = [label for label in oldComponentsDict
+                             if label not in (self._allComponentsDict or {})]
+        report['blueprints'] = [bp.name for bp in changedBPs.values()]
+
+        return report
+
+    def _componentsProjection(self) -> dict:
+        """Returns the projection used to retrieve components, or None if
+        the collation holds full documents."""
+
+        if self._loadedFields is None:
+            return None
 
-            if self.testChips is not None:
-                for bp in self.chipBlueprints: bp.mongoRefresh(self.connection)
-                log.spare(f'Refreshed chip blueprints.')
+        # Fully retrieved fields prevail over the sliced ones
+        return {**self._lightweightProjection, **{f: 1 for f in self._loadedFields}}
 
-            if self.testChips is not None:
-                for bp in self.testChipBlueprints: bp.mongoRefresh(self.connection)
-                log.spare(f'Refreshed test chip blueprints.')
+    def _componentsDictFromType(self, chipType:str) -> dict:
+        """Returns the {<label>: <component>} dictionary for the chip type.
+        Never returns None."""
 
-            if self.testChips is not None:
-                for bp in self.barBlueprints: bp.mongoRefresh(self.connection)
-                log.spare(f'Refreshed bar blueprints.')
+        if chipType == "chips":
+            cmpsDict = self.chipsDict
+        elif chipType == "testChips":
+            cmpsDict = self.testChipsDict
+        elif chipType == "testCells":
+            cmpsDict = self.testCellsDict
+        elif chipType == "bars":
+            cmpsDict = self.barsDict
+        else:
+            raise ValueError(f'"chipType" must be among {self._allowedChipTypes}')
 
-            if self.testChips is not None:
-                for bp in self.testCellBlueprints: bp.mongoRefresh(self.connection)
-                log.spare(f'Refreshed test chip blueprints.')
+        return {} if cmpsDict is None else cmpsDict
 
 
     # ---------------------------------------------------
@@ -963,6 +2132,9 @@ class waferCollation(c.collation):
         """Given the combination of chipTypes and chipGroupsDict, it returns
         the list of labels to which they correspond
 
+        Selections are resolved through the label index of the collation
+        (see _labelIndex), so the wafer blueprint is traversed only once.
+
         Args:
             chipTypes (list[str] | None): The macro-groups ("chips",
                 "testChips", "bars", "testCells")
@@ -996,64 +2168,142 @@ class waferCollation(c.collation):
                     if not all([g in self._allowedGroupsDict[ctype] for g in groups]):
                         raise ValueError(f'Values of "groupsDict" must be None or a list of strings among self.allowedGroupsDict.')
 
-        chipSerials = []
-
-        if chipTypes is None:
-            chipTypes = self._allowedChipTypes
-        
-        if chipGroupsDict is None:
-            chipGroupsDict = {chipType: None for chipType in chipTypes}
-
         log.debug(f'[_selectLabels] chipTypes: {chipTypes}')
         log.debug(f'[_selectLabels] chipGroupsDict: {chipGroupsDict}')
 
-        for chipType, chipGroups in chipGroupsDict.items():
+        return self._labels.select(chipTypes, chipGroupsDict)
 
-            attributeClass = self._waferBlueprintAttributeClassFromType(chipType)
+    @property
+    def _labels(self) -> _labelIndex:
+        """The label index of the collation, built the first time it is
+        needed."""
 
-            if chipGroups is None:
-                newLabels = attributeClass.retrieveLabels()
-                log.debug(f'[_selectLabels] Chip groups is None: newLabels: {newLabels}')
-                if newLabels is None: continue
+        if self._labelIndexCache is None:
+            self._labelIndexCache = _labelIndex(self)
 
-            else:
-                newLabels = []
-                for group in chipGroups:
-                    newLabels = attributeClass.retrieveGroupLabels(group)
-                    if newLabels is None: continue
-                    chipSerials += newLabels
-                    log.debug(f'[_selectLabels] newLabels for group "{group}": {newLabels}')
+        return self._labelIndexCache
 
+    @property
+    def _results(self) -> rs.resultStore:
+        """The columnar store of the test results of all the components of
+        the collation (see mongoreader.results.resultStore), built the first
+        time it is needed."""
 
-            chipSerials += newLabels
+        return self._resultStore()
 
-        if chipSerials == []:
-            return None
-        
-        return chipSerials
+    def _resultStore(self, parallel:int = None) -> rs.resultStore:
+        """Returns the columnar store of the test results (see _results).
+        If the store has not been built yet and "parallel" is passed, the
+        test histories are flattened by a pool of "parallel" processes."""
 
+        if self._resultStoreCache is None:
+            self._loadHeavyFields()
+            self._resultStoreCache = rs.resultStore(self._allComponentsDict or {},
+                                                    parallel = parallel)
 
-    def retrieveAllTestResultNames(self):
+        return self._resultStoreCache
+
+
+    def retrieveAllTestResultNames(self, chipType_orTypes = None):
         """Returns the list of all the test result names found in the test
-        history of all the chips of the collation.
+        history of the components of the collation, in order of appearance.
+
+        The names are read from the result store of the collation if it has
+        already been built (see _results), otherwise from the test history
+        of the selected components, without building the store.
+
+        Args:
+            chipType_orTypes (str | list[str], optional): The chip types of
+                the components considered. Defaults to "chips".
         
         Returns None if no result name is found."""
 
-        allNames = []
-        for chip in self.chips:
-            testNames = chip.retrieveTestResultNames()
-            
-            if testNames is None:
-                continue
-            
-            for name in testNames:
-                if name not in allNames:
-                    allNames.append(name)
+        if chipType_orTypes is None: chipType_orTypes = ['chips']
+        if isinstance(chipType_orTypes, str): chipType_orTypes = [chipType_orTypes]
+
+        labels = self._selectLabels(chipType_orTypes)
+        if labels is None: return None
+
+        if self._resultStoreCache is not None:
+            frame = self._resultStoreCache.frame
+            names = frame.loc[frame['label'].isin(labels), 'resultName'].dropna()
+            allNames = list(names.astype(object).unique())
+
+        else:
+            self._loadHeavyFields()
+            labels = set(labels)
+
+            # {<name>: None} keeps the order of appearance
+            namesDict = {}
+            for label, cmp in (self._allComponentsDict or {}).items():
+                if label not in labels: continue
+
+                for entry in cmp.getField('testHistory', verbose = False) or []:
+                    for res in entry.get('results') or []:
+                        if res.get('resultName') is not None:
+                            namesDict[res.get('resultName')] = None
+
+            allNames = list(namesDict)
         
         if allNames == []: return None
 
         return allNames
 
+    @_memoizedQuery
+    def retrieveResultCatalog(self, *, serverSide:bool = False) -> DataFrame:
+        """Returns the catalog of the test results of all the components of
+        the collation, a DataFrame indexed by result name containing, for
+        each result, the number of results and components, the chip types,
+        locations, tags, units and process stages found, and the range of
+        execution dates. See mongoreader.results.resultStore.catalog().
+
+        The catalog is computed from the columnar result store of the
+        collation, and kept in the query cache. If serverSide is True, it is
+        computed with a "$group" aggregation on the database at each call,
+        and it is not cached.
+
+        Keyword Args:
+            serverSide (bool, optional): If True, the catalog is computed on
+                the database. Defaults to False.
+
+        Returns:
+            DataFrame: The catalog.
+        """
+
+        chipTypesDict = self._labels.chipTypes
+
+        if serverSide:
+            with opened(self.connection):
+                return rs.queryResultCatalog(self.connection,
+                                             self._allComponentsDict or {},
+                                             chipTypesDict)
+        
+        return self._results.catalog(chipTypesDict)
+
+
+    def queryCacheInfo(self) -> dict:
+        """Returns the statistics of the query cache of the collation, in the
+        form {'hits': <int>, 'misses': <int>, 'entries': <int>,
+        'maxEntries': <int>}.
+        
+        The query cache stores the results scooped by retrieve and plot
+        methods, keyed by their normalized filters, so that repeating a
+        query with the same filters does not scoop the results again, even
+        with a different return type. It is cleared by refresh()."""
+
+        if self._queryCache is None:
+            return {'hits': 0, 'misses': 0, 'entries': 0, 'maxEntries': 0}
+
+        return {'hits': self._queryCache.hits,
+                'misses': self._queryCache.misses,
+                'entries': len(self._queryCache),
+                'maxEntries': self._queryCache.maxEntries}
+
+    def clearQueryCache(self):
+        """Removes all the entries from the query cache of the collation."""
+
+        if self._queryCache is not None:
+            self._queryCache.invalidate()
 
     def _scoopTestResults(self,
             chipTypes:list = None,
@@ -1071,13 +2321,34 @@ class waferCollation(c.collation):
             *,
             returnType:str = 'dictionary',
             averageDataDictionary:bool = False,
+            serverSide:bool = False,
+            parallel:int = None,
             verbose:bool = True,
     ):
         """Internal method to scoop results from the test history of wafer
         compoents.
         
         Results are formatted in different ways depending on the value of
-        "returnType". For other methods see
+        "returnType". "dataDictionary" results are filtered from the
+        columnar result store of the collation (see _results).
+
+        If serverSide is True (only with returnType = "dataDictionary"), the
+        filters are compiled into an aggregation pipeline run on the
+        database (see mongoreader.results.compileResultPipeline()), so that
+        only the matching results are retrieved, and the test history of
+        the components is never downloaded.
+
+        Otherwise, scooped results are kept in the query cache of the
+        collation, keyed by the normalized filters only, and all the return
+        types are derived from the same entry (see _queryEntry()). They are
+        returned as shallow copies (see _shallowCopy()).
+
+        If parallel is passed, the selected components are split across a
+        pool of "parallel" processes, and the results are merged in label
+        order (for "dataDictionary", the pool is used to build the result
+        store, if it has not been built yet).
+        
+        For other methods see
         mongomanager
             └ goggleFunctions
                 └ componentGoggleFunctions
@@ -1106,6 +2377,11 @@ class waferCollation(c.collation):
         elif returnType == 'dataDictionary':
             scoopReturnType = 'DataFrameDictionary'
 
+        if serverSide and returnType != 'dataDictionary':
+            raise ValueError('"serverSide" is only supported with returnType = "dataDictionary".')
+
+        par.checkParallel(parallel)
+
         # Determining chip serials to be considered
         chipSerials = self._selectLabels(chipTypes, chipGroupsDict)
 
@@ -1114,76 +2390,689 @@ class waferCollation(c.collation):
             return None
         
         # Location groups to location lists
-        locationDict = {}
+        locationDict = self._locationsDict(chipSerials, locationGroups)
+
+        filters = {
+            'resultNames': resultNames,
+            'searchDatasheetData': searchDatasheetData,
+            'requiredStati': requiredStati,
+            'requiredProcessStages': requiredProcessStages,
+            'requiredTags': requiredTags,
+            'tagsToExclude': tagsToExclude,
+            'earliestExecutionDate': earliestExecutionDate,
+            'latestExecutionDate': latestExecutionDate,
+            'requiredTestReportID': requiredTestReportID,
+        }
 
-        if locationGroups is None:
-            locationDict = {serial: None for serial in chipSerials}
-        else:
-            for serial in chipSerials:
-                locationDict[serial] = []
-                bp = self._allComponentBPdict[serial]
+        if returnType == 'dataDictionary' and serverSide:
+            components = {serial: self._allComponentsDict[serial]
+                          for serial in chipSerials
+                          if serial in self._allComponentsDict}
 
-                for locGroup in locationGroups:
-                    locNames = bp.Locations.retrieveGroupElements(locGroup, verbose = False)
-                    if locNames is not None:
-                        locationDict[serial] += locNames
+            # The pipeline already applied all the filters
+            with opened(self.connection):
+                store = rs.queryResultStore(self.connection, components,
+                                            locationDict, **filters)
 
-        allScooped = []
-        for serial in chipSerials:
+            return store.dataDictionaryRecords()
 
-            cmp = self._allComponentsDict[serial]
+        entry = self._queryEntry(chipSerials, locationDict, filters)
 
-            scooped = cmpGoggles.scoopComponentResults(
-                            self._allComponentsDict[serial],
-                            resultNames,
-                            locationDict[serial], # All location names
-                            searchDatasheetData,
-                            requiredStati,
-                            requiredProcessStages,
-                            requiredTags,
-                            tagsToExclude,
-                            earliestExecutionDate,
-                            latestExecutionDate,
-                            requiredTestReportID,
-                            returnType = scoopReturnType)
-            
-            if scooped is None: continue
-
-            if returnType == 'dataDictionary':
-                for s in scooped:
-                    minimal = {
-                        'label': serial,
-                        'value': s.get('resultValue'),
-                        'location': s.get('location'),
-                    }
-                    allScooped.append(minimal)
-                continue
-            
-            additional = {'wafer': self.wafer.name,
-                          'componentName': cmp.name,
-                          'componentID': cmp.ID,
-                          'label': serial}
-            
-            for s in scooped:
-                complete = {**additional, **s}
-                allScooped.append(complete)
-            # Adding wafer-scale information
+        if returnType == 'dataDictionary':
 
-        if returnType == 'dictionary':
-            return allScooped
-        elif returnType == 'DataFrame':
-            return DataFrame([s for s in allScooped])
+            if 'dataDictionary' not in entry:
+                if 'DataFrameDictionary' in entry:
+                    entry['dataDictionary'] = _dataDictionaryRecords(entry['DataFrameDictionary'])
+                else:
+                    entry['dataDictionary'] = self._resultStore(parallel).dataDictionaryRecords(chipSerials,
+                                                    locationsDict = locationDict,
+                                                    **filters)
+
+            return _shallowCopy(entry['dataDictionary'])
+
+        if scoopReturnType not in entry:
+
+            self._loadScoopFields(chipSerials, locationDict, filters)
+
+            # Only the test history of the selected components is shipped to
+            # worker processes
+            components = par.shipComponents([self._allComponentsDict[serial] for serial in chipSerials],
+                                            ['testHistory'], parallel)
+            items = [(serial, cmp, locationDict[serial])
+                     for serial, cmp in zip(chipSerials, components)]
+
+            entry[scoopReturnType] = par.mapChunks(_scoopComponentResults, items, parallel,
+                                                   self.wafer.name, scoopReturnType, filters)
+
+        if returnType == 'dictionary':
+            return _shallowCopy(entry['dictionary'])
+        elif returnType == 'DataFrame':
+            if 'DataFrame' not in entry:
+                entry['DataFrame'] = DataFrame([s for s in entry['DataFrameDictionary']])
+            return _shallowCopy(entry['DataFrame'])
         elif returnType == 'testResult':
-            return allScooped
-        elif returnType == 'dataDictionary':
-            return allScooped
+            return _shallowCopy(entry['testResult'])
         
         else:
             raise Exception('Nothing to return. Check returnType!')
 
-    def retrieveTestResults(self,
-        resultName_orNames = None,
-        locationGroup_orGroups = None,
+    def _queryEntry(self, chipSerials:list, locationDict:dict, filters:dict) -> dict:
+        """Returns the entry of the query cache for the normalized filters of
+        _scoopTestResults(), creating it if needed.
+
+        Entries are dictionaries in the form {<format>: <scooped results>},
+        where formats are the scoop return types ("dictionary",
+        "DataFrameDictionary", "testResult") and the derived "DataFrame" and
+        "dataDictionary", filled as they are requested. Since the key does
+        not depend on the return type, retrieve, plot and averaging methods
+        called with the same filters share the same entry (e.g. the data
+        dictionary of plotTestResults() is derived from the results scooped
+        by retrieveTestResults(returnDataFrame = True)).
+
+        If the query cache is disabled, an empty entry is returned."""
+
+        if self._queryCache is None:
+            return {}
+
+        key = ('_scoopTestResults',
+               ch.freeze(chipSerials),
+               ch.freeze({serial: locationDict[serial] for serial in chipSerials}),
+               ch.freeze(filters))
+
+        entry = self._queryCache.get(key)
+        if entry is None:
+            entry = {}
+            self._queryCache.put(key, entry)
+        else:
+            log.debug('[_scoopTestResults] Results retrieved from the query cache.')
+
+        return entry
+
+    def _locationsDict(self, chipSerials:list, locationGroups:list) -> dict:
+        """Returns a dictionary in the form {<label>: <list of locations>}
+        with all the locations associated to locationGroups for each label,
+        or {<label>: None} if locationGroups is None."""
+
+        if locationGroups is None:
+            return {serial: None for serial in chipSerials}
+        
+        locationDict = {}
+        for serial in chipSerials:
+            locationDict[serial] = []
+
+            for locGroup in locationGroups:
+                locNames = self._labels.locations(serial, locGroup)
+                if locNames is not None:
+                    locationDict[serial] += locNames
+
+        return locationDict
+
+    def _loadScoopFields(self, chipSerials:list, locationDict:dict, filters:dict):
+        """Makes sure that the components of chipSerials hold the fields
+        needed to scoop their results with "filters" (see
+        _loadTestHistories()): only the results with the requested names and
+        locations are retrieved for lazy collations."""
+
+        locations = None
+        if all(locs is not None for locs in locationDict.values()):
+            locations = [loc for locs in locationDict.values() for loc in locs]
+
+        self._loadTestHistories(chipSerials, filters['resultNames'], locations)
+
+        if filters['searchDatasheetData']:
+            self._loadFields(['datasheetData'])
+
+    def _iterScoopedResults(self, chipSerials:list, locationDict:dict,
+            resultNames:list = None,
+            searchDatasheetData:bool = False,
+            requiredStati:list = None,
+            requiredProcessStages:list = None,
+            requiredTags:list = None,
+            tagsToExclude:list = None,
+            earliestExecutionDate = None,
+            latestExecutionDate = None,
+            requiredTestReportID = None,
+            *,
+            scoopReturnType:str = 'dictionary'):
+        """Generator that scoops the results of the components one at a time,
+        yielding a 2-tuple (<label>, <list of results>) for each component
+        for which results are found.
+        
+        Wafer-scale information ("wafer", "componentName", "componentID" and
+        "label") is added to each result."""
+
+        filters = {
+            'resultNames': resultNames,
+            'searchDatasheetData': searchDatasheetData,
+            'requiredStati': requiredStati,
+            'requiredProcessStages': requiredProcessStages,
+            'requiredTags': requiredTags,
+            'tagsToExclude': tagsToExclude,
+            'earliestExecutionDate': earliestExecutionDate,
+            'latestExecutionDate': latestExecutionDate,
+            'requiredTestReportID': requiredTestReportID,
+        }
+
+        self._loadScoopFields(chipSerials, locationDict, filters)
+
+        for serial in chipSerials:
+
+            item = (serial, self._allComponentsDict[serial], locationDict[serial])
+            scooped = _scoopComponentResults([item], self.wafer.name,
+                                             scoopReturnType, filters)
+            
+            if scooped == []: continue
+            
+            yield serial, scooped
+
+    def iterTestResults(self,
+        resultName_orNames = None,
+        locationGroup_orGroups = None,
+        chipType_orTypes = None,
+        chipGroupsDict:dict = None,
+        searchDatasheetData:bool = False,
+        requiredStatus_orList = None,
+        requiredProcessStage_orList = None,
+        requiredTags:list = None,
+        tagsToExclude:list = None,
+        earliestExecutionDate = None,
+        latestExecutionDate = None,
+        requiredTestReportID = None,
+        *,
+        verbose:bool = True):
+        """Generator that works like retrieveTestResults(), but yields the
+        results (as dictionaries) one at a time, scooping them chip by chip.
+
+        Only the results of a single component are held in memory at any
+        time, so that large amounts of results can be exported to CSV files
+        or other sinks in constant memory. See retrieveTestResults() for
+        the arguments.
+
+        Yields:
+            dict: The scooped results.
+        """
+
+        yield from self._iterTestResults(resultName_orNames,
+                                locationGroup_orGroups,
+                                chipType_orTypes,
+                                chipGroupsDict,
+                                searchDatasheetData,
+                                requiredStatus_orList,
+                                requiredProcessStage_orList,
+                                requiredTags,
+                                tagsToExclude,
+                                earliestExecutionDate,
+                                latestExecutionDate,
+                                requiredTestReportID,
+                                scoopReturnType = 'dictionary',
+                                verbose = verbose)
+
+    def _iterTestResults(self,
+        resultName_orNames = None,
+        locationGroup_orGroups = None,
+        chipType_orTypes = None,
+        chipGroupsDict:dict = None,
+        searchDatasheetData:bool = False,
+        requiredStatus_orList = None,
+        requiredProcessStage_orList = None,
+        requiredTags:list = None,
+        tagsToExclude:list = None,
+        earliestExecutionDate = None,
+        latestExecutionDate = None,
+        requiredTestReportID = None,
+        *,
+        scoopReturnType:str = 'dictionary',
+        verbose:bool = True):
+        """Internal generator of iterTestResults() and
+        iterTestResultFrames(), yielding the results scooped with
+        "scoopReturnType" (see scoopComponentResults())."""
+
+        def normalizeArgument(arg):
+            if arg is None: return None
+            if isinstance(arg, list): return arg
+            return [arg]
+
+        chipTypes = normalizeArgument(chipType_orTypes)
+        locationGroups = normalizeArgument(locationGroup_orGroups)
+
+        if chipTypes is None: chipTypes = ['chips']
+
+        chipSerials = self._selectLabels(chipTypes, chipGroupsDict)
+
+        if chipSerials is None:
+            if verbose: log.warning(f'No chip serials have been determined!')
+            return
+
+        locationDict = self._locationsDict(chipSerials, locationGroups)
+
+        for _, scooped in self._iterScoopedResults(chipSerials, locationDict,
+                                normalizeArgument(resultName_orNames),
+                                searchDatasheetData,
+                                normalizeArgument(requiredStatus_orList),
+                                normalizeArgument(requiredProcessStage_orList),
+                                requiredTags,
+                                tagsToExclude,
+                                earliestExecutionDate,
+                                latestExecutionDate,
+                                requiredTestReportID,
+                                scoopReturnType = scoopReturnType):
+            yield from scooped
+
+    def iterTestResultFrames(self,
+        resultName_orNames = None,
+        locationGroup_orGroups = None,
+        chipType_orTypes = None,
+        chipGroupsDict:dict = None,
+        searchDatasheetData:bool = False,
+        requiredStatus_orList = None,
+        requiredProcessStage_orList = None,
+        requiredTags:list = None,
+        tagsToExclude:list = None,
+        earliestExecutionDate = None,
+        latestExecutionDate = None,
+        requiredTestReportID = None,
+        *,
+        chunkSize:int = 10000,
+        columns:list = None,
+        verbose:bool = True):
+        """Generator that works like iterTestResults(), but yields the
+        results as DataFrames of (at most) chunkSize rows, formatted as in
+        retrieveTestResults(returnDataFrame = True).
+
+        All the DataFrames have the same columns, so that they can be
+        appended to the same CSV file:
+
+        >>> for index, frame in enumerate(wc.iterTestResultFrames('IL')):
+        >>>     frame.to_csv(path, mode = 'a', header = index == 0)
+
+        Keyword Args:
+            chunkSize (int, optional): The maximum number of rows of each
+                DataFrame. Defaults to 10000.
+            columns (list[str], optional): The columns of the DataFrames. If
+                None, they are the keys found in the results of the first
+                chunk, in order of appearance. Defaults to None.
+        
+        See retrieveTestResults() for the other arguments.
+
+        Raises:
+            ValueError: If "columns" is None and a result of a later chunk
+                has keys not found in the first one, since they could not be
+                added to the DataFrames already yielded. Pass "columns" to
+                select the columns explicitly.
+
+        Yields:
+            DataFrame: The chunks of scooped results.
+        """
+
+        if not isinstance(chunkSize, int):
+            raise TypeError('"chunkSize" must be a positive integer.')
+        if chunkSize < 1:
+            raise ValueError('"chunkSize" must be a positive integer.')
+        
+        if columns is not None:
+            if not isListOfStrings(columns):
+                raise TypeError('"columns" must be a list of strings.')
+
+        inferColumns = columns is None
+        chunk = []
+
+        for result in self._iterTestResults(resultName_orNames,
+                                locationGroup_orGroups,
+                                chipType_orTypes,
+                                chipGroupsDict,
+                                searchDatasheetData,
+                                requiredStatus_orList,
+                                requiredProcessStage_orList,
+                                requiredTags,
+                                tagsToExclude,
+                                earliestExecutionDate,
+                                latestExecutionDate,
+                                requiredTestReportID,
+                                scoopReturnType = 'DataFrameDictionary',
+                                verbose = verbose):
+            
+            chunk.append(result)
+
+            if len(chunk) == chunkSize:
+                columns = self._chunkColumns(chunk, columns, inferColumns)
+                yield DataFrame(chunk, columns = columns)
+                chunk = []
+
+        if chunk != []:
+            columns = self._chunkColumns(chunk, columns, inferColumns)
+            yield DataFrame(chunk, columns = columns)
+
+    @staticmethod
+    def _chunkColumns(chunk:list, columns:list, inferColumns:bool) -> list:
+        """Returns the columns of the DataFrame of a chunk of results (see
+        iterTestResultFrames()).
+
+        If "columns" is None, they are the keys of the results of the chunk,
+        in order of appearance. If "columns" has been inferred from a
+        previous chunk (inferColumns is True), a ValueError is raised when a
+        result has keys not among them."""
+
+        if columns is None:
+            # {<key>: None} keeps the order of appearance
+            return list({key: None for result in chunk for key in result})
+
+        if inferColumns:
+            newKeys = {key for result in chunk for key in result if key not in columns}
+            if newKeys != set():
+                raise ValueError(f'Results have keys not found in the first chunk ({", ".join(sorted(newKeys))}). Pass "columns" to select the columns.')
+
+        return columns
+
+    def retrieveTestResults(self,
+        resultName_orNames = None,
+        locationGroup_orGroups = None,
+        chipType_orTypes = None,
+        chipGroupsDict:dict = None,
+        searchDatasheetData:bool = False,
+        requiredStatus_orList = None,
+        requiredProcessStage_orList = None,
+        requiredTags:list = None,
+        tagsToExclude:list = None,
+        earliestExecutionDate = None,
+        latestExecutionDate = None,
+        requiredTestReportID = None,
+        *,
+        returnDataFrame:bool = False,
+        parallel:int = None,
+        verbose:bool = True):
+        """Returns results collected from the test history of components of the
+        wafer collation.
+
+        Args:
+            resultName_orNames (str | List[str], optional): If passed, result(s)
+                whose name is not listed here are ignored.
+            locationGroup_orGroups (str | List[str], optional): If passed,
+                results whose location is not among correponding to these
+                location groups are ignored.
+            chipType_orTypes (str | List[str]): Pass any of the following
+                strings or a list of them to select which wafer components are
+                considered: "chips", "testChips", "bars", "testCells".
+                Defaults to "chips".
+            chipGroupsDict (dict, optional): If passed, it can be used to filter
+                which group for each chipType is plotted. Pass it in the form
+                {
+                    <chipType1>: <list of groups for chipType1>,
+                    <chipType2>: <list of groups for chipType2>,
+                    ...
+                }
+                Not all chip type must be present within the dictionary. If
+                they are not, all the chips for that group are considered.
+            searchDatasheetData (bool, optional): If True, only results for
+                which "datasheetReady" = True are collected. Defaults to False.
+            requiredStatus_orList (str | List[str]): If passed, only results
+                for which the chip status was among these are collected.
+            requiredProcessStage_orList (str | List[str]): If passed, only
+                results for which the chip processStage was among these are
+                collected.
+            requiredTags (list, optional): If passed, results tags must contain
+                those listed here to be collected.
+            tagsToExclude (list, optional): If passed, results whose tags are
+                among these are not collected. Defaults to None.
+            earliestExecutionDate (aware datetime object, optional): If passed,
+                only results generated after this date are collected.
+            latestExecutionDate (aware datetime object, optional): If passed,
+                only results generated before this date are collected.
+            requiredTestReportID (ID, optional): If passed, only results whose
+                testReportID is equal to this are collected.
+        
+                
+        Keyword Args:
+            returnDataFrame (bool, optional): If True, data are returned as
+                a pandas DataFrame. Defaults to False
+            parallel (int, optional): If passed, the selected components are
+                split across a pool of "parallel" processes, and the results
+                are merged in label order. Defaults to None.
+            verbose (bool, optional): If False, warning messages are suppressed.
+                Defaults to True.
+        
+        Returns:
+            List[dict] | DataFrame | None
+        """
+
+        def normalizeArgument(arg):
+            if arg is None: return None
+
+            if isinstance(arg, list): return arg
+
+            return [arg]
+
+        chipTypes = normalizeArgument(chipType_orTypes)
+        resultNames = normalizeArgument(resultName_orNames)
+        locationGroups = normalizeArgument(locationGroup_orGroups)
+        requiredStati = normalizeArgument(requiredStatus_orList)
+        requiredProcessStages = normalizeArgument(requiredProcessStage_orList)
+        
+        if chipTypes is None: chipTypes = ['chips']
+
+        if returnDataFrame:
+            returnType = 'DataFrame'
+        else:
+            returnType = 'dictionary'
+
+        return self._scoopTestResults(chipTypes,
+                                      chipGroupsDict,
+                                      resultNames,
+                                      locationGroups,
+                                      searchDatasheetData,
+                                      requiredStati,
+                                      requiredProcessStages,
+                                      requiredTags,
+                                      tagsToExclude,
+                                      earliestExecutionDate,
+                                      latestExecutionDate,
+                                      requiredTestReportID,
+                                      returnType = returnType,
+                                      parallel = parallel,
+                                      verbose = verbose)
+
+
+    def retrieveTestResultsSince(self,
+        watermark:datetime = None,
+        resultName_orNames = None,
+        locationGroup_orGroups = None,
+        chipType_orTypes = None,
+        chipGroupsDict:dict = None,
+        searchDatasheetData:bool = False,
+        requiredStatus_orList = None,
+        requiredProcessStage_orList = None,
+        requiredTags:list = None,
+        tagsToExclude:list = None,
+        requiredTestReportID = None,
+        *,
+        returnDataFrame:bool = False,
+        verbose:bool = True) -> tuple:
+        """Returns the test results executed after "watermark", together with
+        a new watermark to be passed to the next call. It is meant to be
+        polled, e.g. by dashboards monitoring a production line.
+
+        Only the components whose test history contains entries executed
+        after the watermark are retrieved, with a single query using
+        "$elemMatch" on "testHistory.executionDate" (see
+        mongoreader.bulk.queryComponentsTestedAfter()), and only their
+        entries executed after the watermark are transferred (see
+        mongoreader.bulk.testHistoryAfterProjection()).
+        
+        The new entries replace those executed after the watermark in the
+        test history of the components of the collation, and their results
+        are appended to the result store (see _results), if it has already
+        been built. Subsequent calls to the other retrieve and plot methods
+        thus see the new results. The cost of a call scales with the number
+        of entries executed since the last call, not with the size of the
+        wafer.
+
+        Note that results inserted with an execution date earlier than the
+        watermark are not returned.
+
+        Args:
+            watermark (datetime, optional): Only results executed strictly
+                after this date are returned. Naive datetimes are assumed to
+                be in UTC. If None, all the results are returned. Defaults to
+                None.
+            
+            For the other arguments, see retrieveTestResults().
+
+        Keyword Args:
+            returnDataFrame (bool, optional): If True, data are returned as
+                a pandas DataFrame. Defaults to False
+            verbose (bool, optional): If False, warning messages are suppressed.
+                Defaults to True.
+        
+        Returns:
+            tuple: A 2-tuple (<results>, <new watermark>). The new watermark
+                is the latest execution date found in the retrieved test
+                entries, or the passed watermark if nothing new is found.
+                Results are None if no new result is found, otherwise a list
+                of dictionaries (or a DataFrame with the same columns) in the
+                form
+                {
+                    'wafer': <wafer name>,
+                    'label': <label>,
+                    'componentID': <component ID>,
+                    'resultName': <result name>,
+                    'location': <location>,
+                    'tags': <frozenset of result tags>,
+                    'value': <value>,
+                    'error': <error>,
+                    'unit': <unit>,
+                    'executionDate': <pandas Timestamp in UTC>,
+                    'processStage': <process stage>,
+                    'status': <status>,
+                    'testReportID': <test report ID as a string>,
+                    'datasheetReady': <bool>,
+                }
+                i.e. the columns of mongoreader.results.resultStore. Note that
+                they differ from the keys returned by retrieveTestResults(),
+                which are those of scoopComponentResults().
+        """
+
+        def normalizeArgument(arg):
+            if arg is None: return None
+
+            if isinstance(arg, list): return arg
+
+            return [arg]
+
+        if watermark is not None and not isinstance(watermark, datetime):
+            raise TypeError('"watermark" must be a datetime object or None.')
+
+        chipTypes = normalizeArgument(chipType_orTypes)
+        resultNames = normalizeArgument(resultName_orNames)
+        locationGroups = normalizeArgument(locationGroup_orGroups)
+        requiredStati = normalizeArgument(requiredStatus_orList)
+        requiredProcessStages = normalizeArgument(requiredProcessStage_orList)
+        
+        if chipTypes is None: chipTypes = ['chips']
+
+        chipSerials = self._selectLabels(chipTypes, chipGroupsDict)
+
+        if chipSerials is None:
+            if verbose: log.warning('No chip serials have been determined!')
+            return None, watermark
+
+        # Labels without a component are skipped
+        labelsByID = {}
+        for serial in chipSerials:
+            cmp = (self._allComponentsDict or {}).get(serial)
+            if cmp is not None:
+                labelsByID[cmp.ID] = serial
+
+        with opened(self.connection):
+            docs = bulk.queryComponentsTestedAfter(self.connection, list(labelsByID),
+                                                   watermark,
+                                                   projection = bulk.testHistoryAfterProjection(watermark),
+                                                   returnType = 'dictionary')
+
+        log.spare(f'Retrieved the new test entries of {len(docs)} components.')
+
+        histories = [(labelsByID[doc['_id']], doc['_id'], doc.get('testHistory') or [])
+                     for doc in docs if doc.get('_id') in labelsByID]
+
+        if histories == []:
+            return None, watermark
+
+        self._mergeTestEntries(histories, watermark)
+
+        # Selecting new results
+        changed = [label for label, _, _ in histories]
+        store = rs.resultStore.fromRows(rs._historyRows(histories)[0])
+
+        mask = store.mask(changed,
+                          resultNames,
+                          self._locationsDict(changed, locationGroups),
+                          searchDatasheetData,
+                          requiredStati,
+                          requiredProcessStages,
+                          requiredTags,
+                          tagsToExclude,
+                          requiredTestReportID = requiredTestReportID)
+
+        dates = store.frame['executionDate']
+        if watermark is not None:
+            mask &= dates > store._timestamp(watermark)
+
+        if dates.notna().any():
+            newWatermark = dates.max().to_pydatetime()
+            if watermark is not None:
+                newWatermark = max(newWatermark, store._timestamp(watermark).to_pydatetime())
+        else:
+            newWatermark = watermark
+
+        selected = store.frame.loc[mask, store.columns].astype(object)
+        selected.insert(0, 'wafer', self.wafer.name)
+
+        if selected.empty:
+            return None, newWatermark
+
+        if returnDataFrame:
+            return selected.reset_index(drop = True), newWatermark
+
+        return selected.to_dict('records'), newWatermark
+
+    def _mergeTestEntries(self, histories:list, watermark:datetime = None):
+        """Merges into the collation the test entries executed after
+        "watermark" (all of them, if watermark is None), given as a list of
+        (<label>, <component ID>, <entries>) tuples.
+
+        The entries replace those executed after the watermark in the test
+        history of the components (if it has been retrieved), and their
+        results replace those of the result store (if it has been built).
+        The query cache is cleared."""
+
+        def executedAfter(entry:dict) -> bool:
+            if watermark is None: return True
+            date = entry.get('executionDate')
+            return date is not None and rs.resultStore._timestamp(date) > rs.resultStore._timestamp(watermark)
+
+        # Lazy collations retrieve the whole test history when needed
+        if self._loadedFields is None or 'testHistory' in self._loadedFields:
+
+            for label, _, entries in histories:
+                cmp = self._allComponentsDict[label]
+                kept = [entry for entry in cmp.getField('testHistory', verbose = False) or []
+                        if not executedAfter(entry)]
+                cmp['testHistory'] = kept + entries
+
+        store = self._resultStoreCache
+        if store is not None:
+
+            dropMask = store.frame['componentID'].isin([ID for _, ID, _ in histories])
+            if watermark is not None:
+                dropMask &= store.frame['executionDate'] > store._timestamp(watermark)
+
+            store.append(rs._historyRows(histories)[0], dropMask)
+
+        # Scooped results are out of date
+        self.clearQueryCache()
+
+
+    def retrieveResultMatrix(self,
+        resultNames:list,
+        locationGroups = None,
         chipType_orTypes = None,
         chipGroupsDict:dict = None,
         searchDatasheetData:bool = False,
@@ -1195,122 +3084,204 @@ class waferCollation(c.collation):
         latestExecutionDate = None,
         requiredTestReportID = None,
         *,
-        returnDataFrame:bool = False,
-        verbose:bool = True):
-        """Returns results collected from the test history of components of the
-        wafer collation.
+        averaged:bool = False,
+        serverSide:bool = False,
+        verbose:bool = True) -> DataFrame:
+        """Returns the values of many results at once as a wide table, whose
+        rows are component labels and whose columns are (resultName,
+        location) pairs.
+
+        All the results are selected from the columnar result store of the
+        collation (see _results) in a single pass, so that retrieving many
+        result names costs roughly as retrieving one.
 
         Args:
-            resultName_orNames (str | List[str], optional): If passed, result(s)
-                whose name is not listed here are ignored.
-            locationGroup_orGroups (str | List[str], optional): If passed,
-                results whose location is not among correponding to these
-                location groups are ignored.
-            chipType_orTypes (str | List[str]): Pass any of the following
-                strings or a list of them to select which wafer components are
-                considered: "chips", "testChips", "bars", "testCells".
-                Defaults to "chips".
-            chipGroupsDict (dict, optional): If passed, it can be used to filter
-                which group for each chipType is plotted. Pass it in the form
-                {
-                    <chipType1>: <list of groups for chipType1>,
-                    <chipType2>: <list of groups for chipType2>,
-                    ...
-                }
-                Not all chip type must be present within the dictionary. If
-                they are not, all the chips for that group are considered.
-            searchDatasheetData (bool, optional): If True, only results for
-                which "datasheetReady" = True are collected. Defaults to False.
-            requiredStatus_orList (str | List[str]): If passed, only results
-                for which the chip status was among these are collected.
-            requiredProcessStage_orList (str | List[str]): If passed, only
-                results for which the chip processStage was among these are
-                collected.
-            requiredTags (list, optional): If passed, results tags must contain
-                those listed here to be collected.
-            tagsToExclude (list, optional): If passed, results whose tags are
-                among these are not collected. Defaults to None.
-            earliestExecutionDate (aware datetime object, optional): If passed,
-                only results generated after this date are collected.
-            latestExecutionDate (aware datetime object, optional): If passed,
-                only results generated before this date are collected.
-            requiredTestReportID (ID, optional): If passed, only results whose
-                testReportID is equal to this are collected.
+            resultNames (list[str]): The names of the results.
+            locationGroups (str | list[str] | dict, optional): If passed, only
+                results at the locations associated to these location groups
+                are considered. Pass a dictionary in the form
+                {<resultName>: <location group(s)>} to use different location
+                groups for different results (results not in the dictionary
+                are not filtered). Defaults to None.
         
-                
         Keyword Args:
-            returnDataFrame (bool, optional): If True, data are returned as
-                a pandas DataFrame. Defaults to False
+            averaged (bool, optional): If True, the values are averaged to the
+                chip-scale level, and the columns of the table are the result
+                names. Defaults to False.
+            serverSide (bool, optional): If True, results are filtered on the
+                database (see _scoopTestResults()). Defaults to False.
             verbose (bool, optional): If False, warning messages are suppressed.
                 Defaults to True.
-        
+
+        See retrieveTestResults() for the other arguments.
+
         Returns:
-            List[dict] | DataFrame | None
+            DataFrame | None: The wide table, or None if no component label is
+                selected.
         """
 
         def normalizeArgument(arg):
             if arg is None: return None
-
             if isinstance(arg, list): return arg
-
             return [arg]
 
+        resultNames = normalizeArgument(resultNames)
+        if not isListOfStrings(resultNames):
+            raise TypeError('"resultNames" must be a string or a list of strings.')
+
+        if isinstance(locationGroups, dict):
+            locationGroupsDict = {name: normalizeArgument(locationGroups.get(name))
+                                  for name in resultNames}
+        else:
+            locationGroupsDict = {name: normalizeArgument(locationGroups)
+                                  for name in resultNames}
+
         chipTypes = normalizeArgument(chipType_orTypes)
-        resultNames = normalizeArgument(resultName_orNames)
-        locationGroups = normalizeArgument(locationGroup_orGroups)
-        requiredStati = normalizeArgument(requiredStatus_orList)
-        requiredProcessStages = normalizeArgument(requiredProcessStage_orList)
-        
         if chipTypes is None: chipTypes = ['chips']
 
-        if returnDataFrame:
-            returnType = 'DataFrame'
+        chipSerials = self._selectLabels(chipTypes, chipGroupsDict)
+
+        if chipSerials is None:
+            if verbose: log.warning(f'No chip serials have been determined!')
+            return None
+        
+        filters = {
+            'searchDatasheetData': searchDatasheetData,
+            'requiredStati': normalizeArgument(requiredStatus_orList),
+            'requiredProcessStages': normalizeArgument(requiredProcessStage_orList),
+            'requiredTags': requiredTags,
+            'tagsToExclude': tagsToExclude,
+            'earliestExecutionDate': earliestExecutionDate,
+            'latestExecutionDate': latestExecutionDate,
+            'requiredTestReportID': requiredTestReportID,
+        }
+
+        # Result names that share the same location groups share a mask
+        namesByGroups = {}
+        for name, groups in locationGroupsDict.items():
+            key = None if groups is None else tuple(groups)
+            namesByGroups.setdefault(key, []).append(name)
+
+        locationDicts = {groups: self._locationsDict(chipSerials, groups and list(groups))
+                         for groups in namesByGroups}
+
+        if serverSide:
+            # A single aggregation for all the result names
+            if None in namesByGroups:
+                allLocations = None
+            else:
+                allLocations = {serial: _joinListsOrNone(*[locDict[serial] for locDict in locationDicts.values()]) or []
+                                for serial in chipSerials}
+            
+            components = {serial: self._allComponentsDict[serial]
+                          for serial in chipSerials
+                          if serial in self._allComponentsDict}
+
+            with opened(self.connection):
+                store = rs.queryResultStore(self.connection, components, allLocations,
+                                            resultNames = resultNames, **filters)
         else:
-            returnType = 'dictionary'
+            store = self._results
 
-        return self._scoopTestResults(chipTypes,
-                                      chipGroupsDict,
-                                      resultNames,
-                                      locationGroups,
-                                      searchDatasheetData,
-                                      requiredStati,
-                                      requiredProcessStages,
-                                      requiredTags,
-                                      tagsToExclude,
-                                      earliestExecutionDate,
-                                      latestExecutionDate,
-                                      requiredTestReportID,
-                                      returnType = returnType,
-                                      verbose = verbose)
+        mask = None
+        for groups, names in namesByGroups.items():
+            namesMask = store.mask(chipSerials, names, locationDicts[groups], **filters)
+            mask = namesMask if mask is None else mask | namesMask
+
+        return store.matrix(mask, chipSerials, resultNames, averaged = averaged)
 
 
     def retrieveAveragedTestData(self,
         resultName_orNames,
-        chipType_orTypes,
+        chipType_orTypes = None,
         chipGroupsDict:dict = None,
         locationGroup_orGroups = None,
         searchDatasheetData:bool = False,
         requiredStatus_orList = None,
         requiredProcessStage_orList = None,
         requiredTags:list = None,
-        tagsToExclude:list = None) -> dict:
-        """Works like .retrieveTestData, but values are averaged to the chip-scale
-            level."""
-        raise NotImplementedError()
+        tagsToExclude:list = None,
+        earliestExecutionDate = None,
+        latestExecutionDate = None,
+        requiredTestReportID = None,
+        *,
+        serverSide:bool = False,
+        verbose:bool = True) -> DataFrame:
+        """Works like retrieveTestResults(), but values are averaged to the
+        chip-scale level.
+
+        For each component label and result name, it returns the mean,
+        median, standard deviation, minimum, maximum and count of the values
+        found at the locations of the component, together with their unit.
+        Statistics are computed with grouped reductions on the columnar
+        result store of the collation (see
+        mongoreader.results.resultStore.chipScaleStatistics()).
 
-        dataDict_subchip = self.retrieveTestData(resultName_orNames,
-            chipType_orTypes,
-            chipGroupsDict,
-            locationGroup_orGroups,
-            searchDatasheetData,
-            requiredStatus_orList,
-            requiredProcessStage_orList,
-            requiredTags,
-            tagsToExclude)
+        Keyword Args:
+            serverSide (bool, optional): If True, results are filtered on the
+                database (see _scoopTestResults()). Defaults to False.
+            verbose (bool, optional): If False, warning messages are suppressed.
+                Defaults to True.
+
+        See retrieveTestResults() for the other arguments.
+
+        Raises:
+            ValueError: If the units of the values averaged together are not
+                equal (None units are ignored).
+
+        Returns:
+            DataFrame | None: A DataFrame whose rows are component labels and
+                whose columns are (resultName, statistic) pairs. None if no
+                component label is selected.
+        """
+
+        def normalizeArgument(arg):
+            if arg is None: return None
+            if isinstance(arg, list): return arg
+            return [arg]
+
+        resultNames = normalizeArgument(resultName_orNames)
+        if not isListOfStrings(resultNames):
+            raise TypeError('"resultName_orNames" must be a string or a list of strings.')
+
+        chipTypes = normalizeArgument(chipType_orTypes)
+        if chipTypes is None: chipTypes = ['chips']
+
+        chipSerials = self._selectLabels(chipTypes, chipGroupsDict)
+
+        if chipSerials is None:
+            if verbose: log.warning(f'No chip serials have been determined!')
+            return None
         
-        dataDict = averageSubchipScaleDataDict(dataDict_subchip)
+        locationDict = self._locationsDict(chipSerials,
+                                normalizeArgument(locationGroup_orGroups))
+
+        filters = {
+            'resultNames': resultNames,
+            'searchDatasheetData': searchDatasheetData,
+            'requiredStati': normalizeArgument(requiredStatus_orList),
+            'requiredProcessStages': normalizeArgument(requiredProcessStage_orList),
+            'requiredTags': requiredTags,
+            'tagsToExclude': tagsToExclude,
+            'earliestExecutionDate': earliestExecutionDate,
+            'latestExecutionDate': latestExecutionDate,
+            'requiredTestReportID': requiredTestReportID,
+        }
 
-        return dataDict
+        if serverSide:
+            components = {serial: self._allComponentsDict[serial]
+                          for serial in chipSerials
+                          if serial in self._allComponentsDict}
+
+            with opened(self.connection):
+                store = rs.queryResultStore(self.connection, components,
+                                            locationDict, **filters)
+        else:
+            store = self._results
+
+        mask = store.mask(chipSerials, locationsDict = locationDict, **filters)
+
+        return store.chipScaleStatistics(mask, chipSerials, resultNames)
         
 
     def plotField(self,
@@ -1342,6 +3313,9 @@ class waferCollation(c.collation):
 
         cmps = self._componentsFromType(chipTypes)
 
+        rootField = field_or_chain if isinstance(field_or_chain, str) else field_or_chain[0]
+        self._loadFields([rootField])
+
         dataDict = {cmp['_waferLabel']: cmp.getField(field_or_chain, verbose = False)
             for cmp in cmps}
         
@@ -1412,9 +3386,7 @@ class waferCollation(c.collation):
 
         for label in chipLabels:
 
-            bp = self._allComponentBPdict[label]
-
-            locNames = bp.Locations.retrieveGroupElements(locationGroup, verbose = False)
+            locNames = self._labels.locations(label, locationGroup)
             if locNames is not None:
                 dataDict[label] = {loc: None for loc in locNames}
 
@@ -1447,6 +3419,8 @@ class waferCollation(c.collation):
         requiredTestReportID = None,
         *,
         averageData:bool = False,
+        serverSide:bool = False,
+        parallel:int = None,
         verbose:bool = True):
 
         def normalizeArgument(arg):
@@ -1492,6 +3466,8 @@ class waferCollation(c.collation):
                                 latestExecutionDate,
                                 requiredTestReportID,
                                 returnType = 'dataDictionary',
+                                serverSide = serverSide,
+                                parallel = parallel,
                                 verbose = True,
             
         ) # List of dicts
@@ -1549,7 +3525,8 @@ class waferCollation(c.collation):
         chipLabelsDirection:str = None,
         title:str = None,
         dpi = None,
-
+        serverSide:bool = False,
+        parallel:int = None,
         verbose:bool = True,
         ):
         """Creates a subchip-scale plot of results present in the test history
@@ -1561,6 +3538,10 @@ class waferCollation(c.collation):
         The plot is generated using waferPlotter.plotData_subchipScale()
         (defined in mongoreader/plotting/waferPlotting.py). See its
         documentation for the keyword arguments of this method.
+
+        If serverSide is True, results are filtered on the database (see
+        _scoopTestResults()). If parallel is passed, the result store is
+        built by a pool of "parallel" processes.
         """
 
         def normalizeArgument(arg):
@@ -1584,11 +3565,13 @@ class waferCollation(c.collation):
                                 latestExecutionDate,
                                 requiredTestReportID,
                                 averageData = False,
+                                serverSide = serverSide,
+                                parallel = parallel,
                                 verbose = verbose)
         
         # Plotting
 
-        plt = wplt.waferPlotter(self.connection, self.waferBlueprint)
+        plt = self.wplt
 
         if title is None: title = resultName
 
@@ -1637,7 +3620,8 @@ class waferCollation(c.collation):
         chipLabelsDirection:str = None,
         title:str = None,
         dpi = None,
-
+        serverSide:bool = False,
+        parallel:int = None,
         verbose:bool = True,
         ):
         """Creates a subchip-scale plot of results present in the test history
@@ -1649,6 +3633,10 @@ class waferCollation(c.collation):
         The plot is generated using waferPlotter.plotData_subchipScale()
         (defined in mongoreader/plotting/waferPlotting.py). See its
         documentation for the keyword arguments of this method.
+
+        If serverSide is True, results are filtered on the database (see
+        _scoopTestResults()). If parallel is passed, the result store is
+        built by a pool of "parallel" processes.
         """
 
         def normalizeArgument(arg):
@@ -1672,11 +3660,13 @@ class waferCollation(c.collation):
                                 latestExecutionDate,
                                 requiredTestReportID,
                                 averageData = True,
+                                serverSide = serverSide,
+                                parallel = parallel,
                                 verbose = verbose)
         
         # Plotting
 
-        plt = wplt.waferPlotter(self.connection, self.waferBlueprint)
+        plt = self.wplt
 
         if title is None: title = resultName
 
@@ -1701,6 +3691,10 @@ class waferCollation(c.collation):
 
 
 
+    # Fields needed by the summary dictionaries
+    _summaryFields = ['tags', 'notes', 'warnings', 'log', 'testHistory',
+                      'processHistory', 'files', 'images', 'attachments']
+
     @staticmethod
     def chipSummaryDict(chip):
 
@@ -1783,6 +3777,8 @@ class waferCollation(c.collation):
 
     def summaryDict(self):
 
+        self._loadFields(self._summaryFields)
+
         dic = {
             'wafer': self.waferSummaryDict(self.wafer),
             'chips': self.chipsSummaryDict(),
@@ -1977,9 +3973,9 @@ class waferCollation(c.collation):
 
 class waferCollation_Bilbao(waferCollation):
 
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
 
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if not ('BI' in self.wafer.name or 'CDM' in self.wafer.name):
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Bilbao" wafer.')
@@ -1988,9 +3984,9 @@ class waferCollation_Bilbao(waferCollation):
 
 class waferCollation_Budapest(waferCollation):
 
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
 
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if 'DR' not in self.wafer.name:
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Budapest" wafer.')
@@ -1998,18 +3994,18 @@ class waferCollation_Budapest(waferCollation):
 
 class waferCollation_Cambridge(waferCollation):
 
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
 
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if 'CM' not in self.wafer.name:
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Cambridge" wafer.')
 
 
 class waferCollation_Como(waferCollation):
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
 
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if 'CO' not in self.wafer.name:
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Como" wafer.')
@@ -2019,9 +4015,9 @@ class waferCollation_Como(waferCollation):
 
 class waferCollation_Cordoba(waferCollation):
     
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
 
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if 'CA' not in self.wafer.name:
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Cordoba" wafer.')
@@ -2031,9 +4027,9 @@ class waferCollation_Cordoba(waferCollation):
 
 class waferCollation_Coimbra(waferCollation):
 
-    def __init__(self, connection:mom.connection, waferName_orCmp_orID):
+    def __init__(self, connection:mom.connection, waferName_orCmp_orID, **kwargs):
         
-        super().__init__(connection, waferName_orCmp_orID)
+        super().__init__(connection, waferName_orCmp_orID, **kwargs)
 
         if 'CB' not in self.wafer.name:
             log.warning(f'The collected wafer ("{self.wafer.name}") may not be a "Coimbra" wafer.')
@@ -2045,6 +4041,24 @@ class waferCollation_Coimbra(waferCollation):
 # ------------------------------------------------------------------------------
 
 
+# Scopes of partially retrieved test histories (see
+# waferCollation._loadTestHistories()): (<result names>, <locations>), where
+# each element is a frozenset, or None for any value.
+
+def _scopeSet(values):
+    return None if values is None else frozenset(values)
+
+def _scopeCovers(scope:tuple, requested:tuple) -> bool:
+    """True if "scope" includes all the results of "requested"."""
+    return all(have is None or (need is not None and need <= have)
+               for have, need in zip(scope, requested))
+
+def _scopeUnion(scope:tuple, other:tuple) -> tuple:
+    return tuple(None if a is None or b is None else a | b
+                 for a, b in zip(scope, other))
+
+
+
 def averageSubchipScaleDataDict(dataDict_subchipScale,
                                 returnValuesOnly:bool = False):
     """Given a subchip-scale datadict, it returns a chip-scale dictionary
@@ -2078,86 +4092,315 @@ def averageSubchipScaleDataDict(dataDict_subchipScale,
     The output dictionary contains dataclass dictionaries ("value", "unit"),
     with the error being left out.
 
+    Values are collected in a dense (label x location) array and averaged
+    with vectorized reductions (see subchipScaleStatistics()). Components
+    whose dictionary mixes test results and other values are averaged one
+    by one, as they were before.
+
     If "returnValuesOnly" is set to True, only the values are returned.
     """
 
-    def averageValues(values:list):
+    labels, modes, stats = _subchipScaleArrayStatistics(dataDict_subchipScale)
 
-        values = [v for v in values if isinstance(v, int) or isinstance(v, float)]
-        
-        if values == []:
-            return None
-        
-        return average(values)
-    
-    def averageUnits(units:list):
+    means = stats['mean'].to_numpy()
+    counts = stats['count'].to_numpy()
+    units = stats['unit'].tolist()
 
-        log.debug(f'[averageUnits] units: {units}')
-        while None in units: units.remove(None)
-        
-        if len(units) == 0:
-            return None
-        
-        elif len(units) == 1:
-            unit = units[0]
-            if not isinstance(unit, str):
-                raise ValueError(f'Cannot average if dataclass units are not equal or None.')
-            return unit
-        
-        else:
-            for unit in units[1:]:
-                if unit != units[0]:
-                    raise ValueError(f'Cannot average if dataclass units are not equal or None.')
-            
-            if not isinstance(unit, str):
-                raise ValueError(f'Cannot average if dataclass units are not equal or None.')
+    dataDict = {}
+    for index, label in enumerate(labels):
 
-            return unit
-        
+        mode = modes[index]
+        mean = means[index] if counts[index] > 0 else None
 
-    def averageDataclasses(dataclasses:list):
-        
-        dcs = [dataClass.fromDictionary(dc) if not isinstance(dc, dataClass) else dc
-               for dc in dataclasses]  
+        if mode is None:
+            dataDict[label] = None
+        elif mode == 'values':
+            dataDict[label] = mean
+        elif mode == 'results':
+            dataDict[label] = dataClass(mean, unit = units[index]).dictionary()
+        else: # Irregular dictionary
+            dataDict[label] = _averageComponentDict(dataDict_subchipScale[label])
 
-        value = averageValues([dd.value for dd in dcs])
-        unit = averageUnits([dd.unit for dd in dcs])
+    return dataDict
 
-        return dataClass(value, unit = unit).dictionary()
 
-    def averageTestResults(results):
+def subchipScaleStatistics(dataDict_subchipScale) -> DataFrame:
+    """Given a subchip-scale datadict (see averageSubchipScaleDataDict()),
+    it returns chip-scale statistics as a DataFrame indexed by label, with
+    the columns listed in mongoreader.results.resultStore.statistics
+    ("mean", "median", "std", "min", "max", "count", "unit").
 
-        dataclasses = []
-        for result in results:
+    Non-float/int and None values are ignored.
 
-            if result is None:
-                continue
-            
-            data = result.get('resultData')
-            if data is None:
-                continue
+    Raises:
+        ValueError: If the units of a component are not consistent.
+    """
+
+    _, _, stats = _subchipScaleArrayStatistics(dataDict_subchipScale)
+    return stats
+
+
+def _subchipScaleArrayStatistics(dataDict_subchipScale) -> tuple:
+    """Collects the values of a subchip-scale datadict in a dense (label x
+    location) array and computes their statistics with
+    mongoreader.results.reduceSubchipArray().
+
+    The values of all the components are flattened in a single object array
+    and classified by type (see _valueKinds()), so that no Python code runs
+    for each value; only the distinct types of the values are inspected.
+
+    Returns:
+        tuple: (<labels>, <modes>, <statistics DataFrame>), where modes
+            contains, for each label, None (no data), "values" (numbers),
+            "results" (test result dictionaries) or "irregular".
+    """
+
+    labels = list(dataDict_subchipScale)
+    dicts = [dic or {} for dic in dataDict_subchipScale.values()]
+
+    lengths = array(list(map(len, dicts)), dtype = int)
+    rowOf = repeat(arange(len(labels)), lengths) # Row of each entry
+
+    locations = _objectArray(chain.from_iterable(dicts))
+    entries = _objectArray(chain.from_iterable(map(dict.values, dicts)))
+    kinds = _valueKinds(entries)
+
+    def anyPerRow(entryMask):
+        return bincount(rowOf, weights = entryMask, minlength = len(labels)) > 0
+
+    # Test results are regular if "resultData" is a dictionary or None
+    isDict = kinds == _DICT
+    resultData = full(len(entries), None, dtype = object)
+    resultData[isDict] = _objectArray(map(methodcaller('get', 'resultData'), entries[isDict]))
+    dataKinds = _valueKinds(resultData)
+
+    invalid = (kinds != _NONE) & ~(isDict & ((dataKinds == _NONE) | (dataKinds == _DICT)))
+
+    hasDicts = anyPerRow(isDict)
+    irregular = hasDicts & anyPerRow(invalid)
+
+    modes = full(len(labels), 'results', dtype = object)
+    modes[irregular] = 'irregular'
+    modes[~hasDicts] = 'values'
+    modes[lengths == 0] = None
+
+    # Values of "values" rows are the entries themselves, those of "results"
+    # rows are found in "resultData"
+    valuesEntry = (~hasDicts)[rowOf]
+    dataEntry = (hasDicts & ~irregular)[rowOf] & (dataKinds == _DICT)
+
+    data = resultData[dataEntry]
+    cellValues = where(valuesEntry, entries, None)
+    cellValues[dataEntry] = _objectArray(map(methodcaller('get', 'value'), data))
+    units = _objectArray(map(methodcaller('get', 'unit'), data))
+
+    valueEntry = (valuesEntry | dataEntry) & (_valueKinds(cellValues) == _NUMBER)
+
+    used = valueEntry | dataEntry
+    colOf = full(len(entries), -1)
+    colOf[used], columns = factorize(Series(locations[used], dtype = object))
+
+    shape = (len(labels), len(columns))
+
+    valueArray = full(shape, nan)
+    maskArray = zeros(shape, dtype = bool)
+    valueArray[rowOf[valueEntry], colOf[valueEntry]] = cellValues[valueEntry].astype(float)
+    maskArray[rowOf[valueEntry], colOf[valueEntry]] = True
+
+    unitArray = full(shape, None, dtype = object)
+    unitArray[rowOf[dataEntry], colOf[dataEntry]] = units
+
+    stats = rs.reduceSubchipArray(labels, valueArray, maskArray, unitArray)
+    return labels, modes.tolist(), stats
+
+
+# Kinds of values (see _valueKinds())
+_NONE, _NUMBER, _DICT, _OTHER = range(4)
+
+def _objectArray(items):
+    """Returns the items as a 1D object array (never nested, also if the
+    items are lists)."""
+    return Series(list(items), dtype = object).to_numpy()
+
+def _valueKinds(values):
+    """Returns an integer array classifying each element of the object array
+    "values" as _NONE, _NUMBER (int or float, as for _averageValues()),
+    _DICT or _OTHER. Only the distinct types of the values are checked."""
+
+    if len(values) == 0:
+        return zeros(0, dtype = int)
 
-            dataclasses.append(dataClass(value = data.get('value'), unit = data.get('unit')))
+    codes, types = factorize(Series(list(map(type, values)), dtype = object))
 
-        return averageDataclasses(dataclasses)
+    typeKinds = array([_NONE if typ is type(None)
+                       else _NUMBER if issubclass(typ, (int, float))
+                       else _DICT if issubclass(typ, dict)
+                       else _OTHER
+                       for typ in types], dtype = int)
+
+    return typeKinds[codes]
+
+
+# Element-wise averaging, used for irregular dictionaries
+
+def _averageValues(values:list):
+
+    values = [v for v in values if isinstance(v, int) or isinstance(v, float)]
     
+    if values == []:
+        return None
     
-    def averageComponentDict(dic):
+    return average(values)
 
-        if dic is None or dic == {}:
-            return None
+def _averageUnits(units:list):
 
-        if any([isinstance(val, dict) for val in dic.values()]):
-             # test result dictionaries
-            return averageTestResults(dic.values())
-        else: # I assume I am dealing with numbers
-            return averageValues(dic.values())
+    log.debug(f'[averageUnits] units: {units}')
+    while None in units: units.remove(None)
+    
+    if len(units) == 0:
+        return None
+    
+    elif len(units) == 1:
+        unit = units[0]
+        if not isinstance(unit, str):
+            raise ValueError(f'Cannot average if dataclass units are not equal or None.')
+        return unit
+    
+    else:
+        for unit in units[1:]:
+            if unit != units[0]:
+                raise ValueError(f'Cannot average if dataclass units are not equal or None.')
         
-    dataDict = {key: averageComponentDict(d)
-                for key, d in dataDict_subchipScale.items()}
+        if not isinstance(unit, str):
+            raise ValueError(f'Cannot average if dataclass units are not equal or None.')
+
+        return unit
+
+def _averageDataclasses(dataclasses:list):
     
+    dcs = [dataClass.fromDictionary(dc) if not isinstance(dc, dataClass) else dc
+           for dc in dataclasses]  
 
-    return dataDict
+    value = _averageValues([dd.value for dd in dcs])
+    unit = _averageUnits([dd.unit for dd in dcs])
+
+    return dataClass(value, unit = unit).dictionary()
+
+def _averageTestResults(results):
+
+    dataclasses = []
+    for result in results:
+
+        if result is None:
+            continue
+        
+        data = result.get('resultData')
+        if data is None:
+            continue
+
+        dataclasses.append(dataClass(value = data.get('value'), unit = data.get('unit')))
+
+    return _averageDataclasses(dataclasses)
+
+def _averageComponentDict(dic):
+
+    if dic is None or dic == {}:
+        return None
+
+    if any([isinstance(val, dict) for val in dic.values()]):
+         # test result dictionaries
+        return _averageTestResults(dic.values())
+    else: # I assume I am dealing with numbers
+        return _averageValues(dic.values())
+
+
+def loadWaferCollations(connection:mom.connection, waferNames:list,
+                        workers:int = 4,
+                        *,
+                        lazy:bool = False,
+                        cache:Path = None) -> tuple:
+    """Builds the wafer collations for all the wafers in "waferNames"
+    concurrently, using a pool of "workers" threads that share the same
+    connection.
+
+    Collations are bulk-loaded (see waferCollation.__init__()), and the
+    blueprints are shared between wafers through a blueprint cache, also
+    when they are loaded from snapshots, so that wafers of the same mask set
+    retrieve their blueprints only once. This includes the blueprints of the
+    wafer blueprint families, which bulk-loaded collations retrieve through
+    the same cache (see waferCollation._partitionComponents()).
+
+    The process-wide cache mongoreader.cache.blueprints is used (it is
+    enabled by default), or, if it has been disabled with
+    mongoreader.cache.disable(), a cache that lives only for this call. In
+    both cases, collations of the same mask set share the same blueprint
+    instances.
+
+    A failure in building a collation does not abort the others: the
+    exception is logged and collected in the returned errors dictionary.
+
+    Args:
+        connection (mongomanager.connection): The connection instance to the
+            MongoDB server.
+        waferNames (list[str | ID]): The names (or IDs) of the wafers.
+        workers (int, optional): The number of threads used to build the
+            collations. Defaults to 4.
+
+    Keyword Args:
+        lazy (bool, optional): Passed to waferCollation.__init__(). Defaults
+            to False.
+        cache (Path, optional): Passed to waferCollation.__init__(), see the
+            limitations described there. Defaults to None.
+
+    Raises:
+        TypeError: If arguments are not specified correctly.
+        ValueError: If "workers" is not positive.
+
+    Returns:
+        2-tuple: collations, errors, where
+            collations (list[waferCollation | None]) contains the collations
+                in the same order of "waferNames" (None for failed ones), and
+            errors (dict) is in the form {<wafer name>: <exception>}.
+    """
+
+    if not isinstance(connection, mom.connection):
+        raise TypeError('"connection" must be a mongomanager.connection object.')
+
+    if not isinstance(waferNames, list):
+        raise TypeError('"waferNames" must be a list.')
+
+    if not isinstance(workers, int):
+        raise TypeError('"workers" must be a positive integer.')
+    if workers < 1:
+        raise ValueError('"workers" must be a positive integer.')
+
+    blueprintCache = ch.blueprints if ch.enabled() else ch.blueprintCache()
+
+    def _load(waferName):
+        return waferCollation(connection, waferName,
+                              bulkLoad = True,
+                              lazy = lazy,
+                              cache = cache,
+                              blueprintCache = blueprintCache)
+
+    collations = []
+    errors = {}
+
+    with opened(connection):
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+
+            futures = [executor.submit(_load, name) for name in waferNames]
+
+            for name, future in zip(waferNames, futures):
+                try:
+                    collations.append(future.result())
+                except Exception as exc:
+                    log.error(f'Could not build the wafer collation for "{name}" ({exc}).')
+                    errors[name] = exc
+                    collations.append(None)
+
+    log.info(f'Built {len(waferNames) - len(errors)} wafer collations out of {len(waferNames)}.')
+    return collations, errors
 
 
 def queryWafers(connection:mom.connection, *, waferType:str = None, returnType:str = 'name'):
@@ -2262,6 +4505,53 @@ def _nameString(component, printIDs = False):
 
 
 
+def _loadCollationSnapshot(path:Path) -> dict:
+    """Loads a collation snapshot saved by _saveCollationSnapshot().
+
+    Snapshots are unpickled: unpickling a file can execute arbitrary code, so
+    the folder passed as "cache" to waferCollation must only contain files
+    written by mongoreader or by users you trust.
+
+    Returns None if the snapshot does not exist or cannot be read."""
+
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, 'rb') as file:
+            snapshot = pickle.load(file)
+    except Exception as e:
+        log.warning(f'Could not read the collation snapshot "{path}" ({e}).')
+        return None
+
+    if snapshot.get('version') != _SNAPSHOT_VERSION:
+        return None
+
+    return snapshot
+
+def _saveCollationSnapshot(path:Path, snapshot:dict):
+    """Saves a collation snapshot to "path".
+    
+    The file is first written to a temporary file and then moved, so that
+    an interrupted write does not leave a corrupted snapshot."""
+
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    tmpPath = path.with_suffix('.tmp')
+
+    try:
+        with open(tmpPath, 'wb') as file:
+            pickle.dump({'version': _SNAPSHOT_VERSION, **snapshot}, file,
+                        protocol = pickle.HIGHEST_PROTOCOL)
+        tmpPath.replace(path)
+    except Exception as e:
+        log.warning(f'Could not save the collation snapshot "{path}" ({e}).')
+
+# Increase when the snapshot content changes
+_SNAPSHOT_VERSION = 2
+
+
 def _joinListsOrNone(*args):
     """Returns a single dictionary from a arguments that can be lists or None."""
     returnList = []
@@ -0,0 +1,42 @@
+"""Utilities for the tests that run against a MongoDB server holding
+mongomanager documents. The tests only read from the database.
+
+Set the following environment variables to run them:
+
+    MONGOREADER_TEST_HOST: The address of the server.
+    MONGOREADER_TEST_USER: The user (the password is retrieved by
+        mongomanager.connection).
+    MONGOREADER_TEST_PORT: The port of the server (optional).
+    MONGOREADER_TEST_WAFER: The name of a wafer used to build collations.
+    MONGOREADER_TEST_MODULE_BATCH: The batch used to build module batches.
+"""
+
+import os
+import unittest
+
+import mongomanager as mom
+
+HOST = os.environ.get('MONGOREADER_TEST_HOST')
+USER = os.environ.get('MONGOREADER_TEST_USER')
+PORT = os.environ.get('MONGOREADER_TEST_PORT')
+WAFER = os.environ.get('MONGOREADER_TEST_WAFER')
+MODULE_BATCH = os.environ.get('MONGOREADER_TEST_MODULE_BATCH')
+
+
+def connection() -> mom.connection:
+    """Returns the connection to the test server."""
+
+    if PORT is None:
+        return mom.connection(HOST, USER)
+
+    return mom.connection(HOST, USER, port = int(PORT))
+
+
+def requires(*variables):
+    """Skips the decorated test if the server or any of the named
+    environment variables (e.g. "MONGOREADER_TEST_WAFER") are not set."""
+
+    missing = [var for var in ('MONGOREADER_TEST_HOST', 'MONGOREADER_TEST_USER') + variables
+               if os.environ.get(var) is None]
+
+    return unittest.skipIf(missing != [], f'Set {", ".join(missing)} to run tests against a MongoDB server.')
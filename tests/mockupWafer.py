@@ -0,0 +1,206 @@
+"""Mockup wafer documents and a mockup database shared by the waferCollation
+tests.
+
+The database counts its round trips, so that tests can check how many
+queries a collation method performs.
+"""
+
+from unittest.mock import MagicMock, patch
+from contextlib import nullcontext, ExitStack
+from bson import ObjectId
+
+import mongomanager as mom
+import mongoreader.wafers as morw
+import mongoreader.cache as ch
+
+# ------------------------------------------------------------------------------
+# MOCKUP DATA
+
+LABELS = {
+    'chips': ['C01', 'C02', 'C03', 'C04'],
+    'testChips': ['T01', 'T02'],
+    'bars': ['B01'],
+    'testCells': ['TC01', 'TC02', 'TC03'],
+}
+
+WAFER_NAME = 'WAFER01'
+
+# ------------------------------------------------------------------------------
+# MOCKUP DOCUMENTS
+
+def generateBlueprint(name):
+    bp = MagicMock()
+    bp.ID = ObjectId()
+    bp.name = name
+    return bp
+
+def generateComponent(label, blueprint):
+    cmp = MagicMock()
+    cmp.ID = ObjectId()
+    cmp.name = f'Component {label}'
+    cmp.blueprintID = blueprint.ID
+    cmp.getField.side_effect = \
+        lambda field, *args, **kwargs: label if field == '_waferLabel' else None
+    return cmp
+
+def generateWaferBlueprint(componentBlueprints:dict):
+    """Returns a wafer blueprint whose blueprint families contain the
+    blueprints of componentBlueprints ({<chipType>: <blueprint>})."""
+
+    wbp = MagicMock()
+    wbp.ID = ObjectId()
+    wbp.name = 'Wafer blueprint'
+
+    for attrName, chipType in [('ChipBlueprints', 'chips'),
+                               ('TestChipBlueprints', 'testChips'),
+                               ('BarBlueprints', 'bars'),
+                               ('TestCellBlueprints', 'testCells')]:
+        bp = componentBlueprints[chipType]
+        attributeClass = getattr(wbp, attrName)
+        attributeClass.retrieveLabels.return_value = LABELS[chipType]
+        attributeClass.retrieveIDs.return_value = [bp.ID]*len(LABELS[chipType])
+        attributeClass.retrieveGroupNames.return_value = [chipType]
+        attributeClass.retrieveGroupLabels.return_value = LABELS[chipType]
+        attributeClass.retrieveElements.return_value = \
+            {bp.ID: {'document': bp, 'labels': LABELS[chipType]}}
+
+    return wbp
+
+def generateWafer(waferBlueprint, components:dict):
+
+    children = components['chips'] + components['testChips'] + components['bars']
+    testCells = components['testCells']
+
+    wafer = MagicMock()
+    wafer.ID = ObjectId()
+    wafer.name = WAFER_NAME
+    wafer.blueprintID = waferBlueprint.ID
+    wafer.getField.side_effect = \
+        lambda field, *args, **kwargs: waferBlueprint.ID if field == 'blueprintID' else None
+    wafer.ChildrenComponents.retrieveIDs.return_value = [c.ID for c in children]
+    wafer.TestCells.retrieveIDs.return_value = [c.ID for c in testCells]
+
+    # Used when the collation is not bulk-loaded
+    wafer.ChildrenComponents.retrieveElements.return_value = children
+    wafer.TestCells.retrieveElements.return_value = testCells
+
+    return wafer
+
+# ------------------------------------------------------------------------------
+# MOCKUP DATABASE
+
+class mockupDatabase:
+    """Holds the mockup documents of a wafer and answers the queries
+    performed by waferCollation, counting them in "roundTrips"."""
+
+    def __init__(self):
+
+        ch.invalidate()
+
+        self.cmpBPs = {chipType: generateBlueprint(f'{chipType} blueprint')
+                       for chipType in LABELS}
+        self.waferBP = generateWaferBlueprint(self.cmpBPs)
+
+        # Retrieving the blueprints of a family is a query
+        for attributeClass in self.familyAttributeClasses:
+            attributeClass.retrieveElements.side_effect = self._countRoundTrip(
+                                    attributeClass.retrieveElements.return_value)
+
+        self.components = {chipType: [generateComponent(label, self.cmpBPs[chipType])
+                                      for label in labels]
+                           for chipType, labels in LABELS.items()}
+
+        self.wafer = generateWafer(self.waferBP, self.components)
+
+        # Modification markers of the documents (see mongoreader.bulk)
+        self.markers = {doc.ID: (1,) for doc in
+                        [self.wafer] + self.allComponents + self.allBlueprints}
+
+        self.roundTrips = 0
+        self.queriedIDs = [] # IDs of the components retrieved by queries
+
+    @property
+    def familyAttributeClasses(self) -> list:
+        return [self.waferBP.ChipBlueprints, self.waferBP.TestChipBlueprints,
+                self.waferBP.BarBlueprints, self.waferBP.TestCellBlueprints]
+
+    def _countRoundTrip(self, returnValue):
+        def query(*args, **kwargs):
+            self.roundTrips += 1
+            return returnValue
+        return query
+
+    @property
+    def allComponents(self) -> list:
+        return [c for cmps in self.components.values() for c in cmps]
+
+    @property
+    def allBlueprints(self) -> list:
+        return [self.waferBP] + list(self.cmpBPs.values())
+
+    # --- queries ---
+
+    def queryOneByName(self, *args, **kwargs):
+        self.roundTrips += 1
+        return self.wafer
+
+    def componentQuery(self, connection, query, *args, **kwargs):
+        self.roundTrips += 1
+        IDs = query['_id']['$in']
+        self.queriedIDs += IDs
+        return [c for c in self.allComponents if c.ID in IDs]
+
+    def retrieveMarkers(self, connection, IDs):
+        self.roundTrips += 1
+        return {ID: self.markers[ID] for ID in IDs if ID in self.markers}
+
+    def modify(self, document):
+        """Changes the modification marker of the document."""
+        self.markers[document.ID] = self.markers[document.ID] + (1,)
+
+    def delete(self, component):
+        """Deletes the component from the database. The wafer still
+        references it."""
+        for cmps in self.components.values():
+            if component in cmps:
+                cmps.remove(component)
+        del self.markers[component.ID]
+
+    def blueprintQuery(self, connection, query, *args, **kwargs):
+        self.roundTrips += 1
+        IDs = query['_id']['$in']
+        return [bp for bp in self.allBlueprints if bp.ID in IDs]
+
+    # --- patches ---
+
+    def patched(self, waferPlotter = None):
+        """Returns a context manager in which mongomanager queries are
+        answered by the mockup database."""
+
+        if waferPlotter is None:
+            waferPlotter = MagicMock()
+
+        stack = ExitStack()
+        for target, attribute, value in [
+                (morw, 'opened', lambda conn: nullcontext()),
+                (mom, 'opened', lambda conn: nullcontext()),
+                (morw.wplt, 'waferPlotter', waferPlotter),
+                (mom.wafer, 'queryOneByName', self.queryOneByName),
+                (mom.component, 'query', self.componentQuery),
+                (mom, 'query', self.blueprintQuery),
+                (morw.bulk, 'componentMarkers', self.retrieveMarkers),
+                (morw.bulk, 'blueprintMarkers', self.retrieveMarkers),
+            ]:
+            stack.enter_context(patch.object(target, attribute, value))
+
+        return stack
+
+    def collation(self, waferPlotter = None, **kwargs):
+        """Returns a bulk-loaded waferCollation of the mockup wafer. kwargs
+        are passed to waferCollation."""
+
+        connection = MagicMock(spec = mom.connection)
+        kwargs = {'bulkLoad': True, **kwargs}
+
+        with self.patched(waferPlotter):
+            return morw.waferCollation(connection, WAFER_NAME, **kwargs)
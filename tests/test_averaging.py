@@ -0,0 +1,128 @@
+import unittest
+from math import isclose
+from random import Random
+from time import perf_counter
+
+import mongoreader.wafers as morw
+
+# ------------------------------------------------------------------------------
+# SYNTHETIC SUB-CHIP-SCALE DATA
+#
+# 1,000 chips with 16 locations each, with missing and non-numeric values.
+
+LOCATIONS = [f'MZ{index}' for index in range(16)]
+
+
+def _value(rng):
+    draw = rng.random()
+    if draw < 0.05: return None
+    if draw < 0.08: return 'n.a.'
+    if draw < 0.10: return rng.randint(0, 10)
+    return rng.gauss(3., 1.)
+
+
+def _valuesDataDict(amount = 1000, seed = 0):
+    rng = Random(seed)
+    dataDict = {f'C{index:04d}': {loc: _value(rng) for loc in LOCATIONS}
+                for index in range(amount)}
+    dataDict['C9998'] = None
+    dataDict['C9999'] = {loc: None for loc in LOCATIONS}
+    return dataDict
+
+
+def _resultsDataDict(amount = 1000, seed = 1):
+    rng = Random(seed)
+
+    def result():
+        if rng.random() < 0.05: return None
+        if rng.random() < 0.05: return {'resultName': 'IL'}
+        unit = 'dB' if rng.random() < 0.9 else None
+        return {'resultName': 'IL', 'resultData': {'value': _value(rng), 'unit': unit}}
+
+    return {f'C{index:04d}': {loc: result() for loc in LOCATIONS}
+            for index in range(amount)}
+
+
+def _legacy(dataDict):
+    """The previous implementation: element-wise averaging of each chip."""
+    return {label: morw._averageComponentDict(dic) for label, dic in dataDict.items()}
+
+
+class TestAveraging(unittest.TestCase):
+
+    def assertSameAverages(self, dataDict):
+
+        reference = _legacy(dataDict)
+        averaged = morw.averageSubchipScaleDataDict(dataDict)
+
+        self.assertEqual(list(averaged), list(reference))
+
+        for label, expected in reference.items():
+            value = averaged[label]
+
+            if isinstance(expected, dict):
+                self.assertEqual(value.keys(), expected.keys())
+                self.assertEqual(value.get('unit'), expected.get('unit'))
+                value, expected = value.get('value'), expected.get('value')
+
+            if expected is None:
+                self.assertIsNone(value)
+            else:
+                self.assertTrue(isclose(value, expected, rel_tol = 1e-12))
+
+    def test_values(self):
+        self.assertSameAverages(_valuesDataDict())
+
+    def test_results(self):
+        self.assertSameAverages(_resultsDataDict())
+
+    def test_faster(self):
+
+        dataDict = _resultsDataDict()
+
+        def bestOf(function, repeat = 3):
+            elapsed = []
+            for _ in range(repeat):
+                start = perf_counter()
+                function(dataDict)
+                elapsed.append(perf_counter() - start)
+            return min(elapsed)
+
+        self.assertLess(bestOf(morw.averageSubchipScaleDataDict), bestOf(_legacy))
+
+    def test_mixedTypes(self):
+
+        dataDict = {
+            'C01': {'MZ1': True, 'MZ2': 3, 'MZ3': [1.0], 'MZ4': 'n.a.'},
+            'C02': {'MZ1': {'resultData': {'value': 1.0, 'unit': 'dB'}},
+                    'MZ2': {'resultData': {'value': 'n.a.', 'unit': None}},
+                    'MZ3': {'resultName': 'IL'}},
+            'C03': {'MZ1': {'resultData': None}, 'MZ2': None},
+            'C04': {},
+        }
+
+        self.assertSameAverages(dataDict)
+
+    def test_statistics(self):
+
+        stats = morw.subchipScaleStatistics({
+            'C01': {'MZ1': 1.0, 'MZ2': 2.0, 'MZ3': 6.0, 'MZ4': None},
+            'C02': {'MZ1': None},
+        })
+
+        self.assertEqual(list(stats.loc['C01', ['mean', 'median', 'min', 'max', 'count']]),
+                         [3.0, 2.0, 1.0, 6.0, 3])
+        self.assertTrue(isclose(stats.loc['C01', 'std'], (14/3)**0.5))
+        self.assertEqual(stats.loc['C02', 'count'], 0)
+
+    def test_inconsistentUnits(self):
+
+        dataDict = {'C01': {'MZ1': {'resultData': {'value': 1.0, 'unit': 'dB'}},
+                            'MZ2': {'resultData': {'value': 2.0, 'unit': 'mW'}}}}
+
+        with self.assertRaises(ValueError):
+            morw.averageSubchipScaleDataDict(dataDict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mongoreader.cache as ch
+
+from mockupWafer import LABELS, mockupDatabase
+
+
+class TestLRUcache(unittest.TestCase):
+
+    def test_eviction(self):
+
+        cache = ch._LRUcache(maxEntries = 2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_expiration(self):
+
+        cache = ch._LRUcache(maxEntries = 2, ttl = 10)
+
+        with patch.object(ch, 'monotonic', return_value = 0):
+            cache.put('a', 1)
+
+        with patch.object(ch, 'monotonic', return_value = 5):
+            self.assertEqual(cache.get('a'), 1)
+
+        with patch.object(ch, 'monotonic', return_value = 11):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_invalidate(self):
+
+        cache = ch._LRUcache(maxEntries = 4)
+        cache.put('wbp', 1)
+        cache.put(('wbp', 'chipBlueprints'), 2)
+        cache.put('other', 3)
+
+        cache.invalidate('wbp')
+        self.assertEqual(len(cache), 1)
+
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+
+        cache = ch._LRUcache(maxEntries = 2, enabled = False)
+        cache.put('a', 1)
+
+        self.assertNotIn('a', cache)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((len(cache), cache.misses), (0, 1))
+
+
+class TestLocationGroupResolver(unittest.TestCase):
+
+    def test_sharedLookups(self):
+
+        resolver = ch.locationGroupResolver()
+        bp = MagicMock()
+        bp.Locations.retrieveGroupElements.return_value = ['MZ1', 'MZ2']
+
+        # 100 chips sharing the same blueprint
+        for _ in range(100):
+            locations = resolver.retrieveLocations(bp, 'MZ')
+            locations.append('altered')
+
+        self.assertEqual(resolver.retrieveLocations(bp, 'MZ'), ['MZ1', 'MZ2'])
+        bp.Locations.retrieveGroupElements.assert_called_once_with('MZ', verbose = False)
+        self.assertIsNone(resolver.retrieveLocations(None, 'MZ'))
+
+        info = resolver.info()
+        self.assertEqual((info['hits'], info['misses'], info['entries']), (100, 1, 1))
+        self.assertGreaterEqual(info['savedTime'], 0)
+
+        resolver.invalidate(bp.ID)
+        self.assertEqual(len(resolver), 0)
+
+
+class TestCollationLocationGroups(unittest.TestCase):
+
+    def resolveAll(self, wc):
+        for label in LABELS['chips']:
+            self.assertEqual(wc._labels.locations(label, 'MZ'), ['MZ1', 'MZ2'])
+
+    def test_enabledByDefault(self):
+
+        db = mockupDatabase()
+        retrieve = db.cmpBPs['chips'].Locations.retrieveGroupElements
+        retrieve.return_value = ['MZ1', 'MZ2']
+
+        self.resolveAll(db.collation())
+        self.resolveAll(db.collation())
+
+        # Chips share their blueprint, and collations the process-wide resolver
+        retrieve.assert_called_once_with('MZ', verbose = False)
+
+    def test_disabled(self):
+
+        ch.disable()
+        self.addCleanup(ch.enable)
+
+        db = mockupDatabase()
+        retrieve = db.cmpBPs['chips'].Locations.retrieveGroupElements
+        retrieve.return_value = ['MZ1', 'MZ2']
+
+        first = db.collation()
+        self.resolveAll(first)
+        self.resolveAll(first)
+        self.resolveAll(db.collation())
+
+        # Each collation resolves the group once with its own resolver
+        self.assertEqual(retrieve.call_count, 2)
+        self.assertEqual(len(ch.locationGroups), 0)
+
+
+class TestSharedBlueprints(unittest.TestCase):
+
+    def test_enabledByDefault(self):
+
+        self.assertTrue(ch.enabled())
+
+        db = mockupDatabase()
+        db.blueprintQuery = MagicMock(side_effect = db.blueprintQuery)
+
+        db.collation()
+        db.roundTrips = 0
+        db.collation()
+
+        # Blueprints come from the process-wide cache the second time
+        db.blueprintQuery.assert_called_once()
+        self.assertLessEqual(db.roundTrips, 2)
+        self.assertIn(db.waferBP.ID, ch.blueprints)
+
+    def test_disabled(self):
+
+        ch.disable()
+        self.addCleanup(ch.enable)
+
+        db = mockupDatabase()
+
+        db.collation()
+        first, db.roundTrips = db.roundTrips, 0
+        db.collation()
+
+        # Nothing is shared between collations
+        self.assertEqual(db.roundTrips, first)
+        self.assertEqual(len(ch.blueprints), 0)
+
+if __name__ == '__main__':
+    unittest.main()
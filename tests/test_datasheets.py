@@ -0,0 +1,159 @@
+import os
+import unittest
+from unittest.mock import MagicMock
+import tracemalloc
+
+from bson import ObjectId
+from pandas import DataFrame
+
+import mongoreader.datasheets as ds
+import mongoreader.wafers as morw
+import liveDatabase as live
+
+MONGO_URI = os.environ.get('MONGOREADER_TEST_MONGO_URI')
+
+
+def _component(label, amount = 20):
+    cmp = MagicMock()
+    cmp.getField.side_effect = \
+        lambda field, *args, **kwargs: label if field == '_waferLabel' else None
+    cmp.Datasheet.retrieveData.return_value = [
+        {'resultName': f'R{index:02d}', 'location': f'MZ{index%4}',
+         'resultData': {'value': float(index), 'unit': 'dB'},
+         'resultTags': ['TE']}
+        for index in range(amount)]
+    return cmp
+
+
+def _reference(components):
+    """The previous implementation: merged per-row dictionaries."""
+    rows = []
+    for cmp in components:
+        label = cmp.getField('_waferLabel')
+        rows += [{**{'wafer': 'W01', 'chipType': 'chips', 'label': label}, **s}
+                 for s in cmp.Datasheet.retrieveData()]
+    return DataFrame(rows)
+
+
+class TestColumnarFrameBuilder(unittest.TestCase):
+
+    def test_missingKeys(self):
+
+        builder = ds._columnarFrameBuilder()
+        builder.append([{'a': 1}, {'a': 2, 'b': 'x'}], {'label': 'C01'})
+        builder.append([{'b': 'y', 'label': 'other'}], {'label': 'C02'})
+
+        frame = builder.frame()
+        self.assertEqual(list(frame.columns), ['label', 'a', 'b'])
+        self.assertEqual(list(frame['label'].astype(object)), ['C01', 'C01', 'other'])
+        self.assertEqual(list(frame['b']), [None, 'x', 'y'])
+        self.assertEqual(frame['label'].dtype.name, 'category')
+
+    def test_syntheticWafer(self):
+
+        components = [_component(f'C{index:05d}') for index in range(2000)]
+        datasheets = ds._DatasheetsBaseClass(None)
+
+        tracemalloc.start()
+        reference = _reference(components)
+        referencePeak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        builder = ds._columnarFrameBuilder()
+        datasheets._appendData(builder, components, includeWaferLabels = True,
+                               constants = {'wafer': 'W01', 'chipType': 'chips'})
+        frame = builder.frame()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertEqual(list(frame.columns), list(reference.columns))
+        self.assertTrue(frame.astype(object).equals(reference.astype(object)))
+
+        # No per-row dictionaries are built
+        self.assertLess(peak, referencePeak)
+
+
+@unittest.skipIf(MONGO_URI is None, 'Set MONGOREADER_TEST_MONGO_URI to run tests against a mongod.')
+class TestDatasheetProjection(unittest.TestCase):
+
+    def setUp(self):
+        from pymongo import MongoClient
+
+        self.client = MongoClient(MONGO_URI)
+        self.collection = self.client['mongoreader_tests']['components']
+        self.collection.drop()
+
+        self.documents = [{
+            '_id': ObjectId(),
+            'name': f'Chip {index}',
+            '_waferLabel': f'C{index:02d}',
+            'testHistory': [{'results': [{'resultName': 'IL'}]}]*50,
+            'datasheetData': [{'processStage': stage, 'data': [{'resultName': 'IL', 'index': index}]}
+                              for stage in ['Diced', 'Tested', 'Packaged']],
+        } for index in range(5)]
+        self.collection.insert_many(self.documents)
+
+    def tearDown(self):
+        self.collection.drop()
+        self.client.close()
+
+    def test_sameDatasheets(self):
+
+        # The documents have 3 datasheets
+        for index in [None, 0, 1, 2, 3, -1, -2, -3, -4, -5]:
+
+            projection = ds.datasheetProjection(index)
+            sliced = {doc['_id']: doc for doc in self.collection.find({}, projection)}
+
+            for full in self.documents:
+                doc = sliced[full['_id']]
+                try:
+                    expected = [full['datasheetData'][-1 if index is None else index]]
+                except IndexError:
+                    expected = []
+
+                self.assertEqual(doc['datasheetData'], expected)
+                self.assertEqual(doc['_waferLabel'], full['_waferLabel'])
+                self.assertNotIn('testHistory', doc)
+
+
+def _hasDatasheet(count, datasheetIndex):
+    """True if datasheetIndex is in range for "count" datasheets."""
+    if datasheetIndex is None:
+        datasheetIndex = -1
+    return -count <= datasheetIndex < count
+
+
+@live.requires('MONGOREADER_TEST_WAFER')
+class TestDatasheetOnly(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.wc = morw.waferCollation(live.connection(), live.WAFER)
+        cls.components = [cmp for cmp in cls.wc.chips if cmp is not None]
+
+    def test_sameAsFullDocuments(self):
+
+        counts = [len(cmp.getField('datasheetData', verbose = False) or [])
+                  for cmp in self.components]
+
+        # Includes negative indexes past the start of the datasheets
+        for index in [None, 0, 1, -1, -2, -max(counts + [0]) - 1]:
+            with self.subTest(datasheetIndex = index):
+
+                # Components without the datasheet give no data
+                expectedComponents = [cmp for cmp, count in zip(self.components, counts)
+                                      if _hasDatasheet(count, index)]
+
+                expected = self.wc.Datasheets.retrieveData(expectedComponents,
+                                        datasheetIndex = index, includeWaferLabels = True)
+                datasheetOnly = self.wc.Datasheets.retrieveData(self.components,
+                                        datasheetIndex = index, includeWaferLabels = True,
+                                        datasheetOnly = True)
+
+                self.assertEqual(datasheetOnly, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from contextlib import nullcontext
+from time import sleep
+
+import mongomanager as mom
+from mongomanager.errors import DocumentNotFound
+import mongoreader.wafers as morw
+import mongoreader.cache as ch
+
+from mockupWafer import WAFER_NAME, mockupDatabase
+
+WAFER_NAMES = ['WAFER01', 'WAFER02', 'WAFER03', 'WAFER04']
+
+
+class TestLoadWaferCollations(unittest.TestCase):
+
+    def setUp(self):
+        self.errors = {'WAFER03': DocumentNotFound('Could not retrieve the wafer blueprint.')}
+
+    def _waferCollation(self, connection, waferName, **kwargs):
+
+        # Later wafers are built first
+        sleep(0.01*(len(WAFER_NAMES) - WAFER_NAMES.index(waferName)))
+
+        if waferName in self.errors:
+            raise self.errors[waferName]
+
+        wc = MagicMock()
+        wc.waferName = waferName
+        wc.kwargs = kwargs
+        return wc
+
+    def _load(self, **kwargs):
+
+        connection = MagicMock(spec = mom.connection)
+
+        with patch.object(morw, 'opened', lambda conn: nullcontext()), \
+             patch.object(morw, 'waferCollation', self._waferCollation):
+
+            return morw.loadWaferCollations(connection, WAFER_NAMES, **kwargs)
+
+    def test_inputOrder(self):
+
+        self.errors = {}
+        collations, errors = self._load(workers = 4)
+
+        self.assertEqual([wc.waferName for wc in collations], WAFER_NAMES)
+        self.assertEqual(errors, {})
+
+        # The collations share a blueprint cache
+        blueprintCache = collations[0].kwargs['blueprintCache']
+        self.assertIsInstance(blueprintCache, ch.blueprintCache)
+
+        for wc in collations:
+            self.assertEqual(wc.kwargs, {'bulkLoad': True, 'lazy': False, 'cache': None,
+                                         'blueprintCache': blueprintCache})
+
+    def test_errors(self):
+
+        collations, errors = self._load(workers = 2, lazy = True)
+
+        self.assertEqual(errors, self.errors)
+        self.assertIsNone(collations[2])
+        self.assertEqual([wc.waferName for wc in collations if wc is not None],
+                         ['WAFER01', 'WAFER02', 'WAFER04'])
+
+    def test_arguments(self):
+
+        with self.assertRaises(TypeError):
+            morw.loadWaferCollations(MagicMock(spec = mom.connection), 'WAFER01')
+
+        with self.assertRaises(ValueError):
+            morw.loadWaferCollations(MagicMock(spec = mom.connection), WAFER_NAMES, workers = 0)
+
+
+class TestSharedBlueprints(unittest.TestCase):
+
+    def test_familiesQueriedOnce(self):
+
+        db = mockupDatabase()
+        db.blueprintQuery = MagicMock(side_effect = db.blueprintQuery)
+
+        # Three collations of the same mask set
+        with db.patched():
+            collations, errors = morw.loadWaferCollations(MagicMock(spec = mom.connection),
+                                                          [WAFER_NAME]*3, workers = 3)
+
+        self.assertEqual(errors, {})
+
+        # The wafer blueprint and the family blueprints are queried once
+        db.blueprintQuery.assert_called_once()
+        for attributeClass in db.familyAttributeClasses:
+            attributeClass.retrieveElements.assert_not_called()
+
+        for wc in collations:
+            self.assertIs(wc.chipBlueprints[0], db.cmpBPs['chips'])
+            self.assertIs(wc.testCellBPdict['TC01'], db.cmpBPs['testCells'])
+
+
+if __name__ == '__main__':
+    unittest.main()
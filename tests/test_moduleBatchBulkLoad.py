@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from contextlib import nullcontext
+from bson import ObjectId
+
+import mongomanager as mom
+import mongoreader.modules as morm
+import liveDatabase as live
+
+# ------------------------------------------------------------------------------
+# MOCKUP DOCUMENTS
+#
+# A batch of 500 modules, each with a COS that contains a chip.
+
+def _mockComponent(name, innerComponents = None):
+    cmp = MagicMock()
+    cmp.ID = ObjectId()
+    cmp.name = name
+    cmp.InnerComponents.retrieveIDs.return_value = \
+        None if innerComponents is None else [c.ID for c in innerComponents]
+    return cmp
+
+
+class TestModuleBatchBulkLoad(unittest.TestCase):
+
+    def setUp(self):
+
+        self.chips = [_mockComponent(f'Chip {index}') for index in range(500)]
+        self.COSs = [_mockComponent(f'COS {index}', [chip]) for index, chip in enumerate(self.chips)]
+        self.modules = [_mockComponent(f'Module {index}', [COS]) for index, COS in enumerate(self.COSs)]
+
+        # The last module has no COS
+        self.modules[-1].InnerComponents.retrieveIDs.return_value = []
+
+        self.roundTrips = 0
+
+    def _componentQuery(self, connection, query, *args, **kwargs):
+        self.roundTrips += 1
+
+        if 'batch' in query:
+            return self.modules
+
+        IDs = query['_id']['$in']
+        return [c for c in self.COSs + self.chips if c.ID in IDs]
+
+    def _batch(self):
+
+        connection = MagicMock(spec = mom.connection)
+
+        with patch.object(mom, 'opened', lambda conn: nullcontext()), \
+             patch.object(mom.component, 'query', self._componentQuery), \
+             patch.object(morm.moduleBatch, '_collectBlueprints',
+                          return_value = (None, None, None)):
+
+            return morm.moduleBatch(connection, 'BATCH01', verbose = False)
+
+    def test_roundTrips(self):
+
+        self._batch()
+        self.assertEqual(self.roundTrips, 3)
+
+        for mod in self.modules:
+            mod.InnerComponents.retrieveElements.assert_not_called()
+
+    def test_collations(self):
+
+        batch = self._batch()
+
+        self.assertEqual(len(batch._moduleCollations), 500)
+
+        for index, mc in enumerate(batch._moduleCollations[:-1]):
+            self.assertIs(mc.module, self.modules[index])
+            self.assertIs(mc.COS, self.COSs[index])
+            self.assertIs(mc.chip, self.chips[index])
+
+        last = batch._moduleCollations[-1]
+        self.assertIsNone(last.COS)
+        self.assertIsNone(last.chip)
+
+    def test_missingFirstCOS(self):
+
+        # The first inner component of the first module is not in the database
+        self.modules[0].InnerComponents.retrieveIDs.return_value = [ObjectId(), self.COSs[0].ID]
+
+        batch = self._batch()
+        self.assertEqual(self.roundTrips, 3)
+
+        first = batch._moduleCollations[0]
+        self.assertIs(first.COS, self.COSs[0])
+        self.assertIs(first.chip, self.chips[0])
+
+
+def _ID(cmp):
+    return None if cmp is None else cmp.ID
+
+
+@live.requires('MONGOREADER_TEST_MODULE_BATCH')
+class TestModuleBatchLive(unittest.TestCase):
+
+    def test_sameAsModuleCollation(self):
+
+        connection = live.connection()
+        batch = morm.moduleBatch(connection, live.MODULE_BATCH, verbose = False)
+
+        for mc in batch._moduleCollations:
+            with self.subTest(module = mc.module.name):
+
+                with mom.logMode(mom.log, 'WARNING'):
+                    legacy = morm.moduleCollation(connection, mc.module,
+                                                  collectBlueprints = False,
+                                                  verbose = False)
+
+                self.assertEqual(_ID(mc.COS), _ID(legacy.COS))
+                self.assertEqual(_ID(mc.chip), _ID(legacy.chip))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timezone
+from bson import ObjectId
+
+import mongomanager as mom
+import mongoreader.parallel as par
+import mongoreader.results as rs
+
+# ------------------------------------------------------------------------------
+# SYNTHETIC WAFER
+#
+# 2,000 chips, each with 10 test entries of 50 results.
+
+class _component:
+    """Lightweight stand-in for mongomanager.component."""
+
+    def __init__(self, testHistory):
+        self.ID = ObjectId()
+        self.name = f'Component {self.ID}'
+        self.testHistory = testHistory
+
+    def getField(self, field, *args, **kwargs):
+        return getattr(self, field, None)
+
+
+def _syntheticWafer(amount = 2000, entries = 10, results = 50):
+
+    components = {}
+
+    for index in range(amount):
+
+        history = []
+        for day in range(entries):
+            history.append({
+                'executionDate': datetime(2024, 1, day+1, tzinfo = timezone.utc),
+                'processStage': 'Tested', 'status': 'Testing',
+                'testReportID': None,
+                'results': [{'resultName': f'R{res:02d}', 'location': f'MZ{res%4}',
+                             'resultTags': ['TE'],
+                             'resultData': {'value': float(index + res), 'error': None, 'unit': 'dB'}}
+                            for res in range(results)]
+            })
+
+        components[f'C{index:05d}'] = _component(history)
+
+    return components
+
+
+def _square(items):
+    return [item**2 for item in items]
+
+
+class TestChunks(unittest.TestCase):
+
+    def test_splitChunks(self):
+        self.assertEqual(par.splitChunks(list(range(7)), 3), [[0, 1, 2], [3, 4], [5, 6]])
+        self.assertEqual(par.splitChunks([1, 2], 4), [[1], [2]])
+        self.assertEqual(par.splitChunks([], 2), [])
+
+    def test_mapChunks(self):
+        items = list(range(101))
+        self.assertEqual(par.mapChunks(_square, items, 3), _square(items))
+        self.assertEqual(par.mapChunks(_square, items, None), _square(items))
+
+        with self.assertRaises(ValueError):
+            par.mapChunks(_square, items, 0)
+        with self.assertRaises(TypeError):
+            par.mapChunks(_square, items, 2.0)
+
+    def test_poolReused(self):
+
+        self.addCleanup(par.shutdown)
+        items = list(range(10))
+
+        par.mapChunks(_square, items, 2)
+        pool = par._executor
+
+        self.assertEqual(par.mapChunks(_square, items, 2), _square(items))
+        self.assertIs(par._executor, pool)
+
+        # Smaller pools are not needed, larger ones replace it
+        par.mapChunks(_square, items, 1)
+        self.assertIs(par._executor, pool)
+        par.mapChunks(_square, items, 3)
+        self.assertIsNot(par._executor, pool)
+
+        par.shutdown()
+        self.assertIsNone(par._executor)
+
+
+class TestShippedComponents(unittest.TestCase):
+
+    def setUp(self):
+        self.components = list(_syntheticWafer(amount = 2, entries = 1, results = 2).values())
+
+    def test_serial(self):
+        self.assertIs(par.shipComponents(self.components, ['testHistory'], None), self.components)
+        self.assertIs(par.shipComponents(self.components[:1], ['testHistory'], 4), self.components[:1])
+
+    def test_shipped(self):
+
+        shipped = par.shipComponents(self.components, ['testHistory'], 2)
+        original = self.components[0]
+
+        self.assertEqual((shipped[0].ID, shipped[0].name), (original.ID, original.name))
+        self.assertEqual(shipped[0].fields, {'testHistory': original.testHistory})
+
+        rebuilt = par.receiveComponent(shipped[0])
+        self.assertIsInstance(rebuilt, mom.component)
+        self.assertEqual(rebuilt.getField('testHistory', verbose = False), original.testHistory)
+
+        self.assertIs(par.receiveComponent(original), original)
+
+
+class TestParallelResultStore(unittest.TestCase):
+
+    def test_syntheticWafer(self):
+
+        self.addCleanup(par.shutdown)
+        components = _syntheticWafer()
+
+        serial = rs.resultStore(components)
+        parallel = rs.resultStore(components, parallel = 4)
+
+        self.assertTrue(serial.frame.equals(parallel.frame))
+
+if __name__ == '__main__':
+    unittest.main()
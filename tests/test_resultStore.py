@@ -0,0 +1,187 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from bson import ObjectId
+
+import mongoreader.results as rs
+
+
+class _component:
+    """Lightweight stand-in for mongomanager.component."""
+
+    def __init__(self, testHistory):
+        self.ID = ObjectId()
+        self.testHistory = testHistory
+
+    def getField(self, field, *args, **kwargs):
+        return getattr(self, field, None)
+
+
+def _result(name, location, value, tags = None, datasheetReady = False):
+    return {'resultName': name, 'location': location, 'resultTags': tags,
+            'resultData': {'value': value, 'error': None, 'unit': 'dB'},
+            'datasheetReady': datasheetReady}
+
+
+def _entry(day, stage, results):
+    return {'executionDate': datetime(2024, 1, day, tzinfo = timezone.utc),
+            'processStage': stage, 'status': 'Testing',
+            'testReportID': ObjectId(), 'results': results}
+
+
+COMPONENTS = {
+    'C01': _component([
+        _entry(1, 'Diced', [_result('IL', 'MZ1', 1.0, ['TE']),
+                            _result('IL', 'MZ2', 2.0, ['TM'])]),
+        _entry(5, 'Tested', [_result('IL', 'MZ1', 1.5, ['TE'], True),
+                             _result('ER', 'MZ1', 20.0)]),
+    ]),
+    'C02': _component([
+        _entry(2, 'Diced', [_result('IL', 'MZ1', 3.0, ['TE'])]),
+    ]),
+    'C03': _component(None),
+}
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = rs.resultStore(COMPONENTS)
+
+    def values(self, **kwargs):
+        return list(self.store.select(**kwargs)['value'])
+
+    def test_flattening(self):
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(self.store.frame['label'].dtype.name, 'category')
+
+    def test_filters(self):
+
+        self.assertEqual(self.values(labels = ['C02']), [3.0])
+        self.assertEqual(self.values(resultNames = ['ER']), [20.0])
+        self.assertEqual(self.values(requiredTags = ['TE']), [1.0, 1.5, 3.0])
+        self.assertEqual(self.values(resultNames = ['IL'], tagsToExclude = ['TE']), [2.0])
+        self.assertEqual(self.values(searchDatasheetData = True), [1.5])
+        self.assertEqual(self.values(requiredProcessStages = ['Tested']), [1.5, 20.0])
+        self.assertEqual(self.values(resultNames = ['IL'],
+                            earliestExecutionDate = datetime(2024, 1, 2, tzinfo = timezone.utc)),
+                         [1.5, 3.0])
+
+    def test_locations(self):
+
+        values = self.values(resultNames = ['IL'],
+                             locationsDict = {'C01': ['MZ2'], 'C02': None})
+        self.assertEqual(values, [2.0, 3.0])
+
+    def test_matrix(self):
+
+        mask = self.store.mask(resultNames = ['IL', 'ER'])
+
+        table = self.store.matrix(mask, ['C01', 'C02', 'C03'], ['IL', 'ER'])
+        self.assertEqual(table.loc['C01', ('IL', 'MZ1')], 1.5) # Last result
+        self.assertEqual(table.loc['C02', ('IL', 'MZ1')], 3.0)
+        self.assertEqual(table.loc['C01', ('ER', 'MZ1')], 20.0)
+        self.assertEqual(list(table.index), ['C01', 'C02', 'C03'])
+
+        averaged = self.store.matrix(mask, ['C01', 'C02'], ['IL', 'ER'], averaged = True)
+        self.assertEqual(list(averaged.columns), ['IL', 'ER'])
+        self.assertEqual(averaged.loc['C01', 'IL'], 1.75)
+
+    def test_chipScaleStatistics(self):
+
+        mask = self.store.mask(resultNames = ['IL'])
+        stats = self.store.chipScaleStatistics(mask, ['C01', 'C02', 'C03'], ['IL'])
+
+        self.assertEqual(stats.loc['C01', ('IL', 'mean')], 1.75)
+        self.assertEqual(stats.loc['C01', ('IL', 'std')], 0.25)
+        self.assertEqual(stats.loc['C01', ('IL', 'count')], 2)
+        self.assertEqual(stats.loc['C02', ('IL', 'max')], 3.0)
+        self.assertEqual(stats.loc['C01', ('IL', 'unit')], 'dB')
+        self.assertEqual(list(stats.index), ['C01', 'C02', 'C03'])
+
+    def test_inconsistentUnits(self):
+
+        cmp = _component([_entry(1, 'Diced', [_result('IL', 'MZ1', 1.0),
+                                              _result('IL', 'MZ2', 2.0)])])
+        cmp.testHistory[0]['results'][1]['resultData']['unit'] = 'dBm'
+
+        store = rs.resultStore({'C01': cmp})
+
+        with self.assertRaises(ValueError):
+            store.chipScaleStatistics(store.mask())
+
+    def test_nonStringUnits(self):
+
+        cmp = _component([_entry(1, 'Diced', [_result('IL', 'MZ1', 1.0),
+                                              _result('IL', 'MZ2', 2.0)])])
+        for result in cmp.testHistory[0]['results']:
+            result['resultData']['unit'] = 1
+
+        store = rs.resultStore({'C01': cmp})
+
+        with self.assertRaises(ValueError):
+            store.chipScaleStatistics(store.mask())
+
+    def test_catalog(self):
+
+        catalog = self.store.catalog({'C01': 'chips', 'C02': 'testChips'})
+
+        self.assertEqual(list(catalog.index), ['IL', 'ER'])
+        self.assertEqual(catalog.loc['IL', 'count'], 4)
+        self.assertEqual(catalog.loc['IL', 'components'], 2)
+        self.assertEqual(catalog.loc['IL', 'chipTypes'], ['chips', 'testChips'])
+        self.assertEqual(catalog.loc['IL', 'locations'], ['MZ1', 'MZ2'])
+        self.assertEqual(catalog.loc['IL', 'tags'], ['TE', 'TM'])
+        self.assertEqual(catalog.loc['ER', 'processStages'], ['Tested'])
+        self.assertEqual(catalog.loc['IL', 'lastExecutionDate'].day, 5)
+
+    def test_dataDictionaryRecords(self):
+
+        records = self.store.dataDictionaryRecords(['C02'])
+        self.assertEqual(records, [{'label': 'C02', 'value': 3.0, 'location': 'MZ1'}])
+
+
+
+class TestResultPipeline(unittest.TestCase):
+
+    def test_filters(self):
+
+        IDs = [cmp.ID for cmp in COMPONENTS.values()]
+        date = datetime(2024, 1, 1, tzinfo = timezone.utc)
+
+        pipeline = rs.compileResultPipeline(IDs, ['IL'],
+                            requiredStati = ['Testing'],
+                            requiredTags = ['TE'],
+                            tagsToExclude = ['TM'],
+                            earliestExecutionDate = date,
+                            latestExecutionDate = date)
+
+        entryMatch, resultMatch = pipeline[3]['$match'], pipeline[5]['$match']
+
+        # Bounds are inclusive, stati are those of the test entries
+        self.assertEqual(entryMatch['testHistory.executionDate'], {'$gte': date, '$lte': date})
+        self.assertEqual(entryMatch['testHistory.status'], {'$in': ['Testing']})
+        self.assertEqual(resultMatch['testHistory.results.resultTags'], {'$all': ['TE'], '$nin': ['TM']})
+        self.assertEqual(resultMatch['testHistory.results.resultName'], {'$in': ['IL']})
+
+    def test_rowOrder(self):
+
+        C01, C02 = COMPONENTS['C01'].ID, COMPONENTS['C02'].ID
+
+        collection = MagicMock()
+        collection.aggregate.return_value = [
+            {'_id': C02, 'resultName': 'IL', 'location': 'MZ1', 'value': 3.0},
+            {'_id': C01, 'resultName': 'IL', 'location': 'MZ1', 'value': 1.0},
+            {'_id': C01, 'resultName': 'ER', 'location': 'MZ1', 'value': 20.0},
+        ]
+
+        store = rs.aggregateResultStore(collection, COMPONENTS)
+
+        self.assertEqual(store.dataDictionaryRecords(), [
+            {'label': 'C01', 'value': 1.0, 'location': 'MZ1'},
+            {'label': 'C01', 'value': 20.0, 'location': 'MZ1'},
+            {'label': 'C02', 'value': 3.0, 'location': 'MZ1'},
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+
+import mongoreader.wafers as morw
+
+import liveDatabase as live
+from mockupWafer import LABELS, mockupDatabase, generateBlueprint
+
+# Attributes that must be the same whether the collation is bulk-loaded or not
+COLLATION_ATTRIBUTES = [
+    'chips', 'chipsDict', 'chipBlueprints', 'chipBPdict',
+    'testChips', 'testChipsDict', 'testChipBlueprints', 'testChipBPdict',
+    'bars', 'barsDict', 'barBlueprints', 'barBPdict',
+    'testCells', 'testCellsDict', 'testCellBlueprints', 'testCellBPdict',
+]
+
+
+def collationIDs(wc:morw.waferCollation) -> dict:
+    """Returns the IDs of the documents of the collation attributes, in the
+    form {<attribute>: <list or dict of IDs>}."""
+
+    IDs = {}
+    for attribute in COLLATION_ATTRIBUTES:
+        value = getattr(wc, attribute)
+
+        if isinstance(value, dict):
+            IDs[attribute] = {key: doc.ID for key, doc in value.items()}
+        elif isinstance(value, list):
+            IDs[attribute] = [doc.ID for doc in value]
+        else:
+            IDs[attribute] = value
+
+    return IDs
+
+
+class TestBulkLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+
+    def test_roundTrips(self):
+
+        self.db.collation()
+
+        # Wafer, components and blueprints
+        self.assertLessEqual(self.db.roundTrips, 3)
+        self.db.wafer.ChildrenComponents.retrieveElements.assert_not_called()
+        self.db.wafer.TestCells.retrieveElements.assert_not_called()
+        self.db.wafer.retrieveBlueprint.assert_not_called()
+
+        # Blueprint families are resolved from the wafer blueprint document
+        for attributeClass in self.db.familyAttributeClasses:
+            attributeClass.retrieveElements.assert_not_called()
+
+    def test_unusedFamilyBlueprint(self):
+
+        # A blueprint of the wafer blueprint that no component uses
+        unused = generateBlueprint('Unused chip blueprint')
+        self.db.waferBP.ChipBlueprints.retrieveLabels.return_value = LABELS['chips'] + ['C99']
+        self.db.waferBP.ChipBlueprints.retrieveIDs.return_value = \
+            [self.db.cmpBPs['chips'].ID]*len(LABELS['chips']) + [unused.ID]
+        self.db.cmpBPs['unused'] = unused
+
+        wc = self.db.collation()
+
+        # Retrieved with one more query
+        self.assertEqual(self.db.roundTrips, 4)
+        self.assertIs(wc.chipBPdict['C99'], unused)
+        self.assertEqual(wc.chipBlueprints, [self.db.cmpBPs['chips'], unused])
+
+    def test_collectedDocuments(self):
+
+        wc = self.db.collation()
+
+        self.assertIs(wc.waferBlueprint, self.db.waferBP)
+
+        self.assertEqual(list(wc.chipsDict.keys()), LABELS['chips'])
+        self.assertEqual(list(wc.testChipsDict.keys()), LABELS['testChips'])
+        self.assertEqual(list(wc.barsDict.keys()), LABELS['bars'])
+        self.assertEqual(list(wc.testCellsDict.keys()), LABELS['testCells'])
+
+        self.assertEqual(wc.chipBlueprints, [self.db.cmpBPs['chips']])
+        self.assertIs(wc.chipBPdict['C01'], self.db.cmpBPs['chips'])
+        self.assertIs(wc.testCellBPdict['TC03'], self.db.cmpBPs['testCells'])
+
+        self.assertEqual(len(wc.allChips), 6)
+        self.assertEqual(len(wc._allComponentsDict), 10)
+
+    def test_sameAsDefaultLoad(self):
+
+        bulkLoaded = collationIDs(self.db.collation())
+        default = collationIDs(self.db.collation(bulkLoad = False))
+
+        self.assertEqual(bulkLoaded, default)
+
+    def test_labelsNotInBlueprint(self):
+
+        unlabelled, unknown = self.db.components['chips'][:2]
+        unlabelled.getField.side_effect = lambda field, *args, **kwargs: None
+        unknown.getField.side_effect = \
+            lambda field, *args, **kwargs: 'C99' if field == '_waferLabel' else None
+        
+        wc = self.db.collation()
+
+        # Classified by blueprint ID: both are kept, as in the default case
+        self.assertIn(unlabelled, wc.chips)
+        self.assertNotIn(unlabelled, wc.chipsDict.values())
+        self.assertIs(wc.chipsDict['C99'], unknown)
+
+        # Blueprint labels come from the wafer blueprint
+        self.assertEqual(list(wc.chipBPdict), LABELS['chips'])
+
+    def test_selectLabels(self):
+
+        wc = self.db.collation()
+        self.db.waferBP.ChipBlueprints.retrieveLabels.reset_mock()
+
+        self.assertEqual(wc._selectLabels(['chips']), LABELS['chips'])
+        self.assertEqual(wc._selectLabels(['chips'], {'chips': ['chips']}),
+                         LABELS['chips'])
+        self.assertEqual(wc._selectLabels(['bars', 'testCells']),
+                         LABELS['bars'] + LABELS['testCells'])
+
+        # The blueprint is traversed only once
+        wc._selectLabels(['chips'])
+        self.db.waferBP.ChipBlueprints.retrieveLabels.assert_called_once()
+
+
+@live.requires('MONGOREADER_TEST_WAFER')
+class TestBulkLoadLive(unittest.TestCase):
+
+    def test_sameAsDefaultLoad(self):
+
+        connection = live.connection()
+
+        bulkLoaded = morw.waferCollation(connection, live.WAFER, bulkLoad = True)
+        default = morw.waferCollation(connection, live.WAFER)
+
+        self.assertEqual(collationIDs(bulkLoaded), collationIDs(default))
+
+
+if __name__ == '__main__':
+    unittest.main()
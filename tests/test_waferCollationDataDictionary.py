@@ -0,0 +1,106 @@
+import unittest
+
+import mongomanager as mom
+from mongomanager.goggleFunctions import componentGoggleFunctions as cmpGoggles
+import mongoreader.wafers as morw
+
+import liveDatabase as live
+
+CHIP_TYPES = ['chips', 'testChips', 'bars', 'testCells']
+
+FILTERS = ['resultNames', 'searchDatasheetData', 'requiredStati',
+           'requiredProcessStages', 'requiredTags', 'tagsToExclude',
+           'earliestExecutionDate', 'latestExecutionDate', 'requiredTestReportID']
+
+
+def legacyDataDictionary(wc, **filters) -> list:
+    """The "dataDictionary" records as built before the result store, by
+    scooping the test history of each component."""
+
+    filters = {name: filters.get(name, False if name == 'searchDatasheetData' else None)
+               for name in FILTERS}
+    records = []
+
+    for label in wc._selectLabels(CHIP_TYPES, None):
+
+        scooped = cmpGoggles.scoopComponentResults(wc._allComponentsDict[label],
+                                                   filters['resultNames'],
+                                                   None,
+                                                   *[filters[name] for name in FILTERS[1:]],
+                                                   returnType = 'DataFrameDictionary')
+
+        records += [{'label': label, 'value': s.get('resultValue'), 'location': s.get('location')}
+                    for s in scooped or []]
+
+    return records
+
+
+def filterCases(wc) -> list:
+    """Filters built from the results of the collation, so that each of them
+    selects some of the results."""
+
+    frame = wc._results.frame
+    first = frame.iloc[0]
+    date = first['executionDate'].to_pydatetime()
+    tags = next((sorted(t) for t in frame['tags'] if t), [])
+    reportID = frame['testReportID'].dropna().iloc[0]
+
+    return [
+        {},
+        {'resultNames': [first['resultName']]},
+        # Bounds are inclusive
+        {'earliestExecutionDate': date},
+        {'latestExecutionDate': date},
+        {'earliestExecutionDate': date, 'latestExecutionDate': date},
+        # Status of the component when the test was performed
+        {'requiredStati': [first['status']]},
+        {'requiredProcessStages': [first['processStage']]},
+        {'requiredTags': tags[:1]},
+        {'tagsToExclude': tags[:1]},
+        {'searchDatasheetData': True},
+        {'requiredTestReportID': mom.toObjectID(reportID)},
+    ]
+
+
+def byLabel(records:list) -> list:
+    """Sorts records by label, keeping the order of the results of each
+    label."""
+    return sorted(records, key = lambda rec: rec['label'])
+
+
+@live.requires('MONGOREADER_TEST_WAFER')
+class TestDataDictionaryLive(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.wc = morw.waferCollation(live.connection(), live.WAFER,
+                                     queryCacheSize = 0)
+
+    def test_sameAsScoop(self):
+
+        for filters in filterCases(self.wc):
+            with self.subTest(**filters):
+
+                records = self.wc._scoopTestResults(CHIP_TYPES, None,
+                                                    returnType = 'dataDictionary',
+                                                    **filters)
+
+                self.assertEqual(byLabel(records),
+                                 byLabel(legacyDataDictionary(self.wc, **filters)))
+
+    def test_serverSideSameAsScoop(self):
+
+        for filters in filterCases(self.wc):
+            with self.subTest(**filters):
+
+                records = self.wc._scoopTestResults(CHIP_TYPES, None,
+                                                    returnType = 'dataDictionary',
+                                                    serverSide = True,
+                                                    **filters)
+
+                self.assertEqual(byLabel(records),
+                                 byLabel(legacyDataDictionary(self.wc, **filters)))
+
+
+if __name__ == '__main__':
+    unittest.main()
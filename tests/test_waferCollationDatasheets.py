@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pymongo import UpdateOne
+
+import mongoreader.wafers as morw
+
+from mockupWafer import LABELS, mockupDatabase
+
+# ------------------------------------------------------------------------------
+# MOCKUP DATA
+
+DATASHEET_DATA = [
+    {'resultName': 'IL', 'location': 'MZ1', 'resultData': {'value': 1.0}},
+    {'resultName': 'IL', 'location': 'MZ2', 'resultData': {'value': 2.0}},
+    {'resultName': 'RESP', 'location': 'RX1', 'resultData': {'value': 0.9}},
+]
+
+LOCATION_GROUPS = {'MZ': ['MZ1', 'MZ2'], 'RX': ['RX1']}
+
+# ------------------------------------------------------------------------------
+# MOCKUP DOCUMENTS
+
+def prepareRegeneration(db:mockupDatabase):
+    """Sets up the chips blueprint and the chips so that datasheets can be
+    regenerated."""
+
+    bp = db.cmpBPs['chips']
+    bp.getDatasheetDefinition.return_value = [{'resultName': 'IL'}]
+    bp.Locations.retrieveGroupsDict.return_value = {'MZ': ['MZ1']}
+
+    for chip in db.components['chips']:
+        fields = {'blueprintID': bp.ID, 'datasheetData': [{'data': chip.name}]}
+        chip.getField.side_effect = lambda field, *args, _f = fields, **kwargs: _f.get(field)
+
+    return bp
+
+
+class TestRetrieveDataDicts(unittest.TestCase):
+
+    def test_singleTraversal(self):
+
+        db = mockupDatabase()
+        wc = db.collation()
+
+        db.cmpBPs['chips'].Locations.retrieveGroupElements.side_effect = \
+            lambda group, **kwargs: LOCATION_GROUPS[group]
+
+        for chip in db.components['chips']:
+            chip.Datasheet.retrieveData.return_value = DATASHEET_DATA
+
+        dataDicts = wc.Datasheets.retrieveDataDicts([('IL', 'MZ'), ('RESP', 'RX')],
+                                                    ['chips'], returnValuesOnly = True)
+
+        self.assertEqual(dataDicts[('IL', 'MZ')]['C01'], {'MZ1': 1.0, 'MZ2': 2.0})
+        self.assertEqual(dataDicts[('RESP', 'RX')]['C04'], {'RX1': 0.9})
+
+        # A single datasheet traversal for each chip
+        for chip in db.components['chips']:
+            chip.Datasheet.retrieveData.assert_called_once()
+
+
+class TestRegenerateDatasheets(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+        self.wc = self.db.collation()
+        self.bp = prepareRegeneration(self.db)
+
+    def test_singleBulkWrite(self):
+
+        setField = MagicMock(return_value = len(LABELS['chips']))
+
+        with self.db.patched(), \
+             patch.object(morw.ds.bulk, 'setComponentsField', setField):
+            labels = self.wc.Datasheets.regenerate('Tested')
+
+        self.assertEqual(labels, LABELS['chips'])
+
+        # A single bulk write of the datasheetData field
+        setField.assert_called_once()
+        _, field, values = setField.call_args.args
+        self.assertEqual(field, 'datasheetData')
+        self.assertEqual(set(values), {chip.ID for chip in self.db.components['chips']})
+
+        # The definition is extracted once for the shared blueprint
+        self.bp.getDatasheetDefinition.assert_called_once()
+        for chip in self.db.components['chips']:
+            chip.Datasheet.createAndStoreDatasheet.assert_called_once()
+            chip.mongoReplace.assert_not_called()
+
+    def test_bulkWriteOperations(self):
+
+        failed = self.db.components['chips'][1]
+        failed.Datasheet.createAndStoreDatasheet.return_value = None
+
+        collection = MagicMock()
+        collection.bulk_write.return_value.modified_count = len(LABELS['chips']) - 1
+
+        with self.db.patched(), \
+             patch.object(morw.ds.bulk, '_collection', return_value = collection):
+            labels = self.wc.Datasheets.regenerate('Tested')
+
+        self.assertEqual(labels, [l for l in LABELS['chips'] if l != 'C02'])
+
+        collection.bulk_write.assert_called_once()
+        operations = collection.bulk_write.call_args.args[0]
+
+        # Only "$set: {datasheetData: ...}" updates, none for the failed chip
+        expected = [UpdateOne({'_id': chip.ID},
+                              {'$set': {'datasheetData': [{'data': chip.name}]}})
+                    for chip in self.db.components['chips'] if chip is not failed]
+
+        self.assertEqual(operations, expected)
+        self.assertEqual(collection.bulk_write.call_args.kwargs, {'ordered': False})
+        failed.__setitem__.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+
+import mongomanager as mom
+import mongoreader.bulk as bulk
+
+from mockupWafer import mockupDatabase
+
+
+class TestLazyCollation(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+        self.wc = self.db.collation(lazy = True)
+
+    def loadFields(self, fields:list) -> list:
+        """Calls _loadFields() and returns the projections queried."""
+
+        projections = []
+        def query(connection, query, projection = None, *args, **kwargs):
+            projections.append(projection)
+            return []
+
+        with self.db.patched(), patch.object(mom.component, 'query', query):
+            self.wc._loadFields(fields)
+
+        return projections
+
+    def test_slicedFieldsNotLoaded(self):
+
+        self.assertIn('name', self.wc._loadedFields)
+        self.assertNotIn('statusLog', self.wc._loadedFields)
+
+        # Only the last entry was retrieved: the full log is queried
+        self.assertEqual(self.loadFields(['statusLog']), [{'statusLog': 1}])
+        self.assertEqual(self.loadFields(['statusLog', 'name']), [])
+
+    def test_refreshProjection(self):
+
+        self.assertEqual(self.wc._componentsProjection()['statusLog'], {'$slice': -1})
+
+        self.loadFields(['statusLog'])
+        self.assertEqual(self.wc._componentsProjection()['statusLog'], 1)
+
+
+class TestPartialHistories(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+        self.wc = self.db.collation(lazy = True)
+
+    def loadHistories(self, labels:list, resultNames = None, locations = None) -> list:
+        """Calls _loadTestHistories() and returns the (<IDs>, <projection>)
+        tuples queried."""
+
+        queries = []
+        def query(connection, query, projection = None, *args, **kwargs):
+            IDs = query['_id']['$in']
+            queries.append((IDs, projection))
+            return [{'_id': ID, 'testHistory': []} for ID in IDs]
+
+        with self.db.patched(), patch.object(mom.component, 'query', query):
+            self.wc._loadTestHistories(labels, resultNames, locations)
+
+        return queries
+
+    def IDs(self, labels:list) -> list:
+        return [self.wc._allComponentsDict[label].ID for label in labels]
+
+    def test_onlyRequestedResults(self):
+
+        queries = self.loadHistories(['C01', 'C02'], ['IL'], ['MZ1', 'MZ2'])
+
+        self.assertEqual(queries, [(self.IDs(['C01', 'C02']),
+                                    bulk.testHistoryResultsProjection(['IL'], ['MZ1', 'MZ2']))])
+        self.assertNotIn('testHistory', self.wc._loadedFields)
+
+        # Already retrieved
+        self.assertEqual(self.loadHistories(['C01'], ['IL'], ['MZ1']), [])
+
+    def test_widerScope(self):
+
+        self.loadHistories(['C01', 'C02'], ['IL'], ['MZ1'])
+
+        # Results retrieved before are retrieved again with the new ones
+        queries = self.loadHistories(['C02', 'C03'], ['ER'], ['MZ1'])
+        self.assertEqual(queries, [(self.IDs(['C02', 'C03']),
+                                    bulk.testHistoryResultsProjection(['ER', 'IL'], ['MZ1']))])
+
+        # Any location
+        queries = self.loadHistories(['C01'], ['IL'])
+        self.assertEqual(queries, [(self.IDs(['C01']),
+                                    bulk.testHistoryResultsProjection(['IL']))])
+
+    def test_fullHistory(self):
+
+        self.loadHistories(['C01'], ['IL'])
+
+        # Consumers of the full history (e.g. the result store) load it for
+        # all the components
+        with self.db.patched(), patch.object(mom.component, 'query', lambda *args, **kwargs: []):
+            self.wc._loadFields(['testHistory'])
+
+        self.assertEqual(self.wc._historyScopes, {})
+        self.assertEqual(self.loadHistories(['C01', 'C02'], ['IL']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
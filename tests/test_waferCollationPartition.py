@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import MagicMock
+from bson import ObjectId
+
+import mongoreader.wafers as morw
+
+# ------------------------------------------------------------------------------
+# SYNTHETIC WAFER
+#
+# 5,000 children split among chips, test chips and bars, with several
+# blueprints per family.
+
+FAMILIES = {
+    'chips': ('C', 2000, 20),
+    'testChips': ('T', 2500, 50),
+    'bars': ('B', 500, 5),
+}
+
+class _component:
+    """Lightweight stand-in for mongomanager.component."""
+
+    def __init__(self, label, blueprintID):
+        self.ID = ObjectId()
+        self.name = f'Component {label}'
+        self.blueprintID = blueprintID
+        self._waferLabel = label
+
+    def getField(self, field, *args, **kwargs):
+        return getattr(self, field, None)
+
+
+def _syntheticWafer():
+
+    families = {}
+    children = []
+
+    for chipType, (prefix, amount, bpAmount) in FAMILIES.items():
+
+        bps = [MagicMock(ID = ObjectId()) for _ in range(bpAmount)]
+        bpDict = {}
+
+        for index in range(amount):
+            label = f'{prefix}{index:05d}'
+            bp = bps[index % bpAmount]
+            bpDict[label] = bp
+            children.append(_component(label, bp.ID))
+
+        families[chipType] = (bps, bpDict)
+
+    wafer = MagicMock()
+    wafer.ChildrenComponents.retrieveElements.return_value = children
+
+    return wafer, children, families
+
+
+def _referencePartition(children, bps):
+    """The previous implementation: one filter of all children per family."""
+    bpIDs = [bp.ID for bp in bps]
+    chips = [chip for chip in children if chip.blueprintID in bpIDs]
+    return chips, {chip.getField('_waferLabel'): chip for chip in chips}
+
+
+class TestPartition(unittest.TestCase):
+
+    def _collect(self, wafer, families):
+        wc = object.__new__(morw.waferCollation)
+        wc.connection = None
+        return wc._collectChipsalike(wafer,
+                            *families['chips'],
+                            *families['testChips'],
+                            *families['bars'])
+
+    def _reference(self, children, families):
+        reference = []
+        for bps, _ in families.values():
+            reference.extend(_referencePartition(children, bps))
+        return reference
+
+    def test_syntheticWafer(self):
+
+        wafer, children, families = _syntheticWafer()
+        collected = self._collect(wafer, families)
+
+        self.assertEqual(list(collected), self._reference(children, families))
+
+    def test_sharedBlueprint(self):
+
+        wafer, children, families = _syntheticWafer()
+
+        # A blueprint used both by chips and by test chips
+        shared = families['chips'][0][0]
+        families['testChips'][0].append(shared)
+        for child in children:
+            if child.blueprintID == shared.ID:
+                families['testChips'][1][child._waferLabel] = shared
+
+        collected = list(self._collect(wafer, families))
+
+        self.assertEqual(collected, self._reference(children, families))
+
+        sharedChildren = [c for c in children if c.blueprintID == shared.ID]
+        self.assertTrue(all(c in collected[0] for c in sharedChildren))
+        self.assertTrue(all(c in collected[2] for c in sharedChildren))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mongoreader.wafers as morw
+
+from mockupWafer import mockupDatabase
+
+
+class TestDeferredPlotter(unittest.TestCase):
+
+    def test_deferredPlotter(self):
+
+        db = mockupDatabase()
+
+        # The plotter retrieves the wafer geometry: ~4 queries
+        waferPlotter = MagicMock()
+
+        wc = db.collation(waferPlotter)
+        waferPlotter.assert_not_called()
+
+        with patch.object(morw.wplt, 'waferPlotter', waferPlotter):
+            self.assertIs(wc.wplt, wc.wplt)
+
+        waferPlotter.assert_called_once_with(wc.connection, db.waferBP)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mongoreader.wafers as morw
+
+from mockupWafer import LABELS, mockupDatabase
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+
+    def test_cachedResults(self):
+
+        wc = self.db.collation()
+        scoop = MagicMock(return_value = [{'resultName': 'IL', 'resultValue': 1}])
+
+        with patch.object(morw.cmpGoggles, 'scoopComponentResults', scoop):
+            first = wc.retrieveTestResults('IL')
+            second = wc.retrieveTestResults('IL', verbose = False)
+
+        self.assertEqual(first, second)
+        self.assertEqual(scoop.call_count, len(LABELS['chips']))
+        self.assertEqual(wc.queryCacheInfo()['hits'], 1)
+
+        wc._joinCollectedDocuments() # As done by refresh()
+        self.assertEqual(wc.queryCacheInfo()['entries'], 0)
+
+    def test_copies(self):
+
+        wc = self.db.collation()
+        scoop = MagicMock(return_value = [{'resultName': 'IL', 'resultTags': ['TE']}])
+
+        with patch.object(morw.cmpGoggles, 'scoopComponentResults', scoop):
+            first = wc.retrieveTestResults('IL')
+            first[0]['resultName'] = 'ER'
+            first.pop()
+
+            frame = wc.retrieveTestResults('IL', returnDataFrame = True)
+            frame.loc[0, 'resultName'] = 'ER'
+
+            results = wc.retrieveTestResults('IL')
+            self.assertEqual(len(results), len(LABELS['chips']))
+            self.assertEqual([r['resultName'] for r in results],
+                             ['IL']*len(LABELS['chips']))
+            self.assertEqual(list(wc.retrieveTestResults('IL', returnDataFrame = True)['resultName']),
+                             ['IL']*len(LABELS['chips']))
+
+        self.assertEqual(scoop.call_count, 2*len(LABELS['chips']))
+
+    def test_sharedEntry(self):
+
+        wc = self.db.collation()
+        scoop = MagicMock(return_value = [{'resultName': 'IL', 'resultValue': 1.0,
+                                           'location': 'MZ1'}])
+
+        with patch.object(morw.cmpGoggles, 'scoopComponentResults', scoop), \
+             patch.object(wc, '_resultStore') as store:
+            frame = wc.retrieveTestResults('IL', returnDataFrame = True)
+            dataDict = wc._scoopTestResults(['chips'], None, ['IL'],
+                                            returnType = 'dataDictionary')
+            again = wc._scoopTestResults(['chips'], None, ['IL'],
+                                         returnType = 'dataDictionary')
+
+        store.assert_not_called()
+        self.assertEqual(scoop.call_count, len(LABELS['chips']))
+        self.assertEqual(dataDict, again)
+        self.assertEqual([d['label'] for d in dataDict], list(frame['label']))
+        self.assertEqual({d['value'] for d in dataDict}, {1.0})
+
+        info = wc.queryCacheInfo()
+        self.assertEqual((info['misses'], info['hits'], info['entries']), (1, 2, 1))
+
+    def test_serverSideNotCached(self):
+
+        wc = self.db.collation()
+        store = MagicMock()
+        store.dataDictionaryRecords.return_value = [{'label': 'C01', 'value': 1.0, 'location': 'MZ1'}]
+
+        with patch.object(morw.rs, 'queryResultStore', return_value = store) as query:
+            for _ in range(2):
+                wc._scoopTestResults(['chips'], returnType = 'dataDictionary', serverSide = True)
+
+        self.assertEqual(query.call_count, 2)
+        self.assertEqual(wc.queryCacheInfo()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
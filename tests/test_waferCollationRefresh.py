@@ -0,0 +1,95 @@
+import unittest
+
+from mockupWafer import LABELS, mockupDatabase
+
+
+class TestRefresh(unittest.TestCase):
+
+    def setUp(self):
+
+        self.db = mockupDatabase()
+        self.wc = self.db.collation()
+
+        # Markers are not known for collations not built from a snapshot
+        self.assertIsNone(self.refresh())
+
+    def refresh(self):
+        """Refreshes the collation, returning the change report."""
+
+        self.db.queriedIDs.clear()
+        with self.db.patched():
+            return self.wc.refresh()
+
+    def test_unchanged(self):
+
+        report = self.refresh()
+
+        self.assertEqual(self.db.queriedIDs, [])
+        self.assertFalse(report['wafer'])
+        self.assertFalse(report['waferBlueprint'])
+        for chipType in LABELS:
+            self.assertEqual(report[chipType], [])
+        self.assertEqual(report['removed'], [])
+        self.assertEqual(report['blueprints'], [])
+
+    def test_changedComponents(self):
+
+        C02 = self.db.components['chips'][1]
+        TC01 = self.db.components['testCells'][0]
+        self.db.modify(C02)
+        self.db.modify(TC01)
+
+        report = self.refresh()
+
+        self.assertEqual(self.db.queriedIDs, [C02.ID, TC01.ID])
+        self.assertEqual(report['chips'], ['C02'])
+        self.assertEqual(report['testCells'], ['TC01'])
+        self.assertEqual(report['testChips'], [])
+
+    def test_deletedComponent(self):
+
+        C03 = self.db.components['chips'][2]
+        self.db.delete(C03)
+
+        report = self.refresh()
+
+        # Not resurrected from the collation
+        self.assertEqual(self.db.queriedIDs, [])
+        self.assertEqual(report['removed'], ['C03'])
+        self.assertNotIn('C03', self.wc.chipsDict)
+        self.assertNotIn(C03, self.wc.chips)
+
+    def test_changedBlueprint(self):
+
+        self.db.modify(self.db.cmpBPs['bars'])
+        self.db.modify(self.db.wafer)
+
+        report = self.refresh()
+
+        self.assertTrue(report['wafer'])
+        self.assertEqual(report['blueprints'], ['bars blueprint'])
+        self.assertEqual(report['bars'], [])
+        self.db.wafer.mongoRefresh.assert_called()
+
+
+class TestRefreshEmptyCollation(unittest.TestCase):
+
+    def test_noComponents(self):
+
+        db = mockupDatabase()
+        for cmps in db.components.values():
+            for cmp in list(cmps):
+                db.delete(cmp)
+
+        wc = db.collation()
+        self.assertFalse(wc._allComponentsDict)
+
+        with db.patched():
+            self.assertIsNone(wc.refresh())
+            report = wc.refresh()
+
+        self.assertEqual(report['removed'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mongoreader.wafers as morw
+
+from mockupWafer import LABELS, mockupDatabase
+
+# Three results for each chip
+RESULTS = [{'resultName': 'IL', 'location': f'MZ{index}', 'resultValue': index}
+           for index in range(3)]
+
+
+class TestResultFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mockupDatabase()
+        self.wc = self.db.collation()
+
+        self.results = {cmp.name: RESULTS for cmp in self.db.components['chips']}
+
+    def _scoop(self, cmp, *args, **kwargs):
+        return [dict(res) for res in self.results[cmp.name]]
+
+    def frames(self, **kwargs) -> list:
+        with patch.object(morw.cmpGoggles, 'scoopComponentResults', MagicMock(side_effect = self._scoop)):
+            return list(self.wc.iterTestResultFrames('IL', **kwargs))
+
+    def test_chunkBoundaries(self):
+
+        total = 3*len(LABELS['chips'])
+
+        for chunkSize in [1, 5, 6, total, total + 1]:
+            with self.subTest(chunkSize = chunkSize):
+
+                frames = self.frames(chunkSize = chunkSize)
+                
+                expected = [chunkSize]*(total // chunkSize)
+                if total % chunkSize != 0: expected.append(total % chunkSize)
+
+                self.assertEqual([len(frame) for frame in frames], expected)
+                self.assertEqual(sum([list(f['label']) for f in frames], []),
+                                 [label for label in LABELS['chips'] for _ in RESULTS])
+
+    def test_schema(self):
+
+        frames = self.frames(chunkSize = 5)
+        self.assertEqual(list(frames[0].columns),
+                         ['wafer', 'componentName', 'componentID', 'label',
+                          'resultName', 'location', 'resultValue'])
+
+        for frame in frames:
+            self.assertEqual(list(frame.columns), list(frames[0].columns))
+
+    def test_newKeysInLaterChunk(self):
+
+        lastChip = self.db.components['chips'][-1]
+        self.results[lastChip.name] = [{**RESULTS[0], 'resultError': 0.1}]
+
+        # Keys of the first chunk are extended within the chunk...
+        frames = self.frames(chunkSize = 100)
+        self.assertIn('resultError', frames[0].columns)
+
+        # ...but cannot be added to chunks already yielded
+        with self.assertRaises(ValueError):
+            self.frames(chunkSize = 5)
+
+        columns = ['label', 'resultName', 'resultError']
+        frames = self.frames(chunkSize = 5, columns = columns)
+        self.assertTrue(all(list(frame.columns) == columns for frame in frames))
+        self.assertEqual(frames[-1]['resultError'].iloc[-1], 0.1)
+
+    def test_iterTestResults(self):
+
+        with patch.object(morw.cmpGoggles, 'scoopComponentResults', MagicMock(side_effect = self._scoop)) as scoop:
+            results = list(self.wc.iterTestResults('IL'))
+
+        self.assertEqual(len(results), 3*len(LABELS['chips']))
+        self.assertEqual(results[0]['label'], LABELS['chips'][0])
+        self.assertEqual(scoop.call_args.kwargs['returnType'], 'dictionary')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timezone
+
+import mongoreader.wafers as morw
+
+from mockupWafer import LABELS, mockupDatabase
+
+
+def generateEntry(*resultNames):
+    return {'executionDate': datetime(2024, 1, 1, tzinfo = timezone.utc),
+            'processStage': 'Diced', 'status': 'Testing',
+            'results': [{'resultName': name, 'location': 'MZ1',
+                         'resultData': {'value': 1.0, 'unit': 'dB'}}
+                        for name in resultNames]}
+
+
+class TestResultNames(unittest.TestCase):
+
+    def setUp(self):
+
+        self.db = mockupDatabase()
+        self.wc = self.db.collation()
+
+        histories = {
+            'C01': [generateEntry('IL', 'ER')],
+            'C02': [generateEntry('ER'), generateEntry('RESP')],
+            'T01': [generateEntry('VPI')],
+        }
+
+        for cmp in self.db.allComponents:
+            label = cmp.getField('_waferLabel')
+            fields = {'_waferLabel': label, 'testHistory': histories.get(label)}
+            cmp.getField.side_effect = lambda field, *args, _f = fields, **kwargs: _f.get(field)
+
+    def test_storeNotBuilt(self):
+
+        self.assertEqual(self.wc.retrieveAllTestResultNames(), ['IL', 'ER', 'RESP'])
+        self.assertEqual(self.wc.retrieveAllTestResultNames('testChips'), ['VPI'])
+        self.assertIsNone(self.wc.retrieveAllTestResultNames('bars'))
+
+        self.assertIsNone(self.wc._resultStoreCache)
+
+    def test_storeBuilt(self):
+
+        self.wc._results
+        self.assertEqual(self.wc.retrieveAllTestResultNames(), ['IL', 'ER', 'RESP'])
+        self.assertEqual(self.wc.retrieveAllTestResultNames(['chips', 'testChips']),
+                         ['IL', 'ER', 'RESP', 'VPI'])
+
+    def test_serverCatalogNotCached(self):
+
+        with self.db.patched(), patch.object(morw.rs, 'queryResultCatalog') as query:
+            self.wc.retrieveResultCatalog(serverSide = True)
+            self.wc.retrieveResultCatalog(serverSide = True)
+
+        self.assertEqual(query.call_count, 2)
+
+        catalog = self.wc.retrieveResultCatalog()
+        self.assertEqual(list(catalog.index), ['IL', 'ER', 'RESP', 'VPI'])
+        self.assertEqual(self.wc.queryCacheInfo()['entries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timezone
+
+import mongomanager as mom
+
+from mockupWafer import mockupDatabase
+
+# ------------------------------------------------------------------------------
+# MOCKUP DATA
+
+def generateEntry(day, value):
+    return {'executionDate': datetime(2024, 1, day, tzinfo = timezone.utc),
+            'processStage': 'Tested', 'status': 'Testing',
+            'results': [{'resultName': 'IL', 'location': 'MZ1',
+                         'resultData': {'value': value, 'unit': 'dB'}}]}
+
+WATERMARK = datetime(2024, 1, 2, tzinfo = timezone.utc)
+
+
+class TestResultsSince(unittest.TestCase):
+
+    def setUp(self):
+
+        self.db = mockupDatabase()
+        self.wc = self.db.collation()
+        self.C02 = self.wc.chipsDict['C02']
+
+        # Entries known to the collation: the second one is then updated
+        self.histories = {'C01': [generateEntry(1, 0.5)],
+                          'C02': [generateEntry(1, 1.0), generateEntry(3, 2.5)]}
+
+        for cmp in self.db.allComponents:
+            label = cmp.getField('_waferLabel')
+            fields = {'_waferLabel': label, 'testHistory': self.histories.get(label)}
+            cmp.getField.side_effect = lambda field, *args, _f = fields, **kwargs: _f.get(field)
+
+        self.queries = []
+
+    def _query(self, connection, query, *args, **kwargs):
+        """Returns the entries of C02 executed after the watermark, as done
+        by the "$filter" projection."""
+        self.queries.append((query, kwargs.get('projection')))
+        return [{'_id': self.C02.ID, 'testHistory': [generateEntry(3, 3.0), generateEntry(4, 4.0)]}]
+
+    def resultsSince(self, *args, **kwargs):
+        with self.db.patched(), patch.object(mom.component, 'query', self._query):
+            return self.wc.retrieveTestResultsSince(*args, **kwargs)
+
+    def test_newEntries(self):
+
+        results, newWatermark = self.resultsSince(WATERMARK, 'IL')
+
+        query, projection = self.queries[0]
+        self.assertEqual(query['testHistory'],
+                         {'$elemMatch': {'executionDate': {'$gt': WATERMARK}}})
+        self.assertEqual(projection['testHistory']['$filter']['cond'],
+                         {'$gt': ['$$entry.executionDate', WATERMARK]})
+
+        self.assertEqual([(r['label'], r['value']) for r in results], [('C02', 3.0), ('C02', 4.0)])
+        self.assertEqual(newWatermark, datetime(2024, 1, 4, tzinfo = timezone.utc))
+
+        # The entries after the watermark are replaced, the others are kept
+        self.C02.__setitem__.assert_called_once_with('testHistory',
+                [generateEntry(1, 1.0), generateEntry(3, 3.0), generateEntry(4, 4.0)])
+
+    def test_resultStoreUpdated(self):
+
+        store = self.wc._results
+        self.assertEqual(list(store.select(labels = ['C02'])['value']), [1.0, 2.5])
+
+        self.resultsSince(WATERMARK, 'IL')
+
+        self.assertIs(self.wc._resultStoreCache, store)
+        self.assertEqual(list(store.select(labels = ['C02'])['value']), [1.0, 3.0, 4.0])
+        self.assertEqual(list(store.select(labels = ['C01'])['value']), [0.5])
+
+    def test_resultSchema(self):
+
+        results, _ = self.resultsSince(WATERMARK, 'IL')
+        frame, _ = self.resultsSince(WATERMARK, 'IL', returnDataFrame = True)
+
+        columns = ['wafer', 'label', 'componentID', 'resultName', 'location', 'tags',
+                   'value', 'error', 'unit', 'executionDate', 'processStage',
+                   'status', 'testReportID', 'datasheetReady']
+
+        self.assertEqual(list(results[0]), columns)
+        self.assertEqual(list(frame.columns), columns)
+
+    def test_labelWithoutComponent(self):
+
+        del self.wc._allComponentsDict['C03']
+
+        results, _ = self.resultsSince(WATERMARK, 'IL')
+        self.assertEqual(len(results), 2)
+        self.assertNotIn(self.db.components['chips'][2].ID, self.queries[0][0]['_id']['$in'])
+
+
+if __name__ == '__main__':
+    unittest.main()
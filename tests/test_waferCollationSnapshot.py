@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+from time import time
+
+import mongoreader.wafers as morw
+import mongoreader.cache as ch
+
+from mockupWafer import LABELS, mockupDatabase
+
+FOLDER = Path(__file__).parent / '.test-tmp'
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+
+        self.db = mockupDatabase()
+
+        # Snapshots are kept in memory: mockup documents cannot be pickled
+        self.snapshots = {}
+
+    @property
+    def snapshot(self) -> dict:
+        return self.snapshots[FOLDER / f'{self.db.wafer.ID}.pickle']
+
+    def collation(self, now = None, **kwargs):
+        """Returns the collation built from the snapshot (if any), and the
+        IDs of the components retrieved from the database."""
+
+        self.db.queriedIDs.clear()
+
+        with patch.object(morw, '_loadCollationSnapshot', self.snapshots.get), \
+             patch.object(morw, '_saveCollationSnapshot', self.snapshots.__setitem__), \
+             patch.object(morw, 'time', lambda: time() if now is None else now):
+
+            wc = self.db.collation(cache = FOLDER, **kwargs)
+
+        return wc, list(self.db.queriedIDs)
+
+    def test_cacheHit(self):
+
+        _, queried = self.collation()
+        self.assertEqual(len(queried), len(self.db.allComponents))
+
+        wc, queried = self.collation()
+
+        self.assertEqual(queried, [])
+        self.assertEqual(list(wc.chipsDict), LABELS['chips'])
+        self.assertEqual(list(wc.testCellsDict), LABELS['testCells'])
+
+    def test_changedDocument(self):
+
+        self.collation()
+
+        C02 = self.db.components['chips'][1]
+        self.db.modify(C02)
+
+        wc, queried = self.collation()
+
+        self.assertEqual(queried, [C02.ID])
+        self.assertIs(wc.chipsDict['C02'], C02)
+        self.assertEqual(self.snapshot['markers'][C02.ID], self.db.markers[C02.ID])
+
+    def test_deletedDocument(self):
+
+        self.collation()
+
+        C03 = self.db.components['chips'][2]
+        self.db.delete(C03)
+
+        wc, queried = self.collation()
+
+        # Not retrieved, and the stale copy in the snapshot is not used
+        self.assertEqual(queried, [])
+        self.assertNotIn('C03', wc.chipsDict)
+        self.assertNotIn(C03, wc.chips)
+        self.assertNotIn(C03.ID, self.snapshot['components'])
+
+    def test_expiredSnapshot(self):
+
+        self.collation()
+
+        later = time() + morw.waferCollation.snapshotMaxAge + 1
+        wc, queried = self.collation(now = later)
+
+        self.assertEqual(len(queried), len(self.db.allComponents))
+        self.assertEqual(list(wc.chipsDict), LABELS['chips'])
+
+    def test_lazySnapshotForFullLoad(self):
+
+        self.collation(lazy = True)
+        wc, queried = self.collation()
+
+        # Partial documents are not reused: all the components are retrieved
+        self.assertEqual(len(queried), len(self.db.allComponents))
+        self.assertIsNone(wc._loadedFields)
+        self.assertIsNone(self.snapshot['loadedFields'])
+
+        # A full snapshot is reused by a lazy collation
+        wc, queried = self.collation(lazy = True)
+        self.assertEqual(queried, [])
+        self.assertIsNone(wc._loadedFields)
+
+    def test_sharedBlueprints(self):
+
+        blueprintCache = ch.blueprintCache()
+
+        # A wafer of the same mask set, loaded first, caches the blueprints
+        self.collation(blueprintCache = blueprintCache)
+        self.snapshots.clear()
+        self.db.blueprintQuery = MagicMock(wraps = self.db.blueprintQuery)
+
+        wc, _ = self.collation(blueprintCache = blueprintCache)
+
+        self.db.blueprintQuery.assert_not_called()
+        self.assertIs(wc.waferBlueprint, self.db.waferBP)
+
+        # Modified blueprints are queried even if cached
+        chipBP = self.db.cmpBPs['chips']
+        self.db.modify(chipBP)
+        self.collation(blueprintCache = blueprintCache)
+
+        self.db.blueprintQuery.assert_called_once()
+        self.assertEqual(self.db.blueprintQuery.call_args.args[1]['_id']['$in'], [chipBP.ID])
+
+
+if __name__ == '__main__':
+    unittest.main()